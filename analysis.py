@@ -0,0 +1,246 @@
+"""Анализ АЧХ для отображения и кэш результатов анализа"""
+import collections
+import functools
+import threading
+import numpy as np
+
+import diagnostics
+import dsp
+
+SAVGOL_POLYORDER = 3
+SAVGOL_OCTAVES = 1 / 6  # Ширина окна фильтра на логарифмической шкале частот
+ANALYSIS_CACHE_SIZE = 32
+OVERALL = "overall"  # Ключ канала для общей АЧХ
+
+# Фиксированная сетка частот для усреднения по положениям микрофона
+POSITION_GRID = np.logspace(np.log10(20.0), np.log10(20000.0), 512)
+
+
+def savgol_filter_spectrum(freqs, spectrum, num_points=dsp.PLOT_POINTS):
+    """Фильтр Савицкого-Голея с окном SAVGOL_OCTAVES октавы
+
+    Спектр сначала интерполируется на логарифмическую сетку, поэтому ширина
+    окна не зависит от шага исходной сетки частот. Возвращает (сетка, спектр).
+    """
+    import scipy.signal
+    grid, spectrum = dsp.resample_spectrum(freqs, spectrum, num_points)
+    points_per_octave = (len(grid) - 1) / np.log2(grid[-1] / grid[0])
+    window_length = max(int(SAVGOL_OCTAVES * points_per_octave) | 1, SAVGOL_POLYORDER + 2)
+    if window_length > len(spectrum):
+        window_length = len(spectrum) - (1 - len(spectrum) % 2)
+    return grid, scipy.signal.savgol_filter(spectrum, window_length, SAVGOL_POLYORDER)
+
+
+class FrAnalysis:
+    """Кривые АЧХ, прореженные до логарифмической сетки и готовые к отрисовке"""
+
+    def __init__(self, freqs, raw, raw_lower, raw_upper, smoothed, filtered, harmonics=None,
+                 spread_lower=None, spread_upper=None):
+        self.freqs = freqs
+        self.raw = raw
+        self.raw_lower = raw_lower
+        self.raw_upper = raw_upper
+        self.smoothed = smoothed
+        self.filtered = filtered
+        self.harmonics = harmonics or {}
+        self.spread_lower = spread_lower
+        self.spread_upper = spread_upper
+
+
+def analyze_fr(freqs, spectrum, smoothing_mode="variable", harmonics=None, spread=None):
+    """Сглаживание, фильтрация и прореживание АЧХ
+
+    Сглаживание выполняется по полному спектру, затем все кривые приводятся к
+    логарифмической сетке: сырая АЧХ - средним и огибающей min/max по полосам,
+    остальные - интерполяцией (фильтр Савицкого-Голея работает уже на этой
+    сетке). Окна сглаживания заданы в Гц и долях октавы, поэтому результат
+    одинаков для полного спектра, оценки Уэлча и сводки на логарифмической
+    сетке. spread - необязательная пара (нижняя, верхняя
+    граница) разброса АЧХ между положениями микрофона на сетке freqs.
+    """
+    with diagnostics.DIAGNOSTICS.stage("smoothing"):
+        smoothed = dsp.smooth_spectrum(spectrum, freqs, smoothing_mode)
+    with diagnostics.DIAGNOSTICS.stage("savgol"):
+        _, filtered = savgol_filter_spectrum(freqs, smoothed)
+    plot_freqs, raw, raw_lower, raw_upper = dsp.log_envelope(freqs, spectrum)
+
+    plot_harmonics = {}
+    for order, harmonic in (harmonics or {}).items():
+        smoothed_harmonic = np.abs(dsp.smooth_spectrum(harmonic, freqs, smoothing_mode))
+        # Выше f_max / k гармоника не измерена
+        smoothed_harmonic[harmonic <= 0] = np.nan
+        plot_harmonics[order] = dsp.resample_spectrum(freqs, smoothed_harmonic)[1]
+
+    spread_lower = spread_upper = None
+    if spread is not None:
+        spread_lower = dsp.resample_spectrum(freqs, spread[0])[1]
+        spread_upper = dsp.resample_spectrum(freqs, spread[1])[1]
+
+    # Обеспечиваем, что спектры не содержат отрицательных значений
+    return FrAnalysis(plot_freqs, np.abs(raw), np.abs(raw_lower), np.abs(raw_upper),
+                      np.abs(dsp.resample_spectrum(freqs, smoothed)[1]),
+                      np.abs(filtered),
+                      plot_harmonics, spread_lower, spread_upper)
+
+
+def band_analysis(spectra, fraction=3):
+    """Уровни каналов в полосах 1/fraction октавы
+
+    spectra - словарь {канал: (freqs, амплитудный спектр)}. Каналы с общей
+    сеткой частот обрабатываются одним умножением на разреженную матрицу.
+    Возвращает центры полос и словарь {канал: уровни, дБ}.
+    """
+    groups = {}
+    for channel, (freqs, spectrum) in spectra.items():
+        key = (len(freqs), float(freqs[0]), float(freqs[-1]))
+        groups.setdefault(key, (freqs, []))[1].append(channel)
+    centers = dsp.octave_bands(fraction)[0]
+    levels = {}
+    for freqs, channels in groups.values():
+        power = np.stack([np.square(spectra[channel][1], dtype=np.float64) for channel in channels], axis=1)
+        centers, group_levels = dsp.band_levels(freqs, power, fraction)
+        for index, channel in enumerate(channels):
+            levels[channel] = group_levels[:, index]
+    return centers, levels
+
+
+class SpatialAverage:
+    """Усреднение канала по нескольким положениям микрофона
+
+    Уровень и АЧХ (в дБ на фиксированной сетке POSITION_GRID) накапливаются
+    алгоритмом Уэлфорда: на каждое положение тратится постоянный объём памяти
+    и вычислений, исходные записи не хранятся. Спектр положения может быть как
+    на сетке БПФ, так и сводкой на логарифмической сетке; средняя АЧХ затем
+    сглаживается analyze_fr окнами в Гц и долях октавы, как и исходный спектр.
+    """
+
+    def __init__(self, grid=POSITION_GRID):
+        self.grid = grid
+        self.count = 0
+        self.mean_db = np.zeros(len(grid))
+        self.m2_db = np.zeros(len(grid))
+        self.level_mean = 0.0
+        self.level_m2 = 0.0
+
+    def add(self, freqs, spectrum, rms_level):
+        """Учёт очередного положения"""
+        # Мощность усредняется по полосам сетки, затем переводится в дБ
+        _, power, _, _ = dsp.log_envelope(freqs, np.square(spectrum, dtype=np.float64), grid=self.grid)
+        values_db = 10 * np.log10(power + 1e-20)
+        self.count += 1
+        delta = values_db - self.mean_db
+        self.mean_db += delta / self.count
+        self.m2_db += delta * (values_db - self.mean_db)
+        delta = rms_level - self.level_mean
+        self.level_mean += delta / self.count
+        self.level_m2 += delta * (rms_level - self.level_mean)
+
+    def spectrum(self):
+        """Средняя АЧХ (амплитуда)"""
+        return 10 ** (self.mean_db / 20)
+
+    def std_db(self):
+        """Стандартное отклонение АЧХ между положениями (дБ)"""
+        if self.count < 2:
+            return np.zeros(len(self.grid))
+        return np.sqrt(self.m2_db / (self.count - 1))
+
+    def spread(self):
+        """Границы разброса АЧХ: среднее ± стандартное отклонение (амплитуда)"""
+        std = self.std_db()
+        return 10 ** ((self.mean_db - std) / 20), 10 ** ((self.mean_db + std) / 20)
+
+    def level_std(self):
+        """Стандартное отклонение уровня между положениями (дБ)"""
+        if self.count < 2:
+            return 0.0
+        return float(np.sqrt(self.level_m2 / (self.count - 1)))
+
+
+def analyze_overall(spectra, weights=None, smoothing_mode="variable"):
+    """Анализ общей АЧХ: взвешенное среднее мощности каналов на общей сетке частот
+
+    spectra - список пар (freqs, амплитудный спектр) по каналам.
+    """
+    freqs, power = dsp.average_spectra([(freqs, spectrum ** 2) for freqs, spectrum in spectra], weights)
+    return analyze_fr(freqs, np.sqrt(power), smoothing_mode)
+
+
+class AnalysisCache:
+    """LRU-кэш результатов анализа с расчётом в фоновом пуле
+
+    Ключ - кортеж, первый элемент которого номер канала (или OVERALL), далее
+    идентификатор записи и параметры анализа. Повторное измерение канала
+    сбрасывает его записи и общую АЧХ. Если задан executor, результаты можно
+    заранее рассчитать в пуле через submit; get_or_compute дожидается уже
+    запущенного расчёта вместо повторного. Методы можно вызывать из любых потоков.
+    """
+
+    def __init__(self, maxsize=ANALYSIS_CACHE_SIZE, executor=None):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.pending = {}  # Ключ -> Future фонового расчёта
+        self.executor = executor
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Результат по ключу или None"""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Сохранение результата с вытеснением самого старого"""
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def submit(self, key, func, *args):
+        """Фоновый расчёт func(*args), если результата нет в кэше и он ещё не считается"""
+        if self.executor is None:
+            return
+        with self.lock:
+            if key in self.entries or key in self.pending:
+                return
+            future = self.executor.submit(func, *args)
+            self.pending[key] = future
+        future.add_done_callback(functools.partial(self.on_done, key))
+
+    def on_done(self, key, future):
+        """Перенос готового фонового результата в кэш"""
+        with self.lock:
+            # Расчёт для сброшенного ключа не сохраняется
+            if self.pending.get(key) is not future:
+                return
+            del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self.put(key, future.result())
+
+    def get_or_compute(self, key, func, *args):
+        """Результат из кэша, из уже запущенного фонового расчёта или вычисленный сразу"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self.lock:
+            future = self.pending.get(key)
+        value = future.result() if future is not None else func(*args)
+        self.put(key, value)
+        return value
+
+    def invalidate(self, channel):
+        """Удаление результатов канала и общей АЧХ"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] in (channel, OVERALL)]:
+                del self.entries[key]
+            for key in [key for key in self.pending if key[0] in (channel, OVERALL)]:
+                del self.pending[key]
+
+    def clear(self):
+        """Очистка кэша"""
+        with self.lock:
+            self.entries.clear()
+            self.pending.clear()
@@ -0,0 +1,294 @@
+"""Замеры производительности обработки АЧХ без звукового оборудования
+
+Этапы измерения (генерация шума, запись канала, сеанс по всем каналам) идут
+через имитацию устройства loopback.LoopbackDevice, поэтому замеры повторяемы
+на любой машине. Результаты можно сохранить в JSON для сравнения между версиями.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import analysis
+import dsp
+import loopback
+import measurement
+
+FS = 48000
+DURATIONS = [2.0, 5.0, 10.0]
+SAMPLE_RATES = [44100, 48000, 96000]
+CHANNEL_COUNTS = [2, 6, 8]
+FREQ_TICKS = [0, 32, 64, 125, 250, 500, 1000, 2000, 4000, 8000, 16000, 20000]
+FR_PARAMS = (8192, 50, "hann")  # Сегмент, перекрытие и окно оценки Уэлча
+ROOM_SECONDS = 0.02  # Длина КИХ-характеристики имитируемой комнаты
+CONVOLVER_TAPS = [4096, 16384, 65536]
+CONVOLVER_BLOCKS = [256, 512, 1024]
+CONVOLVER_CHANNELS = 8
+CONVOLVER_SECONDS = 2.0  # Длина обрабатываемого сигнала
+
+
+def legacy_smooth_spectrum_variable(spectrum, freqs):
+    """Исходная реализация сглаживания с окном в бинах и циклом по бинам (эталон скорости)"""
+    num_points = len(freqs)
+    window_sizes = (np.log(freqs + 1e-10) * 5).astype(int)
+    window_sizes = np.maximum(window_sizes | 1, 3)  # Обеспечиваем нечетность и минимум 3
+
+    # Ограничим максимальный размер окна для ускорения
+    max_window_size = 101
+    window_sizes = np.minimum(window_sizes, max_window_size)
+
+    smoothed = np.copy(spectrum)
+    unique_window_sizes = np.unique(window_sizes)
+    for ws in unique_window_sizes:
+        indices = np.where(window_sizes == ws)[0]
+        half_ws = ws // 2
+        for idx in indices:
+            start = max(0, idx - half_ws)
+            end = min(num_points, idx + half_ws + 1)
+            smoothed[idx] = np.mean(spectrum[start:end])
+    return smoothed
+
+
+def loop_smooth_spectrum_variable(spectrum, freqs):
+    """Текущее сглаживание (окно в Гц) циклом по бинам: эталон точности для векторной версии"""
+    half_widths = dsp.variable_window_widths(freqs) / 2
+    smoothed = np.copy(spectrum)
+    for idx, (freq, half_width) in enumerate(zip(freqs, half_widths)):
+        start = min(np.searchsorted(freqs, freq - half_width, side='left'), idx)
+        end = max(np.searchsorted(freqs, freq + half_width, side='right'), idx + 1)
+        smoothed[idx] = np.mean(spectrum[start:end])
+    return smoothed
+
+
+def make_spectrum(duration, fs, seed=0):
+    """Спектр белого шума заданной длительности"""
+    rng = np.random.default_rng(seed)
+    data = rng.normal(0, 0.1, int(duration * fs))
+    window = np.hanning(len(data))
+    spectrum = np.abs(np.fft.rfft(data * window)) / np.sum(window)
+    freqs = np.fft.rfftfreq(len(data), 1 / fs)
+    return freqs, spectrum
+
+
+def timeit(func, *args, repeat=3):
+    """Минимальное время выполнения функции из нескольких запусков"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_smoothing():
+    """Сравнение исходного сглаживания с циклом и текущего на префиксных суммах
+
+    Ускорение считается относительно исходной реализации, а расхождение -
+    относительно цикла с тем же окном в Гц, что и у векторной версии.
+    """
+    print("Smoothing benchmark (fs = {} Hz)".format(FS))
+    print("{:>8} {:>10} {:>12} {:>12} {:>10} {:>12}".format(
+        "dur, s", "bins", "baseline, s", "vector, s", "speedup", "max diff"))
+    for duration in DURATIONS:
+        freqs, spectrum = make_spectrum(duration, FS)
+        t_loop, _ = timeit(legacy_smooth_spectrum_variable, spectrum, freqs, repeat=1)
+        t_fast, result = timeit(dsp.smooth_spectrum_variable, spectrum, freqs)
+        max_diff = np.max(np.abs(loop_smooth_spectrum_variable(spectrum, freqs) - result))
+        print("{:>8.1f} {:>10d} {:>12.4f} {:>12.4f} {:>9.0f}x {:>12.2e}".format(
+            duration, len(freqs), t_loop, t_fast, t_loop / t_fast, max_diff))
+
+    print()
+    print("Fractional-octave smoothing (10 s)")
+    freqs, spectrum = make_spectrum(10.0, FS)
+    for mode in dsp.SMOOTHING_MODES:
+        t_mode, _ = timeit(dsp.smooth_spectrum, spectrum, freqs, mode)
+        print("{:>10} {:>12.4f} s".format(mode, t_mode))
+
+
+def full_periodogram(data, fs):
+    """Исходная оценка АЧХ одним БПФ по всей записи"""
+    window = np.hanning(len(data))
+    spectrum = np.abs(np.fft.rfft(data * window)) / np.sum(window)
+    return np.fft.rfftfreq(len(data), 1 / fs), spectrum
+
+
+def peak_memory(func, *args):
+    """Пиковый объём памяти, выделенной при вызове функции (МБ)"""
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def bench_fr():
+    """Сравнение полного БПФ и оценки Уэлча по времени и памяти"""
+    print("FR estimation benchmark (fs = {} Hz)".format(FS))
+    print("{:>8} {:>12} {:>12} {:>14} {:>14} {:>8}".format(
+        "dur, s", "full, s", "welch, s", "full mem, MB", "welch mem, MB", "bins"))
+    rng = np.random.default_rng(0)
+    for duration in DURATIONS:
+        data = rng.normal(0, 0.1, int(duration * FS)).astype(np.float32)
+        t_full, _ = timeit(full_periodogram, data, FS)
+        t_welch, (freqs, _) = timeit(dsp.welch_psd, data, FS)
+        print("{:>8.1f} {:>12.4f} {:>12.4f} {:>14.1f} {:>14.1f} {:>8d}".format(
+            duration, t_full, t_welch, peak_memory(full_periodogram, data, FS),
+            peak_memory(dsp.welch_psd, data, FS), len(freqs)))
+
+
+def bench_convolver():
+    """Блочная свёртка при прослушивании коррекции: время на блок и запас относительно реального времени"""
+    print("Partitioned convolution ({} channels, fs = {} Hz)".format(CONVOLVER_CHANNELS, FS))
+    print("{:>8} {:>8} {:>8} {:>14} {:>14} {:>10}".format(
+        "taps", "block", "parts", "per block, ms", "block len, ms", "realtime"))
+    rng = np.random.default_rng(0)
+    signal = rng.normal(0, 0.1, int(CONVOLVER_SECONDS * FS))
+    for taps in CONVOLVER_TAPS:
+        firs = rng.normal(0, 1, (CONVOLVER_CHANNELS, taps)) * np.exp(-np.arange(taps) / (taps / 8))
+        for block_size in CONVOLVER_BLOCKS:
+            convolver = dsp.PartitionedConvolver(firs, block_size)
+            blocks = signal[:len(signal) // block_size * block_size].reshape(-1, block_size)
+            start = time.perf_counter()
+            for block in blocks:
+                convolver.process(block)
+            per_block = (time.perf_counter() - start) / len(blocks)
+            block_seconds = block_size / FS
+            print("{:>8d} {:>8d} {:>8d} {:>14.3f} {:>14.2f} {:>9.0f}x".format(
+                taps, block_size, convolver.num_parts, per_block * 1000, block_seconds * 1000,
+                block_seconds / per_block))
+
+
+def install_loopback(num_channels, fs):
+    """Подмена звукового устройства имитацией с петлёй выход -> вход"""
+    gains = np.linspace(0.5, 1.0, num_channels)
+    measurement.sd = loopback.LoopbackDevice(num_channels, fs, gains=gains,
+                                             room=loopback.synthetic_room(fs, length_seconds=ROOM_SECONDS),
+                                             noise=1e-4)
+    measurement.LATENCY_CACHE.clear()
+
+
+def generate_excitation(duration, fs):
+    """Генерация шума без кэша возбуждений"""
+    measurement.get_excitation.cache_clear()
+    return measurement.generate_white_noise(duration, fs)
+
+
+def make_plot_window():
+    """Окно графика АЧХ для замера отрисовки и причина пропуска этапа (None, если окно создано)"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5 import QtWidgets
+        import gui
+    except ImportError as e:
+        return None, str(e)
+    make_plot_window.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    return gui.FrPlotWindow(), None
+
+
+def draw_plot(window, fr, x_positions):
+    """Обновление данных окна АЧХ с полной перерисовкой холста"""
+    labels = {"title": "", "raw": "raw", "smoothed": "smoothed", "filtered": "filtered",
+              "harmonic": "H{k}", "spread": "spread", "xlabel": "", "ylabel": ""}
+    window.update_plot(fr, x_positions, FREQ_TICKS, labels)
+    window.canvas.draw()
+
+
+def bench_pipeline(sample_rates, durations, channel_counts, repeat=3):
+    """Время этапов от генерации шума до отрисовки АЧХ
+
+    Возвращает список записей {stage, fs, duration, channels, seconds}; для этапов,
+    не зависящих от числа каналов, channels равно None. Пропущенный этап (нет Qt)
+    записывается с seconds равным None и причиной в skipped.
+    """
+    results = []
+    plot_window, plot_skipped = make_plot_window()
+    print("Pipeline benchmark (loopback device)")
+    print("{:>16} {:>8} {:>8} {:>8} {:>12}".format("stage", "fs, Hz", "dur, s", "ch", "time, s"))
+
+    def record(stage, fs, duration, channels, seconds, skipped=None):
+        entry = {"stage": stage, "fs": fs, "duration": duration, "channels": channels, "seconds": seconds}
+        if skipped is not None:
+            entry["skipped"] = skipped
+            print("{:>16} {:>8d} {:>8.1f} {:>8} {:>12}  ({})".format(stage, fs, duration, "-", "skipped", skipped))
+        else:
+            print("{:>16} {:>8d} {:>8.1f} {:>8} {:>12.4f}".format(stage, fs, duration, channels or "-", seconds))
+        results.append(entry)
+
+    for fs in sample_rates:
+        for duration in durations:
+            record("excitation", fs, duration, None, timeit(generate_excitation, duration, fs, repeat=repeat)[0])
+
+            recording = None
+            for num_channels in channel_counts:
+                install_loopback(num_channels, fs)
+                seconds, result = timeit(measurement.measure_channel, loopback.INPUT_DEVICE,
+                                         loopback.OUTPUT_DEVICE, 0, num_channels, fs, duration, repeat=1)
+                record("test_channel", fs, duration, num_channels, seconds)
+                recording = result.recording
+                seconds, _ = timeit(measurement.measure_channels, loopback.INPUT_DEVICE, loopback.OUTPUT_DEVICE,
+                                    list(range(num_channels)), duration, FR_PARAMS, repeat=1)
+                record("session", fs, duration, num_channels, seconds)
+
+            seconds, (freqs, spectrum) = timeit(dsp.fr_spectrum, recording, fs, *FR_PARAMS, repeat=repeat)
+            record("compute_fr", fs, duration, None, seconds)
+            seconds, smoothed = timeit(dsp.smooth_spectrum, spectrum, freqs, repeat=repeat)
+            record("smoothing", fs, duration, None, seconds)
+            record("savgol", fs, duration, None,
+                   timeit(analysis.savgol_filter_spectrum, freqs, smoothed, repeat=repeat)[0])
+            fr = analysis.analyze_fr(freqs, spectrum)
+            seconds, x_positions = timeit(dsp.map_frequencies, fr.freqs, FREQ_TICKS, repeat=repeat)
+            record("map_frequencies", fs, duration, None, seconds)
+            if plot_window is not None:
+                record("plot", fs, duration, None,
+                       timeit(draw_plot, plot_window, fr, x_positions, repeat=repeat)[0])
+            else:
+                record("plot", fs, duration, None, None, skipped=plot_skipped)
+    return results
+
+
+def write_results(results, path):
+    """Запись результатов замеров в JSON вместе со сведениями о платформе"""
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Benchmarks without audio hardware")
+    parser.add_argument("--json", metavar="PATH", help="write pipeline timings to a JSON file")
+    parser.add_argument("--quick", action="store_true",
+                        help="one sample rate, duration and channel count; skip the slow loop reference")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.quick:
+        results = bench_pipeline([FS], [1.0], [CHANNEL_COUNTS[0]], repeat=1)
+    else:
+        bench_smoothing()
+        print()
+        bench_fr()
+        print()
+        bench_convolver()
+        print()
+        results = bench_pipeline(SAMPLE_RATES, DURATIONS, CHANNEL_COUNTS)
+    if args.json:
+        write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
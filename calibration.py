@@ -0,0 +1,41 @@
+"""Подстройка уровней каналов: точные поправки в дБ и выбор каналов для повторной проверки
+
+Опорный уровень - среднее по каналам, уровень которых уже в допуске
+относительно общего среднего (без сабвуфера). Эти каналы не подстраиваются,
+поэтому после установки поправок остальных каналов среднее совпадает с
+опорным уровнем и итерации сходятся за один-два шага.
+"""
+
+RETEST_SECONDS = 1.0  # Длительность короткого замера при повторной проверке
+
+
+class TrimPlan:
+    """Опорный уровень и поправки каналов
+
+    differences - отклонение уровня каждого канала от опорного (дБ),
+    trims - поправка, которую нужно внести в ресивере (дБ, с обратным знаком),
+    out_of_tolerance - каналы с отклонением больше допуска по возрастанию номера.
+    """
+
+    def __init__(self, average, target, differences, error_margin):
+        self.average = average
+        self.target = target
+        self.differences = differences
+        self.trims = {channel: -difference for channel, difference in differences.items()}
+        self.out_of_tolerance = sorted(channel for channel, difference in differences.items()
+                                       if abs(difference) > error_margin)
+
+    def within_tolerance(self, channel):
+        return channel not in self.out_of_tolerance
+
+
+def plan_trims(levels, error_margin, subwoofer=None):
+    """Поправки по словарю {канал: уровень, дБ}; None, если нет каналов кроме сабвуфера"""
+    reference = {channel: level for channel, level in levels.items() if channel != subwoofer}
+    if not reference:
+        return None
+    average = sum(reference.values()) / len(reference)
+    in_tolerance = [level for level in reference.values() if abs(level - average) <= error_margin]
+    target = sum(in_tolerance) / len(in_tolerance) if in_tolerance else average
+    differences = {channel: level - target for channel, level in levels.items()}
+    return TrimPlan(average, target, differences, error_margin)
@@ -0,0 +1,19 @@
+"""Файл настроек, общий для графического интерфейса и пакетного режима"""
+import json
+
+CONFIG_FILE = "settings.json"
+
+
+def load_settings():
+    """Загрузка сохранённых настроек"""
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_settings(settings):
+    """Сохранение настроек"""
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(settings, f)
@@ -0,0 +1,267 @@
+"""Коррекция АЧХ каналов: набор параметрических фильтров (PEQ) или КИХ-фильтр минимальной фазы
+и предпрослушивание коррекции через устройство вывода
+
+Поправка - разность целевой кривой и сглаженной 1/6 октавы АЧХ канала,
+выровненной по среднему уровню в полосе коррекции. Подъёмы ограничены
+сильнее, чем вырезы: провалы от интерференции в комнате подъёмом не
+исправляются, а только перегружают усилитель. Вне полосы поправка плавно
+спадает до нуля за пол-октавы.
+"""
+import wave
+import numpy as np
+
+import diagnostics
+import dsp
+import measurement
+
+CORRECTION_METHODS = ["peq", "fir"]
+CORRECTION_SMOOTHING = "1/6"
+CORRECTION_GRID_POINTS = 384
+CORRECTION_RANGE = (20.0, 20000.0)
+SUBWOOFER_RANGE = (20.0, 200.0)
+TAPER_OCTAVES = 0.5  # Ширина спада поправки за границами полосы
+MAX_BOOST_DB = 6.0
+MAX_CUT_DB = 15.0
+
+PEQ_MAX_FILTERS = 10
+PEQ_MIN_GAIN_DB = 1.0  # Подбор прекращается, когда остаток меньше этого значения
+PEQ_Q_RANGE = (0.5, 10.0)
+
+FIR_TAPS = [4096, 8192, 16384, 32768, 65536]
+DEFAULT_FIR_TAPS = 8192
+
+PREVIEW_BLOCK = 512  # Размер блока потока и частей фильтра при предпрослушивании
+PREVIEW_SOURCES = ["pink", "file"]
+PREVIEW_PINK_SECONDS = 10.0
+
+
+def target_curve(freqs, slope_db_per_octave=0.0, f_ref=1000.0):
+    """Целевая кривая: наклон в дБ на октаву относительно f_ref (0 - ровная АЧХ)"""
+    return slope_db_per_octave * np.log2(freqs / f_ref)
+
+
+def band_taper(freqs, f_range, octaves=TAPER_OCTAVES):
+    """Вес поправки: 1 в полосе f_range с косинусным спадом до 0 за её границами"""
+    distance = np.maximum(np.log2(f_range[0] / freqs), np.log2(freqs / f_range[1]))
+    distance = np.clip(distance / octaves, 0.0, 1.0)
+    return 0.5 * (1 + np.cos(np.pi * distance))
+
+
+def peak_bandwidth_q(freqs, residual, index):
+    """Добротность колокола по ширине пика остатка на половине его высоты"""
+    peak = residual[index]
+    inside = np.sign(residual) == np.sign(peak)
+    inside &= np.abs(residual) >= abs(peak) / 2
+    low = index
+    while low > 0 and inside[low - 1]:
+        low -= 1
+    high = index
+    while high < len(freqs) - 1 and inside[high + 1]:
+        high += 1
+    octaves = max(np.log2(freqs[high] / freqs[low]), 1e-3)
+    ratio = 2 ** octaves
+    return float(np.clip(np.sqrt(ratio) / (ratio - 1), *PEQ_Q_RANGE))
+
+
+def design_peq(freqs, correction_db, fs, f_range, max_filters=PEQ_MAX_FILTERS):
+    """Жадный подбор колоколообразных фильтров под поправку на логарифмической сетке
+
+    На каждом шаге ставится фильтр на наибольшее отклонение остатка в полосе
+    f_range с шириной по половине высоты пика. Возвращает список (частота, усиление, добротность)
+    и секции SOS.
+    """
+    filters = []
+    sections = []
+    response = np.zeros_like(correction_db)
+    usable = (freqs >= f_range[0]) & (freqs <= f_range[1])
+    for _ in range(max_filters):
+        residual = np.where(usable, correction_db - response, 0.0)
+        index = int(np.argmax(np.abs(residual)))
+        gain = float(np.clip(residual[index], -MAX_CUT_DB, MAX_BOOST_DB))
+        if abs(gain) < PEQ_MIN_GAIN_DB:
+            break
+        q = peak_bandwidth_q(freqs, residual, index)
+        section = dsp.peaking_biquad(freqs[index], gain, q, fs)
+        filters.append((float(freqs[index]), gain, q))
+        sections.append(section)
+        response += dsp.sos_response_db(section[None], freqs, fs)
+    sos = np.array(sections) if sections else np.empty((0, 6))
+    return filters, sos
+
+
+class ChannelCorrection:
+    """Поправка канала и спроектированные фильтры
+
+    Все кривые заданы на логарифмической сетке freqs: measured_db - сглаженная
+    АЧХ, выровненная по целевой кривой, correction_db - требуемая поправка,
+    predicted_db - АЧХ после коррекции выбранным методом.
+    """
+
+    def __init__(self, channel, fs, freqs, measured_db, target_db, correction_db, method, filters, sos, fir):
+        self.channel = channel
+        self.fs = fs
+        self.freqs = freqs
+        self.measured_db = measured_db
+        self.target_db = target_db
+        self.correction_db = correction_db
+        self.method = method
+        self.filters = filters
+        self.sos = sos
+        self.fir = fir
+
+    def response_db(self):
+        """АЧХ корректирующего фильтра на сетке freqs"""
+        if self.method == "peq":
+            if not len(self.sos):
+                return np.zeros_like(self.freqs)
+            return dsp.sos_response_db(self.sos, self.freqs, self.fs)
+        spectrum = np.fft.rfft(self.fir, 4 * len(self.fir))
+        fft_freqs = np.fft.rfftfreq(4 * len(self.fir), 1 / self.fs)
+        return np.interp(self.freqs, fft_freqs, 20 * np.log10(np.abs(spectrum) + 1e-20))
+
+    def predicted_db(self):
+        return self.measured_db + self.response_db()
+
+    def max_gain_db(self):
+        """Наибольший подъём фильтра (для запаса по уровню при прослушивании)"""
+        return max(0.0, float(np.max(self.response_db())))
+
+
+def design_correction(channel, freqs, spectrum, fs, method="peq", f_range=CORRECTION_RANGE, slope=0.0,
+                      max_filters=PEQ_MAX_FILTERS, num_taps=DEFAULT_FIR_TAPS):
+    """Поправка канала по измеренному спектру и фильтр выбранным методом"""
+    with diagnostics.DIAGNOSTICS.stage("correction"):
+        smoothed = np.abs(dsp.smooth_spectrum(spectrum, freqs, CORRECTION_SMOOTHING))
+        f_high = min(f_range[1], dsp.LEVEL_BAND_MAX_RATIO * fs)
+        grid, magnitude = dsp.resample_spectrum(freqs, smoothed, CORRECTION_GRID_POINTS)
+        measured_db = 20 * np.log10(magnitude + 1e-20)
+        target_db = target_curve(grid, slope)
+        in_band = (grid >= f_range[0]) & (grid <= f_high)
+        if not np.any(in_band):
+            raise measurement.MeasurementError("correction_range_error")
+        # Сетка логарифмическая, поэтому простое среднее - среднее по октавам
+        measured_db = measured_db - np.mean(measured_db[in_band] - target_db[in_band])
+        correction_db = np.clip(target_db - measured_db, -MAX_CUT_DB, MAX_BOOST_DB)
+        f_range = (f_range[0], f_high)
+        correction_db *= band_taper(grid, f_range)
+        filters, sos, fir = [], np.empty((0, 6)), None
+        if method == "peq":
+            filters, sos = design_peq(grid, correction_db, fs, f_range, max_filters)
+        else:
+            fir = dsp.minimum_phase_fir(grid, correction_db, fs, num_taps)
+    return ChannelCorrection(channel, fs, grid, measured_db, target_db, correction_db, method, filters, sos, fir)
+
+
+def peq_text(correction):
+    """Фильтры PEQ в текстовом формате, который импортируют REW и Equalizer APO"""
+    lines = ["Filter Settings file", f"Channel: {correction.channel + 1}", f"Sample rate: {correction.fs} Hz", ""]
+    for number, (freq, gain, q) in enumerate(correction.filters, 1):
+        lines.append(f"Filter {number}: ON PK Fc {freq:.1f} Hz Gain {gain:.1f} dB Q {q:.2f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_correction(path, correction):
+    """Сохранение фильтров: PEQ - текстом, КИХ - коэффициентами по одному в строке"""
+    with open(path, "w") as f:
+        if correction.method == "peq":
+            f.write(peq_text(correction))
+        else:
+            np.savetxt(f, correction.fir, fmt="%.9e")
+
+
+def read_wav(path, fs):
+    """Моно-сигнал из WAV (PCM 16/24/32 бит), приведённый к частоте fs"""
+    import scipy.signal
+    with wave.open(path, "rb") as f:
+        width = f.getsampwidth()
+        channels = f.getnchannels()
+        file_fs = f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 3:
+        # 24 бит: дополняем каждый отсчёт до 32 бит младшим нулевым байтом
+        raw = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        raw = np.pad(raw, ((0, 0), (1, 0))).tobytes()
+        width = 4
+    if width not in (2, 4):
+        raise measurement.MeasurementError("wav_format_error", width=width * 8)
+    data = np.frombuffer(raw, dtype=f"<i{width}").astype(np.float32) / float(2 ** (8 * width - 1))
+    data = data.reshape(-1, channels).mean(axis=1)
+    if file_fs != fs:
+        divisor = np.gcd(int(fs), int(file_fs))
+        data = scipy.signal.resample_poly(data, fs // divisor, file_fs // divisor).astype(np.float32)
+    return data
+
+
+class CorrectionPreview:
+    """Воспроизведение источника через фильтры коррекции в реальном времени
+
+    Один и тот же моно-сигнал (зацикленный розовый шум или файл) подаётся в
+    каналы corrections. Фильтры PEQ работают как цепочка биквадратных секций с
+    состоянием, переносимым между блоками, поэтому звучат без обрезки
+    импульсной характеристики. КИХ-фильтры свёртываются с разбиением на части
+    по размеру блока потока с задержкой в один блок, поэтому длинные фильтры на
+    всех каналах укладываются в поток. bypass отключает коррекцию для сравнения;
+    уровень в обоих режимах снижен на наибольший подъём фильтров, чтобы
+    скорректированный сигнал не перегружал выход. Поток открывается только на
+    выход: вход при прослушивании не нужен.
+    """
+
+    def __init__(self, output_device_id, num_channels, fs, corrections, source=None, block_size=PREVIEW_BLOCK):
+        self.fs = fs
+        self.block_size = block_size
+        self.channels = [correction.channel for correction in corrections]
+        self.signal = source if source is not None else measurement.get_excitation(
+            "pink", fs, PREVIEW_PINK_SECONDS)
+        fir_corrections = [correction for correction in corrections if correction.method == "fir"]
+        self.fir_channels = [correction.channel for correction in fir_corrections]
+        self.convolver = None
+        if fir_corrections:
+            length = max(len(correction.fir) for correction in fir_corrections)
+            firs = np.array([np.pad(correction.fir, (0, length - len(correction.fir)))
+                             for correction in fir_corrections])
+            self.convolver = dsp.PartitionedConvolver(firs, block_size)
+        # Каналы PEQ: [канал, секции, состояние фильтра]; пустая цепочка пропускает сигнал как есть
+        self.peq = [[correction.channel, correction.sos, np.zeros((len(correction.sos), 2))]
+                    for correction in corrections if correction.method == "peq" and len(correction.sos)]
+        self.gain = 10 ** (-max(correction.max_gain_db() for correction in corrections) / 20)
+        self.bypass = False
+        self.position = 0
+        # Модуль sounddevice берётся из measurement: там же он подменяется имитацией устройства
+        self.stream = measurement.sd.OutputStream(samplerate=fs, device=output_device_id,
+                                                  channels=num_channels, dtype='float32',
+                                                  blocksize=block_size, callback=self.callback)
+
+    def callback(self, outdata, frames, time, status):
+        if status:
+            diagnostics.DIAGNOSTICS.count_status(status)
+        outdata.fill(0)
+        block = np.take(self.signal, np.arange(self.position, self.position + frames), mode='wrap') * self.gain
+        self.position = (self.position + frames) % len(self.signal)
+        outdata[:, self.channels] = block[:, None]
+        # Фильтры работают и в режиме bypass, чтобы при переключении не было щелчка от пустой истории
+        # Блок нестандартного размера (бывает при запуске потока) уходит мимо свёртки без коррекции
+        filtered = None
+        if self.convolver is not None and frames == self.block_size:
+            filtered = self.convolver.process(block)
+        peq_outputs = []
+        if self.peq:
+            import scipy.signal
+            for state in self.peq:
+                output, state[2] = scipy.signal.sosfilt(state[1], block, zi=state[2])
+                peq_outputs.append((state[0], output))
+        if self.bypass:
+            return
+        if filtered is not None:
+            outdata[:, self.fir_channels] = filtered
+        for channel, output in peq_outputs:
+            outdata[:, channel] = output
+
+    def set_bypass(self, bypass):
+        self.bypass = bypass
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.abort()
+        self.stream.close()
@@ -0,0 +1,97 @@
+"""Диагностика измерений: время этапов, сбои потока (xrun) и журнал событий
+
+Все модули пишут в общий экземпляр DIAGNOSTICS. Таймеры этапов накапливают
+число вызовов, суммарное и максимальное время; флаги статуса обратного вызова
+sounddevice считаются по видам. События хранятся в памяти (последние
+MAX_EVENTS) и, если задан log_path, дописываются в файл по одному JSON-объекту
+на строку.
+"""
+import collections
+import contextlib
+import datetime
+import json
+import threading
+import time
+
+STATUS_FLAGS = ["input_underflow", "input_overflow", "output_underflow", "output_overflow", "priming_output"]
+MAX_EVENTS = 500
+LOG_FILE = "diagnostics.jsonl"
+
+
+class Diagnostics:
+    """Потокобезопасный сборщик таймеров, счётчиков статуса потока и событий
+
+    count_status вызывается из обратного вызова звукового потока и не берёт
+    блокировку: в каждый момент счётчики меняет только один поток.
+    """
+
+    def __init__(self, log_path=None):
+        self.lock = threading.Lock()
+        self.log_path = log_path
+        self.reset()
+
+    def reset(self):
+        """Сброс всех таймеров, счётчиков и событий"""
+        with self.lock:
+            self.stages = {}
+            self.status_counts = dict.fromkeys(STATUS_FLAGS, 0)
+            self.events = collections.deque(maxlen=MAX_EVENTS)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Замер времени выполнения блока как этапа name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start)
+
+    def add_timing(self, name, seconds):
+        """Учёт одного выполнения этапа"""
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+
+    def count_status(self, status):
+        """Учёт флагов статуса обратного вызова sounddevice (CallbackFlags)"""
+        for flag in STATUS_FLAGS:
+            if getattr(status, flag, False):
+                self.status_counts[flag] += 1
+
+    def xruns(self):
+        """Общее число недогрузок и переполнений буферов потока"""
+        return sum(count for flag, count in self.status_counts.items() if flag != "priming_output")
+
+    def log(self, event, **fields):
+        """Запись события в журнал"""
+        entry = {"time": datetime.datetime.now().isoformat(timespec="milliseconds"), "event": event}
+        entry.update(fields)
+        with self.lock:
+            self.events.append(entry)
+            if self.log_path is not None:
+                try:
+                    with open(self.log_path, "a") as f:
+                        f.write(json.dumps(entry, default=str) + "\n")
+                except OSError:
+                    # Журнал в файле необязателен: события остаются в памяти
+                    self.log_path = None
+
+    def snapshot(self):
+        """Копия текущего состояния: этапы (со средним временем), статус потока и события"""
+        with self.lock:
+            stages = {name: dict(stats, mean=stats["total"] / stats["count"])
+                      for name, stats in self.stages.items()}
+            return {"stages": stages, "stream_status": dict(self.status_counts), "events": list(self.events)}
+
+    def write_json(self, path):
+        """Сохранение состояния в файл JSON"""
+        report = dict(self.snapshot(), created=datetime.datetime.now().isoformat(timespec="seconds"))
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+DIAGNOSTICS = Diagnostics()
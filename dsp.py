@@ -0,0 +1,683 @@
+"""Функции цифровой обработки сигналов, не зависящие от интерфейса"""
+import functools
+import numpy as np
+import scipy.fft
+
+# Доступные режимы сглаживания АЧХ: ключ -> доля октавы (None для переменного окна)
+SMOOTHING_MODES = {
+    "variable": None,
+    "1/3": 3,
+    "1/6": 6,
+    "1/12": 12,
+    "1/24": 24,
+}
+
+
+def window_mean(values, start, end, weights=None):
+    """Среднее значение по окнам [start, end) через префиксные суммы за O(N)
+
+    weights - необязательные веса точек (ширина их участков частот на
+    неравномерной сетке), тогда среднее взвешенное.
+    """
+    if weights is not None:
+        cumsum = np.concatenate(([0.0], np.cumsum(values * weights, dtype=np.float64)))
+        total = np.concatenate(([0.0], np.cumsum(weights, dtype=np.float64)))
+        return (cumsum[end] - cumsum[start]) / (total[end] - total[start])
+    cumsum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    counts = np.maximum(end - start, 1)
+    return (cumsum[end] - cumsum[start]) / counts
+
+
+def grid_weights(freqs):
+    """Ширина участков частот точек неравномерной сетки (Гц); None для равномерной сетки БПФ
+
+    На логарифмической сетке (сводка spectrum в режиме хранения summary,
+    усреднение по положениям микрофона) точки в нижней части окна сглаживания
+    расположены гуще, и простое среднее завышало бы их вклад.
+    """
+    steps = np.diff(freqs)
+    if len(steps) == 0 or np.allclose(steps, steps[0]):
+        return None
+    return np.diff(bin_edges(np.asarray(freqs, dtype=np.float64)))
+
+
+# Ширина переменного окна в Гц растёт с логарифмом частоты; окна заданы в Гц,
+# а не в бинах, поэтому результат не зависит от шага сетки частот
+VARIABLE_WINDOW_HZ = 2.5  # Ширина окна на единицу натурального логарифма частоты
+VARIABLE_WINDOW_MIN_HZ = 1.5
+VARIABLE_WINDOW_MAX_HZ = 50.5
+
+
+def variable_window_widths(freqs):
+    """Ширина окна сглаживания (Гц), растущая логарифмически с частотой"""
+    widths = np.log(np.maximum(freqs, 1e-10)) * VARIABLE_WINDOW_HZ
+    return np.clip(widths, VARIABLE_WINDOW_MIN_HZ, VARIABLE_WINDOW_MAX_HZ)
+
+
+def window_bounds(freqs, lower, upper):
+    """Границы окон [start, end) по частотам [lower, upper]; в окно всегда входит сам бин
+
+    Сетка freqs может быть неравномерной (например, логарифмической).
+    """
+    indices = np.arange(len(freqs))
+    start = np.minimum(np.searchsorted(freqs, lower, side='left'), indices)
+    end = np.maximum(np.searchsorted(freqs, upper, side='right'), indices + 1)
+    return start, end
+
+
+def smooth_spectrum_variable(spectrum, freqs):
+    """Сглаживание спектра с переменным размером окна на логарифмической шкале"""
+    half_widths = variable_window_widths(freqs) / 2
+    start, end = window_bounds(freqs, freqs - half_widths, freqs + half_widths)
+    return window_mean(spectrum, start, end, grid_weights(freqs)).astype(spectrum.dtype, copy=False)
+
+
+def smooth_spectrum_octave(spectrum, freqs, fraction):
+    """Сглаживание спектра в полосе 1/fraction октавы вокруг каждой частоты (усреднение мощности)"""
+    half_band = 2.0 ** (1.0 / (2 * fraction))
+    start, end = window_bounds(freqs, freqs / half_band, freqs * half_band)
+    power = np.square(spectrum, dtype=np.float64)
+    return np.sqrt(window_mean(power, start, end, grid_weights(freqs))).astype(spectrum.dtype, copy=False)
+
+
+def smooth_spectrum(spectrum, freqs, mode="variable"):
+    """Сглаживание спектра в выбранном режиме"""
+    if mode not in SMOOTHING_MODES:
+        raise ValueError(f"Unknown smoothing mode: {mode}")
+    fraction = SMOOTHING_MODES[mode]
+    if fraction is None:
+        return smooth_spectrum_variable(spectrum, freqs)
+    return smooth_spectrum_octave(spectrum, freqs, fraction)
+
+
+# Параметры оценки спектра методом Уэлча
+WELCH_SEGMENT_LENGTHS = [1024, 2048, 4096, 8192, 16384, 32768, 65536]
+WELCH_WINDOWS = ["hann", "hamming", "blackman", "blackmanharris"]
+WELCH_BATCH_SEGMENTS = 32  # Сколько сегментов обрабатывается за одно БПФ
+
+
+class WelchAccumulator:
+    """Усреднённая периодограмма Уэлча, накапливаемая по блокам с фиксированным расходом памяти"""
+
+    def __init__(self, fs, segment_length=8192, overlap=0.5, window="hann"):
+        if not 0 <= overlap < 1:
+            raise ValueError(f"Overlap must be in [0, 1): {overlap}")
+        self.fs = fs
+        self.segment_length = int(segment_length)
+        self.step = max(1, int(round(self.segment_length * (1 - overlap))))
+        # scipy.signal импортируется по требованию: загрузка модуля дольше всего остального расчёта
+        import scipy.signal
+        self.window = scipy.signal.get_window(window, self.segment_length).astype(np.float32)
+        # Нормировка на плотность мощности (В²/Гц)
+        self.scale = 1.0 / (fs * np.sum(self.window.astype(np.float64) ** 2))
+        self.power_sum = np.zeros(self.segment_length // 2 + 1)
+        self.num_segments = 0
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def feed(self, block):
+        """Добавляет очередной блок записи"""
+        block = np.asarray(block, dtype=np.float32).ravel()
+        pending = np.concatenate((self.pending, block)) if self.pending.size else block
+        if len(pending) < self.segment_length:
+            self.pending = pending.copy()
+            return
+
+        count = 1 + (len(pending) - self.segment_length) // self.step
+        segments = np.lib.stride_tricks.sliding_window_view(pending, self.segment_length)[::self.step][:count]
+        for first in range(0, count, WELCH_BATCH_SEGMENTS):
+            batch = segments[first:first + WELCH_BATCH_SEGMENTS] * self.window
+            self.power_sum += np.sum(np.abs(np.fft.rfft(batch, axis=1)) ** 2, axis=0)
+        self.num_segments += count
+        # Сохраняем только хвост, который ещё войдёт в следующие сегменты
+        self.pending = pending[count * self.step:].copy()
+
+    def freqs(self):
+        """Частотная сетка оценки"""
+        return np.fft.rfftfreq(self.segment_length, 1 / self.fs)
+
+    def psd(self):
+        """Односторонняя спектральная плотность мощности"""
+        power_sum = self.power_sum
+        num_segments = self.num_segments
+        if num_segments == 0:
+            # Запись короче сегмента: одна периодограмма по дополненному нулями остатку
+            segment = np.zeros(self.segment_length, dtype=np.float32)
+            segment[:len(self.pending)] = self.pending
+            power_sum = np.abs(np.fft.rfft(segment * self.window)) ** 2
+            num_segments = 1
+        psd = power_sum * (self.scale / num_segments)
+        psd[1:-1 if self.segment_length % 2 == 0 else None] *= 2
+        return self.freqs(), psd
+
+
+def welch_psd(data, fs, segment_length=8192, overlap=0.5, window="hann", chunk_size=65536):
+    """Оценка СПМ методом Уэлча с обработкой записи фрагментами"""
+    segment_length = min(int(segment_length), len(data))
+    accumulator = WelchAccumulator(fs, segment_length, overlap, window)
+    for start in range(0, len(data), chunk_size):
+        accumulator.feed(data[start:start + chunk_size])
+    return accumulator.psd()
+
+
+def fr_spectrum(data, fs, segment_length=8192, overlap_percent=50, window="hann"):
+    """АЧХ как корень из СПМ Уэлча, чтобы 20*log10 давал уровень СПМ в дБ"""
+    freqs, psd = welch_psd(data, fs, segment_length, overlap_percent / 100, window)
+    return freqs, np.sqrt(psd)
+
+
+def average_spectra(spectra, weights=None):
+    """Взвешенное усреднение мощности нескольких спектров на общей частотной сетке
+
+    spectra - список пар (freqs, psd); сетка берётся у первого спектра,
+    остальные при необходимости интерполируются на неё.
+    """
+    if not spectra:
+        raise ValueError("No spectra to average")
+    grid = spectra[0][0]
+    if weights is None:
+        weights = np.ones(len(spectra))
+    weights = np.asarray(weights, dtype=np.float64)
+    total = np.zeros(len(grid))
+    for (freqs, psd), weight in zip(spectra, weights):
+        if len(freqs) != len(grid) or not np.array_equal(freqs, grid):
+            psd = np.interp(grid, freqs, psd)
+        total += weight * psd
+    return grid, total / np.sum(weights)
+
+
+# Параметры мультитонального возбуждения для одновременного измерения каналов
+MULTITONE_MIN_PERIOD = 8192
+MULTITONE_MAX_PERIOD = 65536
+MULTITONE_MIN_FREQ = 10.0
+
+
+def multitone_period(num_samples, min_periods=3):
+    """Длина периода (степень двойки), при которой в сигнал укладывается не меньше min_periods периодов"""
+    period = 2 ** int(np.floor(np.log2(max(num_samples / min_periods, 1))))
+    return int(np.clip(period, MULTITONE_MIN_PERIOD, MULTITONE_MAX_PERIOD))
+
+
+def multitone_bins(num_channels, period, fs, f_min=MULTITONE_MIN_FREQ):
+    """Разбиение бинов БПФ между каналами через один: канал c получает бины c, c + num_channels, ..."""
+    first = max(1, int(np.ceil(f_min * period / fs)))
+    bins = np.arange(first, period // 2)
+    return [bins[c::num_channels] for c in range(num_channels)]
+
+
+def generate_multitone(bins, period, rms, rng):
+    """Один период мультитона со случайными фазами на заданных бинах и заданным RMS"""
+    spectrum = np.zeros(period // 2 + 1, dtype=np.complex128)
+    spectrum[bins] = np.exp(2j * np.pi * rng.random(len(bins)))
+    signal = np.fft.irfft(spectrum, period)
+    signal *= rms / np.sqrt(np.mean(signal ** 2))
+    return signal.astype(np.float32)
+
+
+def separate_multitone(capture, period, channel_bins, fs, skip_periods=1):
+    """Разделение отклика на мультитон по каналам
+
+    Записанные периоды (после переходного процесса) синхронно усредняются, после чего
+    мощность каждого канала берётся только из его бинов. Возвращает список
+    (уровень в дБ, частоты, корень из эквивалентной СПМ) по каналам.
+    """
+    num_periods = len(capture) // period - skip_periods
+    if num_periods < 1:
+        raise ValueError("Capture is too short for multitone analysis")
+    periods = capture[skip_periods * period:(skip_periods + num_periods) * period]
+    averaged = periods.reshape(num_periods, period).mean(axis=0)
+    tone_power = 2 * np.abs(np.fft.rfft(averaged)) ** 2 / period ** 2
+    # Шаг сетки тонов одного канала: мощность тона делится на него, чтобы получить СПМ,
+    # сопоставимую с откликом на белый шум той же мощности
+    spacing = len(channel_bins) * fs / period
+    results = []
+    for bins in channel_bins:
+        power = tone_power[bins]
+        level = 10 * np.log10(np.sum(power) + 1e-20)
+        results.append((level, bins * fs / period, np.sqrt(power / spacing)))
+    return results
+
+
+# Параметры экспоненциального свипа (метод Фарины)
+SWEEP_FADE_SECONDS = 0.01  # Плавное нарастание и спад на краях свипа
+SWEEP_AMPLITUDE = 0.1 * np.sqrt(2)  # RMS свипа равен RMS белого шума
+IR_SECONDS = 0.3  # Длина вырезаемой импульсной характеристики
+IR_PRE_SECONDS = 0.002  # Запас перед пиком импульсной характеристики
+SWEEP_MAX_HARMONIC = 5
+
+
+@functools.lru_cache(maxsize=8)
+def sweep_design(fs, duration, f_min, f_max):
+    """Экспоненциальный свип и его обратный фильтр; кэшируются по (fs, duration, f_min, f_max)
+
+    Возвращает (свип, обратный фильтр, скорость свипа L), где частота свипа
+    равна f_min * exp(t / L). Массивы доступны только для чтения.
+    """
+    samples = int(duration * fs)
+    t = np.arange(samples) / fs
+    rate = duration / np.log(f_max / f_min)
+    sweep = np.sin(2 * np.pi * f_min * rate * (np.exp(t / rate) - 1))
+    fade = int(SWEEP_FADE_SECONDS * fs)
+    ramp = np.hanning(2 * fade)
+    sweep[:fade] *= ramp[:fade]
+    sweep[-fade:] *= ramp[fade:]
+    sweep *= SWEEP_AMPLITUDE
+
+    # Обратный фильтр: свип, обращённый во времени, с огибающей, спадающей на 6 дБ/окт
+    # от высоких частот (начало) к низким (конец)
+    inverse = sweep[::-1] * np.exp(-t / rate)
+    nfft = scipy.fft.next_fast_len(2 * samples)
+    gain = np.abs(np.fft.rfft(sweep, nfft) * np.fft.rfft(inverse, nfft))
+    freqs = np.fft.rfftfreq(nfft, 1 / fs)
+    band = (freqs >= 2 * f_min) & (freqs <= f_max / 2)
+    inverse /= np.mean(gain[band])
+
+    sweep = sweep.astype(np.float32)
+    sweep.flags.writeable = False
+    inverse.flags.writeable = False
+    return sweep, inverse, rate
+
+
+def deconvolve_sweep(capture, inverse, fs, rate, max_harmonic=SWEEP_MAX_HARMONIC):
+    """Импульсные характеристики линейной части и гармоник из отклика на свип
+
+    Возвращает (задержка в отсчётах, линейная ИХ, {порядок гармоники: ИХ}).
+    Гармоники порядка k при свёртке с обратным фильтром оказываются раньше
+    линейной ИХ на rate * ln(k) секунд.
+    """
+    import scipy.signal
+    response = scipy.signal.fftconvolve(capture, inverse)
+    start = len(inverse) - 1
+    peak = start + int(np.argmax(np.abs(response[start:])))
+    pre = int(IR_PRE_SECONDS * fs)
+    length = int(IR_SECONDS * fs)
+    impulse_response = response[max(peak - pre, 0):peak - pre + length]
+
+    harmonics = {}
+    for order in range(2, max_harmonic + 1):
+        offset = int(round(rate * np.log(order) * fs))
+        # Окно гармоники не должно заходить на соседнюю более высокую гармонику
+        harmonic_length = min(length, int(rate * np.log((order + 1) / order) * fs))
+        harmonic_start = peak - offset - pre
+        if harmonic_start < 0:
+            break
+        harmonics[order] = response[harmonic_start:harmonic_start + harmonic_length]
+    return peak - start, impulse_response, harmonics
+
+
+def transfer_function(impulse_response, fs, nfft):
+    """Модуль передаточной функции по импульсной характеристике"""
+    return np.fft.rfftfreq(nfft, 1 / fs), np.abs(np.fft.rfft(impulse_response, nfft))
+
+
+def harmonic_spectra(harmonics, fs, nfft):
+    """Модули гармоник как функция частоты возбуждения: |H_k(k * f)|"""
+    freqs = np.fft.rfftfreq(nfft, 1 / fs)
+    spectra = {}
+    for order, impulse_response in harmonics.items():
+        magnitude = np.abs(np.fft.rfft(impulse_response, nfft))
+        spectra[order] = np.interp(freqs * order, freqs, magnitude, right=0.0)
+    return spectra
+
+
+# Оценка задержки тракта
+DELAY_MIN_PEAK_RATIO = 10.0  # Во сколько раз пик корреляции должен превышать медиану
+
+
+def estimate_delay(reference, capture, max_delay):
+    """Задержка capture относительно reference по максимуму взаимной корреляции через БПФ
+
+    Возвращает задержку в отсчётах (не больше max_delay) или None, если пик
+    корреляции не выделяется над остальными значениями (канал молчит или не подключён).
+    """
+    n = scipy.fft.next_fast_len(len(capture) + len(reference))
+    spectrum = scipy.fft.rfft(capture, n) * np.conj(scipy.fft.rfft(reference, n))
+    correlation = np.abs(scipy.fft.irfft(spectrum, n)[:max_delay + 1])
+    peak = int(np.argmax(correlation))
+    if correlation[peak] < DELAY_MIN_PEAK_RATIO * np.median(correlation):
+        return None
+    return peak
+
+
+# Число точек графика АЧХ после прореживания
+PLOT_POINTS = 1500
+
+
+def log_grid(freqs, num_points=PLOT_POINTS):
+    """Логарифмическая сетка частот от первой ненулевой частоты до последней"""
+    positive = freqs[freqs > 0]
+    return np.logspace(np.log10(positive[0]), np.log10(positive[-1]), num_points)
+
+
+def resample_spectrum(freqs, spectrum, num_points=PLOT_POINTS):
+    """Пересэмплирование спектра на логарифмическую сетку интерполяцией"""
+    log_freqs = log_grid(freqs, num_points)
+    return log_freqs, np.interp(log_freqs, freqs, spectrum)
+
+
+def log_envelope(freqs, spectrum, num_points=PLOT_POINTS, grid=None):
+    """Прореживание спектра до логарифмической сетки со средним и огибающей min/max в каждой полосе
+
+    Сетка строится по диапазону freqs или задаётся явно через grid. freqs
+    может быть и неравномерной (сводка summary при усреднении по положениям
+    микрофона), тогда среднее взвешивается шириной бинов. Полосы, в
+    которые не попал ни один бин (на низких частотах сетка гуще бинов БПФ),
+    заполняются линейной интерполяцией. Возвращает (сетка, среднее, минимум, максимум).
+    """
+    if grid is None:
+        grid = log_grid(freqs, num_points)
+    edges = np.concatenate(([grid[0]], np.sqrt(grid[:-1] * grid[1:]), [grid[-1]]))
+    starts = np.searchsorted(freqs, edges[:-1], side='left')
+    ends = np.searchsorted(freqs, edges[1:], side='left')
+    ends[-1] = np.searchsorted(freqs, edges[-1], side='right')
+
+    interpolated = np.interp(grid, freqs, spectrum)
+    mean = interpolated.copy()
+    lower = interpolated.copy()
+    upper = interpolated.copy()
+    nonempty = ends > starts
+    if np.any(nonempty):
+        # Непустые полосы идут подряд, поэтому reduceat по их началам даёт значения по каждой полосе
+        indices = starts[nonempty]
+        values = spectrum[:ends[nonempty][-1]]
+        weights = grid_weights(freqs)
+        if weights is None:
+            mean[nonempty] = np.add.reduceat(values, indices) / (ends[nonempty] - indices)
+        else:
+            # Неравномерная входная сетка: среднее по полосе взвешивается шириной бинов
+            weights = weights[:len(values)]
+            mean[nonempty] = np.add.reduceat(values * weights, indices) / np.add.reduceat(weights, indices)
+        lower[nonempty] = np.minimum.reduceat(values, indices)
+        upper[nonempty] = np.maximum.reduceat(values, indices)
+    return grid, mean, lower, upper
+
+
+def map_frequencies(freqs, freq_ticks):
+    """Маппинг частот на позиции оси X с равными интервалами между метками частот."""
+    freq_ticks = np.array(freq_ticks)
+    positions = np.arange(len(freq_ticks))
+    n = len(freq_ticks) - 1  # Количество интервалов
+
+    x_positions = np.zeros_like(freqs, dtype=float)
+    indices = np.searchsorted(freq_ticks, freqs, side='right') - 1
+
+    # Ограничиваем индексы допустимым диапазоном
+    indices = np.clip(indices, 0, n - 1)
+
+    fi = freq_ticks[indices]
+    fi1 = freq_ticks[indices + 1]
+    xi = positions[indices]
+    xi1 = positions[indices + 1]
+
+    # Избегаем деления на ноль в случаях, когда fi == fi1
+    valid = fi1 > fi
+    x_positions[valid] = xi[valid] + (freqs[valid] - fi[valid]) / (fi1[valid] - fi[valid]) * (xi1[valid] - xi[valid])
+    x_positions[~valid] = xi[~valid]  # Для недопустимых интервалов присваиваем xi
+
+    return x_positions
+
+
+def octave_bands(fraction=3, f_min=20.0, f_max=20000.0):
+    """Центральные частоты и границы полос 1/fraction октавы (база 2, от 1 кГц)
+
+    Берутся все полосы, перекрывающие диапазон [f_min, f_max].
+    """
+    k_min = int(np.ceil(fraction * np.log2(f_min / 1000.0) - 0.5))
+    k_max = int(np.floor(fraction * np.log2(f_max / 1000.0) + 0.5))
+    centers = 1000.0 * 2.0 ** (np.arange(k_min, k_max + 1) / fraction)
+    half_band = 2.0 ** (1.0 / (2 * fraction))
+    return centers, centers / half_band, centers * half_band
+
+
+# Полосный анализ: доли октавы, доступные для отображения и экспорта
+BAND_FRACTIONS = [1, 3]
+
+
+def bin_edges(freqs):
+    """Границы участков частот, относящихся к бинам: середины между соседними бинами"""
+    middles = (freqs[1:] + freqs[:-1]) / 2
+    first = max(freqs[0] - (middles[0] - freqs[0]), 0.0)
+    last = freqs[-1] + (freqs[-1] - middles[-1])
+    return np.concatenate(([first], middles, [last]))
+
+
+def build_band_matrix(freqs, lower, upper):
+    """Разреженная матрица полосы x бины для перехода от СПМ к мощности в полосах
+
+    Вес бина - ширина пересечения его участка частот с полосой в Гц, поэтому
+    узкие низкочастотные полосы получают долю мощности бина, а не весь бин.
+    """
+    import scipy.sparse
+    edges = bin_edges(np.asarray(freqs, dtype=np.float64))
+    rows, columns, values = [], [], []
+    for band, (f_low, f_high) in enumerate(zip(lower, upper)):
+        first = max(np.searchsorted(edges, f_low, side='right') - 1, 0)
+        last = min(np.searchsorted(edges, f_high, side='left'), len(freqs))
+        bins = np.arange(first, last)
+        overlap = np.minimum(edges[bins + 1], f_high) - np.maximum(edges[bins], f_low)
+        bins, overlap = bins[overlap > 0], overlap[overlap > 0]
+        rows.append(np.full(len(bins), band))
+        columns.append(bins)
+        values.append(overlap)
+    return scipy.sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+                                   shape=(len(lower), len(freqs)))
+
+
+@functools.lru_cache(maxsize=16)
+def rfft_band_matrix(n_fft, fs, fraction):
+    """Центры полос и матрица для сетки rfft из n_fft точек, кэшируемые по (n_fft, fs, fraction)"""
+    centers, lower, upper = octave_bands(fraction)
+    return centers, build_band_matrix(np.fft.rfftfreq(n_fft, 1 / fs), lower, upper)
+
+
+def band_matrix(freqs, fraction):
+    """Центры полос 1/fraction октавы и матрица для сетки freqs
+
+    Для равномерной сетки БПФ матрица берётся из кэша; для прочих сеток
+    (логарифмическая сводка, усреднение по положениям) строится заново.
+    """
+    freqs = np.asarray(freqs, dtype=np.float64)
+    if len(freqs) > 1 and freqs[0] == 0:
+        n_fft = 2 * (len(freqs) - 1)
+        if np.allclose(freqs, np.arange(len(freqs)) * freqs[1]):
+            return rfft_band_matrix(n_fft, round(float(freqs[1]) * n_fft, 6), fraction)
+    centers, lower, upper = octave_bands(fraction)
+    return centers, build_band_matrix(freqs, lower, upper)
+
+
+def band_levels(freqs, psd, fraction=3):
+    """Уровни (дБ) в полосах 1/fraction октавы по СПМ: одно умножение на разреженную матрицу
+
+    psd - вектор или матрица бины x каналы на общей сетке freqs.
+    Возвращает центры полос и уровни той же формы по полосам.
+    """
+    centers, matrix = band_matrix(freqs, fraction)
+    power = matrix @ np.asarray(psd, dtype=np.float64)
+    return centers, 10 * np.log10(power + 1e-20)
+
+
+def pink_noise(samples, rng, rms):
+    """Розовый шум (спад 3 дБ/окт), периодический по длине, поэтому его можно зацикливать"""
+    spectrum = np.fft.rfft(rng.standard_normal(samples))
+    freqs = np.arange(len(spectrum), dtype=np.float64)
+    freqs[0] = 1.0
+    spectrum /= np.sqrt(freqs)
+    spectrum[0] = 0.0
+    signal = np.fft.irfft(spectrum, samples)
+    signal *= rms / np.sqrt(np.mean(signal ** 2))
+    return signal.astype(np.float32)
+
+
+# Взвешивание и ограничение полосы при расчёте уровня (IEC 61672)
+WEIGHTINGS = ["A", "C", "Z"]
+WEIGHTING_POLES = {  # Полюса аналоговых прототипов, Гц (с кратностью)
+    "A": [20.598997, 20.598997, 107.65265, 737.86223, 12194.217, 12194.217],
+    "C": [20.598997, 20.598997, 12194.217, 12194.217],
+}
+WEIGHTING_ZEROS = {"A": 4, "C": 2}  # Число нулей в начале координат
+LEVEL_BAND_ORDER = 4  # Порядок фильтра Баттерворта ограничения полосы
+LEVEL_BAND_MAX_RATIO = 0.45  # Верхняя граница полосы не выше этой доли fs
+
+
+@functools.lru_cache(maxsize=32)
+def level_filter_sos(fs, weighting="Z", band=None):
+    """Фильтр уровня в виде секций второго порядка: взвешивание и полоса (f_low, f_high)
+
+    Взвешивание получается билинейным преобразованием аналогового прототипа с
+    предыскажёнными частотами полюсов и нормируется к 0 дБ на 1 кГц. При fs
+    44,1-48 кГц отклонение от IEC 61672 не больше +0,9 дБ до 12,5 кГц, -3...-4 дБ
+    на 16 кГц (в допуске класса 1) и растёт к fs/2; уровень белого шума
+    отличается от аналогового прототипа меньше чем на 0,05 дБ. Полоса band
+    ограничивает уровень и при Z. Проекты кэшируются по (fs, взвешивание,
+    полоса) и разделяются между измерениями: массив не изменяется.
+    None - фильтр не нужен (Z без полосы).
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting: {weighting}")
+    import scipy.signal
+    sections = []
+    if weighting != "Z":
+        # Предыскажение: после билинейного преобразования полюса оказываются на своих частотах
+        poles = -2 * fs * np.tan(np.pi * np.array(WEIGHTING_POLES[weighting]) / fs)
+        z, p, k = scipy.signal.bilinear_zpk(np.zeros(WEIGHTING_ZEROS[weighting]), poles, 1.0, fs)
+        _, response = scipy.signal.freqz_zpk(z, p, k, worN=[1000.0], fs=fs)
+        sections.append(scipy.signal.zpk2sos(z, p, k / np.abs(response[0])))
+    if band is not None:
+        f_low, f_high = band
+        if f_high < LEVEL_BAND_MAX_RATIO * fs:
+            sections.append(scipy.signal.butter(LEVEL_BAND_ORDER, [f_low, f_high], btype='bandpass',
+                                                fs=fs, output='sos'))
+        else:
+            sections.append(scipy.signal.butter(LEVEL_BAND_ORDER, f_low, btype='highpass', fs=fs, output='sos'))
+    if not sections:
+        return None
+    return np.vstack(sections)
+
+
+@functools.lru_cache(maxsize=32)
+def level_filter_noise_gain(fs, weighting="Z", band=None, num_points=8192):
+    """Коэффициент передачи мощности белого шума фильтром уровня (средний квадрат АЧХ до fs/2)"""
+    sos = level_filter_sos(fs, weighting, band)
+    return float(np.mean(level_filter_gain(sos, np.linspace(0, fs / 2, num_points), fs)))
+
+
+def level_filter_gain(sos, freqs, fs):
+    """Квадрат АЧХ фильтра уровня на частотах freqs (1, если фильтра нет)"""
+    if sos is None:
+        return np.ones(len(freqs))
+    import scipy.signal
+    _, response = scipy.signal.sosfreqz(sos, worN=np.asarray(freqs, dtype=np.float64), fs=fs)
+    return np.abs(response) ** 2
+
+
+def filtered_level_db(data, sos):
+    """Уровень (RMS, дБ) записи после фильтра уровня за один проход"""
+    if sos is not None:
+        import scipy.signal
+        data = scipy.signal.sosfilt(sos, data)
+    return 10 * np.log10(np.mean(np.square(data, dtype=np.float64)) + 1e-20)
+
+
+class LevelAccumulator:
+    """Уровень после фильтра уровня, накапливаемый по блокам с переносом состояния zi
+
+    Фильтр обрабатывает каждый блок целиком, чтобы состояние не прерывалось, а в
+    энергию входит только указанная часть блока (например, окно после задержки тракта).
+    """
+
+    def __init__(self, sos):
+        self.sos = sos
+        self.zi = np.zeros((len(sos), 2)) if sos is not None else None
+        self.energy = 0.0
+        self.count = 0
+
+    def feed(self, block, start=0, stop=None):
+        """Фильтрация блока; в уровень учитываются отсчёты block[start:stop], они же возвращаются"""
+        if self.sos is not None:
+            import scipy.signal
+            block, self.zi = scipy.signal.sosfilt(self.sos, block, zi=self.zi)
+        part = block[start:stop]
+        self.energy += float(np.sum(np.square(part, dtype=np.float64)))
+        self.count += len(part)
+        return part
+
+    def level_db(self):
+        """Уровень (RMS, дБ) учтённых отсчётов"""
+        return 10 * np.log10(self.energy / max(self.count, 1) + 1e-20)
+
+
+# Коррекция АЧХ: параметрический эквалайзер, КИХ минимальной фазы и блочная свёртка
+MIN_PHASE_FFT_FACTOR = 8  # Во сколько раз БПФ кепстра длиннее фильтра (меньше наложение кепстра)
+FIR_FADE_RATIO = 0.1  # Доля конца КИХ-фильтра под полуокном спада
+
+
+def peaking_biquad(f0, gain_db, q, fs):
+    """Секция колоколообразного фильтра (RBJ Audio EQ Cookbook) в формате SOS"""
+    a_gain = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * f0 / fs
+    alpha = np.sin(w0) / (2 * q)
+    b = np.array([1 + alpha * a_gain, -2 * np.cos(w0), 1 - alpha * a_gain])
+    a = np.array([1 + alpha / a_gain, -2 * np.cos(w0), 1 - alpha / a_gain])
+    return np.concatenate((b, a)) / a[0]
+
+
+def sos_response_db(sos, freqs, fs):
+    """АЧХ цепочки секций второго порядка на частотах freqs (дБ)"""
+    return 10 * np.log10(level_filter_gain(sos, freqs, fs) + 1e-30)
+
+
+def minimum_phase_fir(freqs, gain_db, fs, num_taps):
+    """КИХ-фильтр минимальной фазы с АЧХ gain_db, заданной на сетке freqs (кепстральный метод)
+
+    АЧХ интерполируется на сетку БПФ по логарифму частоты; за пределами freqs
+    продолжается крайними значениями. Конец фильтра плавно спадает до нуля.
+    """
+    n_fft = int(2 ** np.ceil(np.log2(num_taps * MIN_PHASE_FFT_FACTOR)))
+    fft_freqs = np.fft.rfftfreq(n_fft, 1 / fs)
+    log_freqs = np.log(np.maximum(fft_freqs, freqs[0]))
+    log_magnitude = np.interp(log_freqs, np.log(freqs), gain_db) * (np.log(10) / 20)
+    # Кепстр вещественной чётной АЧХ сворачивается в причинный
+    cepstrum = np.fft.irfft(log_magnitude, n_fft)
+    folding = np.zeros(n_fft)
+    folding[0] = 1
+    folding[1:n_fft // 2] = 2
+    folding[n_fft // 2] = 1
+    fir = np.fft.irfft(np.exp(np.fft.rfft(cepstrum * folding)), n_fft)[:num_taps]
+    fade = max(1, int(num_taps * FIR_FADE_RATIO))
+    fir[-fade:] *= np.hanning(2 * fade)[fade:]
+    return fir
+
+
+class PartitionedConvolver:
+    """Свёртка блоками с равномерным разбиением фильтров (uniformly partitioned overlap-save)
+
+    Каждый КИХ-фильтр делится на части по block_size отсчётов, спектры частей
+    вычисляются один раз. Спектры входных блоков хранятся в частотной линии
+    задержки, поэтому на блок приходится одно прямое БПФ входа и по одному
+    обратному на канал при задержке ровно в один блок независимо от длины
+    фильтров. Вход один (моно), выходов - по числу фильтров firs (каналы x отсчёты).
+    """
+
+    def __init__(self, firs, block_size):
+        firs = np.atleast_2d(np.asarray(firs, dtype=np.float64))
+        self.block_size = block_size
+        self.num_outputs = len(firs)
+        self.num_parts = max(1, int(np.ceil(firs.shape[1] / block_size)))
+        parts = np.zeros((self.num_outputs, self.num_parts * block_size))
+        parts[:, :firs.shape[1]] = firs
+        parts = parts.reshape(self.num_outputs, self.num_parts, block_size)
+        self.spectra = scipy.fft.rfft(parts, n=2 * block_size, axis=2)
+        self.delay_line = np.zeros((self.num_parts, block_size + 1), dtype=np.complex128)
+        self.buffer = np.zeros(2 * block_size)
+        self.newest = 0  # Позиция спектра последнего блока в кольцевой линии задержки
+
+    def process(self, block):
+        """Свёртка очередного блока из block_size отсчётов; возвращает массив отсчёты x выходы"""
+        size = self.block_size
+        self.buffer[:size] = self.buffer[size:]
+        self.buffer[size:] = block
+        self.newest = (self.newest - 1) % self.num_parts
+        self.delay_line[self.newest] = scipy.fft.rfft(self.buffer)
+        # Спектр блока n - k умножается на спектр k-й части фильтров
+        order = (self.newest + np.arange(self.num_parts)) % self.num_parts
+        output = np.einsum('pk,cpk->ck', self.delay_line[order], self.spectra)
+        return scipy.fft.irfft(output, n=2 * size, axis=1)[:, size:].T
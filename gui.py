@@ -0,0 +1,2177 @@
+import sys
+import os
+import csv
+import json
+import concurrent.futures
+import numpy as np
+import threading
+from PyQt5 import QtWidgets, QtCore, QtGui
+import matplotlib
+import functools
+import analysis
+import calibration
+import config
+import correction
+import diagnostics
+import dsp
+import measurement
+import rta
+import session_store
+matplotlib.use('Qt5Agg')
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+RTA_INTERVAL_MS = 40  # Период обновления RTA (25 кадров/с)
+RTA_RANGE_DB = 90  # Диапазон оси уровня RTA
+DIAGNOSTICS_INTERVAL_MS = 500  # Период обновления окна диагностики
+
+class MeasurementWorker(QtCore.QObject):
+    """Фоновое измерение последовательности каналов: воспроизведение, запись и расчёт АЧХ"""
+    progress = QtCore.pyqtSignal(int, int, int)  # канал, порядковый номер, всего каналов
+    channel_measured = QtCore.pyqtSignal(int, object)  # канал, measurement.ChannelResult
+    error = QtCore.pyqtSignal(int, object)  # канал (-1 для ошибки устройства), исключение
+    finished = QtCore.pyqtSignal(bool)  # было ли измерение отменено
+
+    def __init__(self, input_device_id, output_device_id, channels, duration, fr_params,
+                 mode="noise", adaptive=False, error_margin=1.0, session_writer=None, retention="raw",
+                 weighting="Z", band_limits=None):
+        super().__init__()
+        self.input_device_id = input_device_id
+        self.output_device_id = output_device_id
+        self.channels = channels
+        self.duration = duration
+        self.fr_params = fr_params
+        self.mode = mode
+        self.adaptive = adaptive
+        self.error_margin = error_margin
+        self.session_writer = session_writer
+        self.retention = retention
+        self.weighting = weighting
+        self.band_limits = band_limits
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Запрос отмены; текущее воспроизведение прерывается"""
+        self.cancel_event.set()
+
+    def run(self):
+        """Измерение каналов в выбранном режиме"""
+        measurement.measure_channels(
+            self.input_device_id, self.output_device_id, self.channels, self.duration, self.fr_params,
+            self.mode, self.adaptive, self.error_margin, self.cancel_event,
+            on_progress=self.progress.emit,
+            on_result=self.on_result,
+            on_error=self.error.emit,
+            retention=self.retention,
+            weighting=self.weighting,
+            band_limits=self.band_limits)
+        self.finished.emit(self.cancel_event.is_set())
+
+    def on_result(self, result):
+        """Сохранение результата канала в сеанс на диске и передача в интерфейс"""
+        if self.session_writer is not None:
+            try:
+                self.session_writer.add_result(result)
+            except OSError as e:
+                self.session_writer = None
+                diagnostics.DIAGNOSTICS.log("error", channel=-1, key="session_save_error", error=str(e))
+                self.error.emit(-1, measurement.MeasurementError("session_save_error", error=e))
+        self.channel_measured.emit(result.channel, result)
+
+class FrPlotWindow(QtWidgets.QWidget):
+    """Окно графика АЧХ с постоянным холстом
+
+    Фигура и линии создаются один раз; при обновлении меняются только данные
+    линий и пределы осей. Если оформление графика не изменилось, перерисовываются
+    лишь линии поверх сохранённого фона (blitting).
+    """
+
+    def __init__(self):
+        super().__init__()
+        layout = QtWidgets.QVBoxLayout()
+        self.canvas = FigureCanvas(Figure(figsize=(6, 4)))
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.ax = self.canvas.figure.add_subplot(111)
+        self.ax.grid(True, which='both', ls='--', lw=0.5)
+        self.envelope = None
+        self.spread = None  # Полоса разброса между положениями микрофона
+        self.raw_line, = self.ax.plot([], [], animated=True)
+        self.smoothed_line, = self.ax.plot([], [], linewidth=2, animated=True)
+        self.filtered_line, = self.ax.plot([], [], linewidth=2, animated=True)
+        self.harmonic_lines = {}
+        self.layout_state = None  # Оформление, при котором сохранён фон
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def data_artists(self):
+        """Художники, перерисовываемые при каждом обновлении"""
+        artists = [self.raw_line, self.smoothed_line, self.filtered_line]
+        artists.extend(self.harmonic_lines[order] for order in sorted(self.harmonic_lines))
+        if self.spread is not None:
+            artists.insert(0, self.spread)
+        if self.envelope is not None:
+            artists.insert(0, self.envelope)
+        return artists
+
+    def on_draw(self, event):
+        """Сохранение фона после полной перерисовки и отрисовка данных поверх него"""
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        for artist in self.data_artists():
+            self.ax.draw_artist(artist)
+
+    def update_plot(self, fr, x_positions, freq_ticks, labels):
+        """Обновление данных графика
+
+        labels - словарь подписей: title, raw, smoothed, filtered, harmonic (шаблон с {k}),
+        spread, xlabel, ylabel.
+        """
+        to_db = lambda values: 20 * np.log10(values + 1e-10)
+
+        # Огибающую проще пересоздать, чем менять вершины многоугольника
+        if self.envelope is not None:
+            self.envelope.remove()
+        self.envelope = self.ax.fill_between(x_positions, to_db(fr.raw_lower), to_db(fr.raw_upper),
+                                             alpha=0.2, linewidth=0, color=self.raw_line.get_color(),
+                                             animated=True)
+        if self.spread is not None:
+            self.spread.remove()
+            self.spread = None
+        if fr.spread_lower is not None:
+            self.spread = self.ax.fill_between(x_positions, to_db(fr.spread_lower), to_db(fr.spread_upper),
+                                               alpha=0.3, linewidth=0, color=self.smoothed_line.get_color(),
+                                               label=labels["spread"], animated=True)
+        self.raw_line.set_data(x_positions, to_db(fr.raw))
+        self.smoothed_line.set_data(x_positions, to_db(fr.smoothed))
+        self.filtered_line.set_data(x_positions, to_db(fr.filtered))
+
+        # Гармонические искажения (только для измерения свипом)
+        for order in list(self.harmonic_lines):
+            if order not in fr.harmonics:
+                self.harmonic_lines.pop(order).remove()
+        for order, harmonic in fr.harmonics.items():
+            if order not in self.harmonic_lines:
+                self.harmonic_lines[order], = self.ax.plot([], [], linewidth=1, linestyle='--', animated=True)
+            self.harmonic_lines[order].set_data(x_positions, to_db(harmonic))
+
+        self.raw_line.set_label(labels["raw"])
+        self.smoothed_line.set_label(labels["smoothed"])
+        self.filtered_line.set_label(labels["filtered"])
+        for order, line in self.harmonic_lines.items():
+            line.set_label(labels["harmonic"].format(k=order))
+
+        # Автоматическая настройка оси амплитуды
+        all_data_dB = to_db(np.concatenate([fr.raw_lower, fr.raw_upper, fr.smoothed, fr.filtered]))
+        y_min = np.nanmin(all_data_dB)
+        y_max = np.nanmax(all_data_dB)
+        y_margin = (y_max - y_min) * 0.1  # 10% запас
+        y_limits = (round(y_min - y_margin), round(y_max + y_margin))
+
+        layout_state = (tuple(freq_ticks), y_limits, tuple(sorted(fr.harmonics)), self.spread is not None,
+                        tuple(sorted(labels.items())))
+        if layout_state == self.layout_state and self.background is not None:
+            # Оформление не изменилось: перерисовываем только данные поверх фона
+            self.canvas.restore_region(self.background)
+            for artist in self.data_artists():
+                self.ax.draw_artist(artist)
+            self.canvas.blit(self.canvas.figure.bbox)
+            return
+
+        self.layout_state = layout_state
+        self.setWindowTitle(labels["title"])
+        self.ax.set_title(labels["title"])
+        self.ax.set_xlabel(labels["xlabel"])
+        self.ax.set_ylabel(labels["ylabel"])
+
+        # Устанавливаем метки оси X в соответствии с частотами
+        positions = np.arange(len(freq_ticks))
+        self.ax.set_xticks(positions)
+        self.ax.set_xticklabels([str(int(f)) for f in freq_ticks])
+        self.ax.set_xlim(positions[0], positions[-1])
+        self.ax.set_ylim(*y_limits)
+        self.ax.legend(handles=[self.raw_line, self.smoothed_line, self.filtered_line] +
+                       [self.harmonic_lines[order] for order in sorted(self.harmonic_lines)] +
+                       ([self.spread] if self.spread is not None else []))
+        self.canvas.draw_idle()
+
+class RtaWindow(QtWidgets.QWidget):
+    """Окно анализатора спектра в реальном времени с перерисовкой линии поверх сохранённого фона"""
+
+    def __init__(self, tester, capture):
+        super().__init__()
+        self.tester = tester
+        self.capture = capture
+        self.analyzer = rta.RtaAnalyzer(capture.fs)
+        self.setWindowTitle(tester.tr("live_rta"))
+
+        # Элементы управления
+        self.bands_checkbox = QtWidgets.QCheckBox(tester.tr("rta_bands"))
+        self.bands_checkbox.setChecked(tester.settings.get("rta_bands", True))
+        self.bands_checkbox.toggled.connect(self.reset_layout)
+        self.pink_label = QtWidgets.QLabel(tester.tr("pink_noise"))
+        self.pink_select = QtWidgets.QComboBox()
+        self.pink_select.addItem(tester.tr("off"), None)
+        for i in range(capture.num_channels):
+            self.pink_select.addItem(tester.channel_mapping.get(i, tester.tr("unknown")), i)
+        self.pink_select.currentIndexChanged.connect(
+            lambda: self.capture.set_output_channel(self.pink_select.currentData()))
+        controls_layout = QtWidgets.QHBoxLayout()
+        controls_layout.addWidget(self.bands_checkbox)
+        controls_layout.addWidget(self.pink_label)
+        controls_layout.addWidget(self.pink_select)
+
+        self.canvas = FigureCanvas(Figure(figsize=(6, 4)))
+        self.ax = self.canvas.figure.add_subplot(111)
+        self.ax.grid(True, which='both', ls='--', lw=0.5)
+        self.ax.set_title(tester.tr("live_rta"))
+        self.ax.set_xlabel(tester.tr("Frequency (Hz)"))
+        self.ax.set_ylabel(tester.tr("Amplitude (dB)"))
+        self.line, = self.ax.plot([], [], linewidth=2, animated=True)
+        self.background = None
+        self.y_top = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(controls_layout)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.update_plot)
+        self.timer.start(RTA_INTERVAL_MS)
+
+    def on_draw(self, event):
+        """Сохранение фона после полной перерисовки"""
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.ax.draw_artist(self.line)
+
+    def reset_layout(self):
+        """Полная перерисовка при смене режима отображения"""
+        self.y_top = None
+
+    def update_plot(self):
+        """Обработка новых данных и перерисовка линии"""
+        if not self.analyzer.update(self.capture.ring):
+            return
+        if self.bands_checkbox.isChecked():
+            freqs, levels = self.analyzer.band_levels_db(3)
+            self.line.set_drawstyle('steps-mid')
+        else:
+            freqs, psd = dsp.resample_spectrum(self.analyzer.freqs, self.analyzer.psd)
+            levels = 10 * np.log10(psd + 1e-20)
+            self.line.set_drawstyle('default')
+
+        freq_ticks = [0] + sorted(set(self.tester.frequency_ticks)) + [20000]
+        self.line.set_data(self.tester.map_frequencies(freqs, freq_ticks), levels)
+
+        # Пределы оси меняются только при выходе уровня за текущий диапазон
+        level_max = np.nanmax(levels)
+        if self.y_top is None or level_max > self.y_top or level_max < self.y_top - RTA_RANGE_DB / 2:
+            self.y_top = np.ceil(level_max / 10) * 10 + 10
+            positions = np.arange(len(freq_ticks))
+            self.ax.set_xticks(positions)
+            self.ax.set_xticklabels([str(int(f)) for f in freq_ticks])
+            self.ax.set_xlim(positions[0], positions[-1])
+            self.ax.set_ylim(self.y_top - RTA_RANGE_DB, self.y_top)
+            self.canvas.draw_idle()
+            return
+
+        if self.background is not None:
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.canvas.figure.bbox)
+
+    def closeEvent(self, event):
+        """Остановка потока при закрытии окна"""
+        self.timer.stop()
+        self.capture.stop()
+        self.tester.settings["rta_bands"] = self.bands_checkbox.isChecked()
+        self.tester.rta_window = None
+        event.accept()
+
+class DiagnosticsWindow(QtWidgets.QWidget):
+    """Окно диагностики: время этапов, сбои звукового потока и журнал событий"""
+
+    def __init__(self, tester):
+        super().__init__()
+        self.tester = tester
+        self.setWindowTitle(tester.tr("diagnostics"))
+        self.resize(600, 500)
+
+        self.stages_table = QtWidgets.QTableWidget(0, 5)
+        self.stages_table.setHorizontalHeaderLabels([
+            tester.tr("diagnostics_stage"), tester.tr("diagnostics_count"), tester.tr("diagnostics_total"),
+            tester.tr("diagnostics_mean"), tester.tr("diagnostics_max")])
+        self.stages_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.stages_table.verticalHeader().setVisible(False)
+        self.status_label = QtWidgets.QLabel()
+        self.events_view = QtWidgets.QPlainTextEdit()
+        self.events_view.setReadOnly(True)
+        self.events_view.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+
+        # Запись журнала в файл и управление
+        self.log_checkbox = QtWidgets.QCheckBox(tester.tr("diagnostics_log").format(file=diagnostics.LOG_FILE))
+        self.log_checkbox.setChecked(diagnostics.DIAGNOSTICS.log_path is not None)
+        self.log_checkbox.toggled.connect(self.set_file_logging)
+        self.reset_button = QtWidgets.QPushButton(tester.tr("reset"))
+        self.reset_button.clicked.connect(self.reset)
+        self.export_button = QtWidgets.QPushButton(tester.tr("export_json"))
+        self.export_button.clicked.connect(self.export)
+        controls_layout = QtWidgets.QHBoxLayout()
+        controls_layout.addWidget(self.log_checkbox)
+        controls_layout.addStretch()
+        controls_layout.addWidget(self.reset_button)
+        controls_layout.addWidget(self.export_button)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.stages_table)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.events_view)
+        layout.addLayout(controls_layout)
+        self.setLayout(layout)
+
+        self.events_shown = None  # Последнее показанное событие
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.update_view)
+        self.timer.start(DIAGNOSTICS_INTERVAL_MS)
+        self.update_view()
+
+    def update_view(self):
+        """Обновление таблицы этапов, счётчиков потока и журнала"""
+        snapshot = diagnostics.DIAGNOSTICS.snapshot()
+        stages = sorted(snapshot["stages"].items())
+        self.stages_table.setRowCount(len(stages))
+        for row, (name, stats) in enumerate(stages):
+            values = [name, str(stats["count"]), f"{stats['total']:.3f}",
+                      f"{stats['mean'] * 1000:.2f}", f"{stats['max'] * 1000:.2f}"]
+            for column, value in enumerate(values):
+                self.stages_table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+        self.status_label.setText(self.tester.tr("stream_status").format(
+            status=", ".join(f"{flag}: {count}" for flag, count in snapshot["stream_status"].items())))
+
+        # Журнал перестраивается только при появлении новых событий
+        events = snapshot["events"]
+        last = events[-1] if events else None
+        if last is not self.events_shown:
+            self.events_shown = last
+            self.events_view.setPlainText("\n".join(json.dumps(event, default=str) for event in events))
+            self.events_view.verticalScrollBar().setValue(self.events_view.verticalScrollBar().maximum())
+
+    def set_file_logging(self, enabled):
+        """Включение дописывания событий в файл журнала"""
+        diagnostics.DIAGNOSTICS.log_path = diagnostics.LOG_FILE if enabled else None
+        self.tester.settings["diagnostics_log"] = enabled
+
+    def reset(self):
+        diagnostics.DIAGNOSTICS.reset()
+        self.update_view()
+
+    def export(self):
+        """Сохранение состояния диагностики в файл JSON"""
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, self.tester.tr("export_json"), "diagnostics.json",
+                                                        "JSON (*.json)")
+        if not path:
+            return
+        try:
+            diagnostics.DIAGNOSTICS.write_json(path)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, self.tester.tr("app_title"),
+                                          self.tester.tr("diagnostics_export_error").format(error=e))
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.tester.diagnostics_window = None
+        event.accept()
+
+class BandWindow(QtWidgets.QWidget):
+    """Уровни каналов в октавных и третьоктавных полосах: столбчатая диаграмма и таблица"""
+
+    def __init__(self, tester):
+        super().__init__()
+        self.tester = tester
+        self.centers = None
+        self.levels = {}
+        self.setWindowTitle(tester.tr("band_levels"))
+        self.resize(700, 600)
+
+        # Элементы управления
+        self.fraction_label = QtWidgets.QLabel(tester.tr("band_fraction"))
+        self.fraction_select = QtWidgets.QComboBox()
+        for fraction in dsp.BAND_FRACTIONS:
+            self.fraction_select.addItem(tester.tr("octave_fraction").format(n=fraction), fraction)
+        saved_fraction = self.fraction_select.findData(tester.settings.get("band_fraction", 3))
+        self.fraction_select.setCurrentIndex(max(saved_fraction, 0))
+        self.fraction_select.currentIndexChanged.connect(self.update_bands)
+        self.channel_label = QtWidgets.QLabel(tester.tr("band_channel"))
+        self.channel_select = QtWidgets.QComboBox()
+        self.channel_select.currentIndexChanged.connect(self.update_chart)
+        self.export_button = QtWidgets.QPushButton(tester.tr("export_csv"))
+        self.export_button.clicked.connect(self.export)
+        controls_layout = QtWidgets.QHBoxLayout()
+        controls_layout.addWidget(self.fraction_label)
+        controls_layout.addWidget(self.fraction_select)
+        controls_layout.addWidget(self.channel_label)
+        controls_layout.addWidget(self.channel_select)
+        controls_layout.addStretch()
+        controls_layout.addWidget(self.export_button)
+
+        self.canvas = FigureCanvas(Figure(figsize=(6, 3)))
+        self.ax = self.canvas.figure.add_subplot(111)
+        self.table = QtWidgets.QTableWidget()
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(controls_layout)
+        layout.addWidget(self.canvas, 2)
+        layout.addWidget(self.table, 1)
+        self.setLayout(layout)
+        self.update_bands()
+
+    def update_bands(self):
+        """Пересчёт уровней в полосах для всех измеренных каналов"""
+        spectra = {channel: self.tester.get_channel_spectrum(channel)
+                   for channel in sorted(self.tester.channel_fr_data)}
+        spectra = {channel: spectrum for channel, spectrum in spectra.items() if spectrum[1] is not None}
+        self.centers, self.levels = analysis.band_analysis(spectra, self.fraction_select.currentData())
+
+        # Список каналов для диаграммы сохраняет выбранный канал
+        selected = self.channel_select.currentData()
+        self.channel_select.blockSignals(True)
+        self.channel_select.clear()
+        for channel in self.levels:
+            self.channel_select.addItem(self.channel_name(channel), channel)
+        self.channel_select.setCurrentIndex(max(self.channel_select.findData(selected), 0))
+        self.channel_select.blockSignals(False)
+
+        channels = list(self.levels)
+        self.table.setRowCount(len(self.centers))
+        self.table.setColumnCount(len(channels))
+        self.table.setVerticalHeaderLabels([self.band_name(center) for center in self.centers])
+        self.table.setHorizontalHeaderLabels([self.channel_name(channel) for channel in channels])
+        for column, channel in enumerate(channels):
+            for row, level in enumerate(self.levels[channel]):
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem(f"{level:.1f}"))
+        self.update_chart()
+
+    def update_chart(self):
+        """Столбчатая диаграмма уровней выбранного канала"""
+        self.ax.clear()
+        channel = self.channel_select.currentData()
+        if channel is not None:
+            levels = self.levels[channel]
+            positions = np.arange(len(self.centers))
+            # Столбцы растут от нижней границы оси, а не от 0 дБ
+            bottom = np.floor(np.min(levels) / 10) * 10 - 10
+            self.ax.bar(positions, levels - bottom, bottom=bottom, width=0.8)
+            self.ax.set_xticks(positions)
+            self.ax.set_xticklabels([self.band_name(center) for center in self.centers], rotation=90, fontsize=7)
+            self.ax.set_ylim(bottom, np.ceil(np.max(levels) / 10) * 10 + 5)
+            self.ax.set_title(self.channel_name(channel))
+        self.ax.set_xlabel(self.tester.tr("Frequency (Hz)"))
+        self.ax.set_ylabel(self.tester.tr("band_level"))
+        self.ax.grid(True, axis='y', ls='--', lw=0.5)
+        self.canvas.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def channel_name(self, channel):
+        return f"{channel + 1}: {self.tester.channel_mapping.get(channel, self.tester.tr('unknown'))}"
+
+    @staticmethod
+    def band_name(center):
+        """Подпись полосы по номинальной частоте"""
+        return f"{center / 1000:.3g}k" if center >= 1000 else f"{center:.3g}"
+
+    def export(self):
+        """Сохранение таблицы уровней в CSV"""
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, self.tester.tr("export_csv"), "bands.csv",
+                                                        "CSV (*.csv)")
+        if not path:
+            return
+        channels = list(self.levels)
+        try:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["center_hz"] + [f"channel_{channel + 1}_db" for channel in channels])
+                for row, center in enumerate(self.centers):
+                    writer.writerow([f"{center:.1f}"] + [f"{self.levels[channel][row]:.2f}" for channel in channels])
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, self.tester.tr("app_title"),
+                                          self.tester.tr("export_error").format(error=e))
+
+    def closeEvent(self, event):
+        self.tester.settings["band_fraction"] = self.fraction_select.currentData()
+        self.tester.band_window = None
+        event.accept()
+
+class CorrectionWindow(QtWidgets.QWidget):
+    """Коррекция АЧХ канала: подбор PEQ или КИХ-фильтра под целевую кривую, экспорт и прослушивание"""
+
+    def __init__(self, tester):
+        super().__init__()
+        self.tester = tester
+        self.corrections = {}  # Канал -> (параметры проектирования, correction.ChannelCorrection)
+        self.preview = None
+        self.setWindowTitle(tester.tr("room_correction"))
+        self.resize(800, 650)
+
+        # Параметры проектирования
+        self.channel_label = QtWidgets.QLabel(tester.tr("correction_channel"))
+        self.channel_select = QtWidgets.QComboBox()
+        self.method_label = QtWidgets.QLabel(tester.tr("correction_method"))
+        self.method_select = QtWidgets.QComboBox()
+        for method in correction.CORRECTION_METHODS:
+            self.method_select.addItem(tester.tr("method_" + method), method)
+        self.method_select.setCurrentIndex(max(self.method_select.findData(
+            tester.settings.get("correction_method", "peq")), 0))
+        self.slope_label = QtWidgets.QLabel(tester.tr("target_slope"))
+        self.slope_spinbox = QtWidgets.QDoubleSpinBox()
+        self.slope_spinbox.setRange(-2.0, 2.0)
+        self.slope_spinbox.setSingleStep(0.1)
+        self.slope_spinbox.setValue(tester.settings.get("correction_slope", 0.0))
+        self.filters_label = QtWidgets.QLabel(tester.tr("peq_filters"))
+        self.filters_spinbox = QtWidgets.QSpinBox()
+        self.filters_spinbox.setRange(1, 20)
+        self.filters_spinbox.setValue(tester.settings.get("correction_filters", correction.PEQ_MAX_FILTERS))
+        self.taps_label = QtWidgets.QLabel(tester.tr("fir_taps"))
+        self.taps_select = QtWidgets.QComboBox()
+        for taps in correction.FIR_TAPS:
+            self.taps_select.addItem(str(taps), taps)
+        self.taps_select.setCurrentIndex(max(self.taps_select.findData(
+            tester.settings.get("correction_taps", correction.DEFAULT_FIR_TAPS)), 0))
+        for signal in (self.channel_select.currentIndexChanged, self.method_select.currentIndexChanged,
+                       self.slope_spinbox.valueChanged, self.filters_spinbox.valueChanged,
+                       self.taps_select.currentIndexChanged):
+            signal.connect(self.update_correction)
+        design_layout = QtWidgets.QHBoxLayout()
+        for widget in (self.channel_label, self.channel_select, self.method_label, self.method_select,
+                       self.slope_label, self.slope_spinbox, self.filters_label, self.filters_spinbox,
+                       self.taps_label, self.taps_select):
+            design_layout.addWidget(widget)
+        design_layout.addStretch()
+
+        self.canvas = FigureCanvas(Figure(figsize=(6, 4)))
+        self.ax = self.canvas.figure.add_subplot(111)
+        self.filters_view = QtWidgets.QPlainTextEdit()
+        self.filters_view.setReadOnly(True)
+        self.filters_view.setMaximumHeight(120)
+
+        # Экспорт и прослушивание
+        self.export_button = QtWidgets.QPushButton(tester.tr("export_filters"))
+        self.export_button.clicked.connect(self.export)
+        self.source_label = QtWidgets.QLabel(tester.tr("preview_source"))
+        self.source_select = QtWidgets.QComboBox()
+        for source in correction.PREVIEW_SOURCES:
+            self.source_select.addItem(tester.tr("source_" + source), source)
+        self.all_channels_checkbox = QtWidgets.QCheckBox(tester.tr("preview_all_channels"))
+        self.all_channels_checkbox.setChecked(tester.settings.get("preview_all_channels", False))
+        self.play_button = QtWidgets.QPushButton(tester.tr("preview_play"))
+        self.play_button.clicked.connect(self.toggle_preview)
+        self.bypass_checkbox = QtWidgets.QCheckBox(tester.tr("bypass"))
+        self.bypass_checkbox.toggled.connect(self.set_bypass)
+        preview_layout = QtWidgets.QHBoxLayout()
+        preview_layout.addWidget(self.export_button)
+        preview_layout.addStretch()
+        for widget in (self.source_label, self.source_select, self.all_channels_checkbox,
+                       self.play_button, self.bypass_checkbox):
+            preview_layout.addWidget(widget)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(design_layout)
+        layout.addWidget(self.canvas, 1)
+        layout.addWidget(self.filters_view)
+        layout.addLayout(preview_layout)
+        self.setLayout(layout)
+        self.update_channels()
+
+    def update_channels(self):
+        """Список измеренных каналов и перерисовка
+
+        Фильтры перепроектируются в get_correction, только если изменились запись
+        канала или параметры; смена языка или делений оси их не затрагивает.
+        """
+        for channel in set(self.corrections) - set(self.tester.channel_fr_data):
+            del self.corrections[channel]
+        selected = self.channel_select.currentData()
+        self.channel_select.blockSignals(True)
+        self.channel_select.clear()
+        for channel in sorted(self.tester.channel_fr_data):
+            name = self.tester.channel_mapping.get(channel, self.tester.tr("unknown"))
+            self.channel_select.addItem(f"{channel + 1}: {name}", channel)
+        self.channel_select.setCurrentIndex(max(self.channel_select.findData(selected), 0))
+        self.channel_select.blockSignals(False)
+        self.update_correction()
+
+    def design_params(self, channel):
+        """Параметры, от которых зависит фильтр канала: запись, оценка АЧХ и настройки коррекции"""
+        method = self.method_select.currentData()
+        f_range = (correction.SUBWOOFER_RANGE if channel == self.tester.find_subwoofer_channel()
+                   else correction.CORRECTION_RANGE)
+        return (self.tester.recording_ids.get(channel), self.tester.get_fr_params(), method, f_range,
+                self.slope_spinbox.value(), self.filters_spinbox.value(), self.taps_select.currentData())
+
+    def get_correction(self, channel):
+        """Фильтр канала с текущими параметрами; пересчитывается только при их изменении"""
+        params = self.design_params(channel)
+        cached = self.corrections.get(channel)
+        if cached is not None and cached[0] == params:
+            return cached[1]
+        freqs, spectrum = self.tester.get_channel_spectrum(channel)
+        if spectrum is None:
+            return None
+        _, fs = self.tester.channel_fr_data[channel]
+        _, _, method, f_range, slope, max_filters, num_taps = params
+        result = correction.design_correction(channel, freqs, spectrum, fs, method, f_range, slope,
+                                              max_filters, num_taps)
+        self.corrections[channel] = (params, result)
+        return result
+
+    def update_correction(self):
+        """Проектирование фильтра выбранного канала и перерисовка графика"""
+        is_peq = self.method_select.currentData() == "peq"
+        self.filters_label.setEnabled(is_peq)
+        self.filters_spinbox.setEnabled(is_peq)
+        self.taps_label.setEnabled(not is_peq)
+        self.taps_select.setEnabled(not is_peq)
+        self.ax.clear()
+        channel = self.channel_select.currentData()
+        result = self.get_correction(channel) if channel is not None else None
+        if result is None:
+            self.filters_view.setPlainText(self.tester.tr("no_data"))
+            self.canvas.draw_idle()
+            return
+
+        freq_ticks = [0] + sorted(set(self.tester.frequency_ticks)) + [20000]
+        positions = self.tester.map_frequencies(result.freqs, freq_ticks)
+        self.ax.plot(positions, result.measured_db, label=self.tester.tr("measured_fr"), linewidth=1)
+        self.ax.plot(positions, result.target_db, label=self.tester.tr("target_curve"), linestyle='--')
+        self.ax.plot(positions, result.predicted_db(), label=self.tester.tr("corrected_fr"), linewidth=2)
+        self.ax.plot(positions, result.response_db(), label=self.tester.tr("correction_filter"), linestyle=':')
+        ticks = np.arange(len(freq_ticks))
+        self.ax.set_xticks(ticks)
+        self.ax.set_xticklabels([str(int(f)) for f in freq_ticks])
+        self.ax.set_xlim(ticks[0], ticks[-1])
+        self.ax.set_xlabel(self.tester.tr("Frequency (Hz)"))
+        self.ax.set_ylabel(self.tester.tr("Amplitude (dB)"))
+        self.ax.grid(True, which='both', ls='--', lw=0.5)
+        self.ax.legend(loc='lower left', fontsize=8)
+        self.canvas.figure.tight_layout()
+        self.canvas.draw_idle()
+
+        if result.method == "peq":
+            text = correction.peq_text(result) if result.filters else self.tester.tr("peq_none")
+        else:
+            text = self.tester.tr("fir_info").format(taps=len(result.fir), ms=1000 * len(result.fir) / result.fs)
+        self.filters_view.setPlainText(text)
+
+    def export(self):
+        """Сохранение фильтров выбранного канала в текстовый файл"""
+        channel = self.channel_select.currentData()
+        result = self.get_correction(channel) if channel is not None else None
+        if result is None:
+            return
+        name = f"channel_{channel + 1}_{result.method}.txt"
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, self.tester.tr("export_filters"), name,
+                                                        "Text (*.txt)")
+        if not path:
+            return
+        try:
+            correction.write_correction(path, result)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, self.tester.tr("app_title"),
+                                          self.tester.tr("export_error").format(error=e))
+
+    def toggle_preview(self):
+        """Запуск или остановка прослушивания коррекции"""
+        if self.preview is not None:
+            self.stop_preview()
+        else:
+            self.start_preview()
+
+    def start_preview(self):
+        """Воспроизведение источника через фильтры выбранного или всех измеренных каналов"""
+        tester = self.tester
+        if tester.measurement_thread is not None:
+            return
+        # Анализатор занимает те же устройства
+        if tester.rta_window is not None:
+            tester.rta_window.close()
+        if self.all_channels_checkbox.isChecked():
+            channels = [self.channel_select.itemData(index) for index in range(self.channel_select.count())]
+        else:
+            channels = [self.channel_select.currentData()]
+        corrections = [self.get_correction(channel) for channel in channels if channel is not None]
+        corrections = [result for result in corrections if result is not None]
+        if not corrections:
+            return
+        input_device_id = tester.input_devices[tester.input_select.currentIndex()][2]
+        output_device_id = tester.output_devices[tester.output_select.currentIndex()][2]
+        try:
+            fs, num_channels = measurement.get_device_params(input_device_id, output_device_id)
+            if corrections[0].fs != fs:
+                raise measurement.MeasurementError("frequency_mismatch", input_fs=corrections[0].fs, fs=fs)
+            source = None
+            if self.source_select.currentData() == "file":
+                path, _ = QtWidgets.QFileDialog.getOpenFileName(self, tester.tr("source_file"),
+                                                                tester.settings.get("preview_file", ""),
+                                                                "WAV (*.wav)")
+                if not path:
+                    return
+                tester.settings["preview_file"] = path
+                source = correction.read_wav(path, fs)
+            self.preview = correction.CorrectionPreview(output_device_id, num_channels, fs, corrections, source)
+            self.preview.set_bypass(self.bypass_checkbox.isChecked())
+            self.preview.start()
+        except measurement.MeasurementError as e:
+            self.preview = None
+            diagnostics.DIAGNOSTICS.log("error", channel=-1, key=e.key, error=str(e.params.get("error", "")))
+            QtWidgets.QMessageBox.warning(self, tester.tr("app_title"), tester.tr(e.key).format(**e.params))
+            return
+        except Exception as e:
+            self.preview = None
+            diagnostics.DIAGNOSTICS.log("error", channel=-1, key="device_error", error=str(e))
+            QtWidgets.QMessageBox.warning(self, tester.tr("app_title"), tester.tr("device_error").format(error=e))
+            return
+        diagnostics.DIAGNOSTICS.log("correction_preview", channels=[result.channel + 1 for result in corrections],
+                                    method=corrections[0].method)
+        self.play_button.setText(tester.tr("preview_stop"))
+
+    def stop_preview(self):
+        if self.preview is not None:
+            self.preview.stop()
+            self.preview = None
+        self.play_button.setText(self.tester.tr("preview_play"))
+
+    def set_bypass(self, bypass):
+        if self.preview is not None:
+            self.preview.set_bypass(bypass)
+
+    def closeEvent(self, event):
+        """Остановка прослушивания и сохранение параметров при закрытии окна"""
+        self.stop_preview()
+        settings = self.tester.settings
+        settings["correction_method"] = self.method_select.currentData()
+        settings["correction_slope"] = self.slope_spinbox.value()
+        settings["correction_filters"] = self.filters_spinbox.value()
+        settings["correction_taps"] = self.taps_select.currentData()
+        settings["preview_all_channels"] = self.all_channels_checkbox.isChecked()
+        self.tester.correction_window = None
+        event.accept()
+
+class WhiteNoiseTester(QtWidgets.QWidget):
+    def __init__(self):
+        super().__init__()
+
+        # Загрузка настроек
+        self.settings = self.load_settings()
+
+        # Языковые настройки
+        self.languages = ["English", "Русский"]
+        self.current_language = self.settings.get("language", "Русский")
+        self.translations = {
+            "English": {
+                "app_title": "White Noise Channel Tester",
+                "input_device": "Input Device:",
+                "output_device": "Output Device:",
+                "error_margin": "Allowed Error (dB):",
+                "test_all_channels": "Test All Channels",
+                "not_tested": "Not Tested",
+                "channel": "Channel",
+                "increase_volume": "Increase by {trim:.1f} dB",
+                "decrease_volume": "Decrease by {trim:.1f} dB",
+                "channel_ok": "Channel is calibrated",
+                "no_data": "No data",
+                "language": "Language:",
+                "frequency_mismatch": "Sample rate mismatch between input and output devices ({input_fs} != {fs}).",
+                "device_error": "Device access error: {error}",
+                "channel_not_exist": "Channel {channel} does not exist on the selected device.",
+                "left_front": "Left Front",
+                "right_front": "Right Front",
+                "center": "Center",
+                "subwoofer": "Subwoofer",
+                "left_rear": "Left Rear",
+                "right_rear": "Right Rear",
+                "left_side": "Left Side",
+                "right_side": "Right Side",
+                "unknown": "Unknown",
+                "show_fr": "Show FR",
+                "wasapi_not_found": "WASAPI devices not found.",
+                "Error": "Error",
+                "overall_fr": "Overall Frequency Response",
+                "channel_fr": "Channel {i} Frequency Response",
+                "channel_not_tested": "Channel {i} not tested yet.",
+                "frequency_ticks": "Frequency Ticks (Hz):",
+                "apply": "Apply",
+                "show_overall_fr": "Show Overall FR",
+                "Frequency ticks updated.": "Frequency ticks updated.",
+                "Invalid frequency ticks input.": "Invalid frequency ticks input.",
+                "No data to display overall frequency response.": "No data to display overall frequency response.",
+                "Play Channel {i} ({name})": "Play Channel {i} ({name})",
+                "Channel {i}: {status}": "Channel {i}: {status}",
+                "Channel {i}: {rms:.2f} dB ({suggestion})": "Channel {i}: {rms:.2f} dB ({suggestion})",
+                "auto_show_fr": "Auto Show FR after test",
+                "test_duration": "Test Duration (s):",
+                "Raw FR": "Raw FR",
+                "Smoothed FR": "Smoothed FR",
+                "Filtered FR": "Filtered FR",
+                "Frequency (Hz)": "Frequency (Hz)",
+                "Amplitude (dB)": "Amplitude (dB)",
+                "smoothing": "Smoothing:",
+                "variable_window": "Variable window",
+                "octave_fraction": "1/{n} octave",
+                "welch_segment": "FR segment length:",
+                "welch_overlap": "Overlap (%):",
+                "welch_window": "Window:",
+                "normalize_overall_fr": "Normalize channel levels in overall FR",
+                "cancel": "Cancel",
+                "recording_too_short": "Recording duration too short after trimming.",
+                "measurement_error": "Channel {channel} measurement error: {error}",
+                "measuring_channel": "Measuring channel {i} ({index} of {total})",
+                "adaptive_capture": "Stop early when the level is stable (streaming capture)",
+                "measurement_mode": "Measurement mode:",
+                "mode_noise": "Sequential white noise",
+                "mode_multitone": "Simultaneous multitone (all channels at once)",
+                "measuring_all_channels": "Measuring {total} channels simultaneously",
+                "mode_sweep": "Sequential exponential sweep",
+                "harmonic_fr": "H{k} distortion",
+                "live_rta": "Live RTA",
+                "rta_bands": "1/3-octave bands",
+                "pink_noise": "Pink noise:",
+                "off": "Off",
+                "save_sessions": "Save measurement sessions to disk",
+                "load_session": "Load Session",
+                "session_save_error": "Failed to save the session: {error}",
+                "session_load_error": "Failed to load the session: {error}",
+                "retention": "Keep:",
+                "retention_raw": "Raw recordings",
+                "retention_decimated": "Full-resolution spectra",
+                "retention_summary": "Summary only",
+                "multi_position": "Average over microphone positions (each test adds a position)",
+                "positions_suffix": " [{n} positions, ±{std:.2f} dB]",
+                "position_spread": "±1σ between positions",
+                "diagnostics": "Diagnostics",
+                "diagnostics_stage": "Stage",
+                "diagnostics_count": "Calls",
+                "diagnostics_total": "Total, s",
+                "diagnostics_mean": "Mean, ms",
+                "diagnostics_max": "Max, ms",
+                "stream_status": "Stream status: {status}",
+                "diagnostics_log": "Append events to {file}",
+                "reset": "Reset",
+                "export_json": "Export JSON",
+                "diagnostics_export_error": "Failed to export diagnostics: {error}",
+                "retest": "Re-test Out of Tolerance",
+                "retest_mismatch": "Re-test needs the mode and weighting of the previous measurement "
+                                   "({previous}). Select them again or measure all channels.",
+                "level_weighting": "Level weighting:",
+                "weighting_A": "A",
+                "weighting_C": "C",
+                "weighting_Z": "Z (flat)",
+                "band_levels": "Band Levels",
+                "band_fraction": "Bands:",
+                "band_channel": "Chart:",
+                "band_level": "Band level (dB)",
+                "export_csv": "Export CSV",
+                "export_error": "Failed to export: {error}",
+                "all_channels_ok": "All measured channels are within the allowed error.",
+                "room_correction": "Room Correction",
+                "correction_channel": "Channel:",
+                "correction_method": "Method:",
+                "method_peq": "PEQ",
+                "method_fir": "Minimum-phase FIR",
+                "target_slope": "Target slope (dB/oct):",
+                "peq_filters": "Filters:",
+                "fir_taps": "FIR taps:",
+                "measured_fr": "Measured",
+                "target_curve": "Target",
+                "corrected_fr": "Corrected",
+                "correction_filter": "Correction filter",
+                "peq_none": "No filters needed: the response is within 1 dB of the target.",
+                "fir_info": "Minimum-phase FIR, {taps} taps ({ms:.0f} ms)",
+                "export_filters": "Export Filters",
+                "preview_source": "Source:",
+                "source_pink": "Pink noise",
+                "source_file": "WAV file...",
+                "preview_all_channels": "All measured channels",
+                "preview_play": "Preview",
+                "preview_stop": "Stop",
+                "bypass": "Bypass (A/B)",
+                "correction_range_error": "The correction range is outside the measured frequencies.",
+                "wav_format_error": "Unsupported WAV sample size: {width} bit.",
+            },
+            "Русский": {
+                "app_title": "Тестер каналов с белым шумом",
+                "input_device": "Устройство ввода:",
+                "output_device": "Устройство вывода:",
+                "error_margin": "Допустимая погрешность (дБ):",
+                "test_all_channels": "Тестировать все каналы",
+                "not_tested": "Не тестирован",
+                "channel": "Канал",
+                "increase_volume": "Увеличьте на {trim:.1f} дБ",
+                "decrease_volume": "Уменьшите на {trim:.1f} дБ",
+                "channel_ok": "Канал настроен",
+                "no_data": "Нет данных",
+                "language": "Язык:",
+                "frequency_mismatch": "Частоты дискретизации входного и выходного устройств не совпадают ({input_fs} != {fs}).",
+                "device_error": "Ошибка доступа к информации об устройстве: {error}",
+                "channel_not_exist": "Канал {channel} не существует на выбранном устройстве.",
+                "left_front": "Левый фронтальный",
+                "right_front": "Правый фронтальный",
+                "center": "Центральный",
+                "subwoofer": "Сабвуфер",
+                "left_rear": "Левый тыловой",
+                "right_rear": "Правый тыловой",
+                "left_side": "Левый боковой",
+                "right_side": "Правый боковой",
+                "unknown": "Неизвестно",
+                "show_fr": "Показать АЧХ",
+                "wasapi_not_found": "Устройства WASAPI не найдены.",
+                "Error": "Ошибка",
+                "overall_fr": "Общая АЧХ",
+                "channel_fr": "АЧХ канала {i}",
+                "channel_not_tested": "Канал {i} еще не протестирован.",
+                "frequency_ticks": "Метки частот (Гц):",
+                "apply": "Применить",
+                "show_overall_fr": "Показать общую АЧХ",
+                "Frequency ticks updated.": "Метки частот обновлены.",
+                "Invalid frequency ticks input.": "Неверный ввод меток частот.",
+                "No data to display overall frequency response.": "Нет данных для отображения общей АЧХ.",
+                "Play Channel {i} ({name})": "Тестировать канал {i} ({name})",
+                "Channel {i}: {status}": "Канал {i}: {status}",
+                "Channel {i}: {rms:.2f} dB ({suggestion})": "Канал {i}: {rms:.2f} дБ ({suggestion})",
+                "auto_show_fr": "Авто показ АЧХ после теста",
+                "test_duration": "Длительность теста (с):",
+                "Raw FR": "Сырой АЧХ",
+                "Smoothed FR": "Сглаженный АЧХ",
+                "Filtered FR": "Отфильтрованный АЧХ",
+                "Frequency (Hz)": "Частота (Гц)",
+                "Amplitude (dB)": "Амплитуда (дБ)",
+                "smoothing": "Сглаживание:",
+                "variable_window": "Переменное окно",
+                "octave_fraction": "1/{n} октавы",
+                "welch_segment": "Длина сегмента АЧХ:",
+                "welch_overlap": "Перекрытие (%):",
+                "welch_window": "Окно:",
+                "normalize_overall_fr": "Выравнивать уровни каналов в общей АЧХ",
+                "cancel": "Отмена",
+                "recording_too_short": "Запись слишком короткая после обрезки.",
+                "measurement_error": "Ошибка измерения канала {channel}: {error}",
+                "measuring_channel": "Измерение канала {i} ({index} из {total})",
+                "adaptive_capture": "Досрочная остановка при установившемся уровне (потоковая запись)",
+                "measurement_mode": "Режим измерения:",
+                "mode_noise": "Белый шум по очереди",
+                "mode_multitone": "Одновременный мультитон (все каналы сразу)",
+                "measuring_all_channels": "Одновременное измерение {total} каналов",
+                "mode_sweep": "Экспоненциальный свип по очереди",
+                "harmonic_fr": "Искажения H{k}",
+                "live_rta": "Анализатор в реальном времени",
+                "rta_bands": "Полосы 1/3 октавы",
+                "pink_noise": "Розовый шум:",
+                "off": "Выкл.",
+                "save_sessions": "Сохранять сеансы измерений на диск",
+                "load_session": "Загрузить сеанс",
+                "session_save_error": "Не удалось сохранить сеанс: {error}",
+                "session_load_error": "Не удалось загрузить сеанс: {error}",
+                "retention": "Хранить:",
+                "retention_raw": "Исходные записи",
+                "retention_decimated": "Спектры полного разрешения",
+                "retention_summary": "Только сводку",
+                "multi_position": "Усреднение по положениям микрофона (каждый тест добавляет положение)",
+                "positions_suffix": " [положений: {n}, ±{std:.2f} дБ]",
+                "position_spread": "±1σ между положениями",
+                "diagnostics": "Диагностика",
+                "diagnostics_stage": "Этап",
+                "diagnostics_count": "Вызовов",
+                "diagnostics_total": "Всего, с",
+                "diagnostics_mean": "Среднее, мс",
+                "diagnostics_max": "Максимум, мс",
+                "stream_status": "Состояние потока: {status}",
+                "diagnostics_log": "Дописывать события в {file}",
+                "reset": "Сбросить",
+                "export_json": "Экспорт JSON",
+                "diagnostics_export_error": "Не удалось сохранить диагностику: {error}",
+                "retest": "Перепроверить каналы вне допуска",
+                "retest_mismatch": "Для перепроверки нужны режим и взвешивание прошлого измерения "
+                                   "({previous}). Выберите их снова или измерьте все каналы.",
+                "level_weighting": "Взвешивание уровня:",
+                "weighting_A": "A",
+                "weighting_C": "C",
+                "weighting_Z": "Z (без взвешивания)",
+                "band_levels": "Уровни в полосах",
+                "band_fraction": "Полосы:",
+                "band_channel": "Диаграмма:",
+                "band_level": "Уровень в полосе (дБ)",
+                "export_csv": "Экспорт CSV",
+                "export_error": "Не удалось сохранить: {error}",
+                "all_channels_ok": "Все измеренные каналы в пределах допустимой погрешности.",
+                "room_correction": "Коррекция АЧХ",
+                "correction_channel": "Канал:",
+                "correction_method": "Метод:",
+                "method_peq": "Параметрический эквалайзер",
+                "method_fir": "КИХ минимальной фазы",
+                "target_slope": "Наклон цели (дБ/окт):",
+                "peq_filters": "Фильтров:",
+                "fir_taps": "Длина КИХ:",
+                "measured_fr": "Измерено",
+                "target_curve": "Цель",
+                "corrected_fr": "После коррекции",
+                "correction_filter": "Фильтр коррекции",
+                "peq_none": "Фильтры не нужны: АЧХ отличается от цели меньше чем на 1 дБ.",
+                "fir_info": "КИХ-фильтр минимальной фазы, {taps} отсчётов ({ms:.0f} мс)",
+                "export_filters": "Экспорт фильтров",
+                "preview_source": "Источник:",
+                "source_pink": "Розовый шум",
+                "source_file": "Файл WAV...",
+                "preview_all_channels": "Все измеренные каналы",
+                "preview_play": "Прослушать",
+                "preview_stop": "Остановить",
+                "bypass": "Без коррекции (A/B)",
+                "correction_range_error": "Полоса коррекции вне измеренных частот.",
+                "wav_format_error": "Неподдерживаемая разрядность WAV: {width} бит.",
+            },
+        }
+
+        # Установка заголовка окна
+        self.setWindowTitle(self.tr("app_title"))
+        self.resize(800, 600)
+
+        # Получение списка устройств ввода и вывода, фильтруя по WASAPI
+        if measurement.sd is None:
+            QtWidgets.QMessageBox.critical(self, self.tr("Error"), self.tr("device_error").format(
+                error="sounddevice/PortAudio is not available"))
+            sys.exit(1)
+        self.hostapis = measurement.sd.query_hostapis()
+        self.input_devices, self.output_devices = measurement.wasapi_devices()
+
+        # Проверка наличия WASAPI устройств
+        if not self.input_devices or not self.output_devices:
+            QtWidgets.QMessageBox.critical(self, self.tr("Error"), self.tr("wasapi_not_found"))
+            sys.exit(1)
+
+        # Выбор языка
+        self.language_select = QtWidgets.QComboBox()
+        self.language_select.addItems(self.languages)
+        self.language_select.setCurrentText(self.current_language)
+        self.language_select.currentIndexChanged.connect(self.change_language)
+
+        # Выбор устройств
+        self.input_select = QtWidgets.QComboBox()
+        self.input_select.addItems([self.get_device_display_name(dev) for dev in self.input_devices])
+        self.output_select = QtWidgets.QComboBox()
+        self.output_select.addItems([self.get_device_display_name(dev) for dev in self.output_devices])
+
+        # Загрузка сохранённых устройств, если они существуют
+        self.load_saved_device()
+
+        self.output_select.currentIndexChanged.connect(self.update_channel_buttons)
+
+        # Элемент для выбора допустимой погрешности
+        self.error_margin_label = QtWidgets.QLabel(self.tr("error_margin"))
+        self.error_margin_spinbox = QtWidgets.QDoubleSpinBox()
+        self.error_margin_spinbox.setRange(0.1, 10.0)
+        self.error_margin_spinbox.setSingleStep(0.1)
+        self.error_margin_spinbox.setValue(self.settings.get("error_margin", 1.0))
+
+        # Метки частот и кнопка применения
+        self.frequency_ticks_label = QtWidgets.QLabel(self.tr("frequency_ticks"))
+        self.frequency_ticks_input = QtWidgets.QLineEdit(self.settings.get("frequency_ticks_input", "32,64,125,250,500,1000,2000,4000,8000,16000"))
+        self.frequency_ticks_apply_button = QtWidgets.QPushButton(self.tr("apply"))
+        self.frequency_ticks_apply_button.clicked.connect(self.apply_frequency_ticks)
+        self.frequency_ticks = [float(f.strip()) for f in self.frequency_ticks_input.text().split(',')]
+
+        # Чекбокс для автоматического отображения АЧХ после теста
+        self.auto_show_fr_checkbox = QtWidgets.QCheckBox(self.tr("auto_show_fr"))
+        self.auto_show_fr_checkbox.setChecked(self.settings.get("auto_show_fr", True))
+
+        # Чекбокс для выравнивания уровней каналов в общей АЧХ
+        self.normalize_overall_fr_checkbox = QtWidgets.QCheckBox(self.tr("normalize_overall_fr"))
+        self.normalize_overall_fr_checkbox.setChecked(self.settings.get("normalize_overall_fr", False))
+
+        # Элемент для выбора длительности теста
+        self.test_duration_label = QtWidgets.QLabel(self.tr("test_duration"))
+        self.test_duration_spinbox = QtWidgets.QDoubleSpinBox()
+        self.test_duration_spinbox.setRange(1.5, 10.0)
+        self.test_duration_spinbox.setSingleStep(0.1)
+        self.test_duration_spinbox.setValue(self.settings.get("test_duration", 2.0))  # Значение по умолчанию
+
+        # Выбор режима измерения
+        self.measurement_mode_label = QtWidgets.QLabel(self.tr("measurement_mode"))
+        self.measurement_mode_select = QtWidgets.QComboBox()
+        for mode in measurement.MEASUREMENT_MODES:
+            self.measurement_mode_select.addItem(self.tr("mode_" + mode), mode)
+        saved_mode = self.measurement_mode_select.findData(self.settings.get("measurement_mode", "noise"))
+        self.measurement_mode_select.setCurrentIndex(max(saved_mode, 0))
+
+        # Выбор объёма хранения результатов
+        self.retention_label = QtWidgets.QLabel(self.tr("retention"))
+        self.retention_select = QtWidgets.QComboBox()
+        for retention in measurement.RETENTION_MODES:
+            self.retention_select.addItem(self.tr("retention_" + retention), retention)
+        saved_retention = self.retention_select.findData(self.settings.get("retention", "raw"))
+        self.retention_select.setCurrentIndex(max(saved_retention, 0))
+
+        # Выбор частотного взвешивания уровня
+        self.weighting_label = QtWidgets.QLabel(self.tr("level_weighting"))
+        self.weighting_select = QtWidgets.QComboBox()
+        for weighting in dsp.WEIGHTINGS:
+            self.weighting_select.addItem(self.tr("weighting_" + weighting), weighting)
+        saved_weighting = self.weighting_select.findData(self.settings.get("level_weighting", "Z"))
+        self.weighting_select.setCurrentIndex(max(saved_weighting, 0))
+
+        # Чекбокс для потоковой записи с досрочной остановкой
+        self.adaptive_capture_checkbox = QtWidgets.QCheckBox(self.tr("adaptive_capture"))
+        self.adaptive_capture_checkbox.setChecked(self.settings.get("adaptive_capture", False))
+
+        # Чекбокс усреднения по положениям микрофона
+        self.multi_position_checkbox = QtWidgets.QCheckBox(self.tr("multi_position"))
+        self.multi_position_checkbox.setChecked(self.settings.get("multi_position", False))
+        self.multi_position_checkbox.toggled.connect(self.reset_positions)
+
+        # Чекбокс сохранения сеансов на диск
+        self.save_sessions_checkbox = QtWidgets.QCheckBox(self.tr("save_sessions"))
+        self.save_sessions_checkbox.setChecked(self.settings.get("save_sessions", False))
+
+        # Выбор режима сглаживания АЧХ
+        self.smoothing_label = QtWidgets.QLabel(self.tr("smoothing"))
+        self.smoothing_select = QtWidgets.QComboBox()
+        for mode in dsp.SMOOTHING_MODES:
+            self.smoothing_select.addItem(self.get_smoothing_display_name(mode), mode)
+        saved_mode = self.smoothing_select.findData(self.settings.get("smoothing_mode", "variable"))
+        self.smoothing_select.setCurrentIndex(max(saved_mode, 0))
+
+        # Параметры оценки АЧХ методом Уэлча
+        self.welch_segment_label = QtWidgets.QLabel(self.tr("welch_segment"))
+        self.welch_segment_select = QtWidgets.QComboBox()
+        for length in dsp.WELCH_SEGMENT_LENGTHS:
+            self.welch_segment_select.addItem(str(length), length)
+        saved_length = self.welch_segment_select.findData(self.settings.get("welch_segment_length", 8192))
+        self.welch_segment_select.setCurrentIndex(max(saved_length, 0))
+        self.welch_overlap_label = QtWidgets.QLabel(self.tr("welch_overlap"))
+        self.welch_overlap_spinbox = QtWidgets.QSpinBox()
+        self.welch_overlap_spinbox.setRange(0, 90)
+        self.welch_overlap_spinbox.setSingleStep(5)
+        self.welch_overlap_spinbox.setValue(self.settings.get("welch_overlap", 50))
+        self.welch_window_label = QtWidgets.QLabel(self.tr("welch_window"))
+        self.welch_window_select = QtWidgets.QComboBox()
+        self.welch_window_select.addItems(dsp.WELCH_WINDOWS)
+        self.welch_window_select.setCurrentText(self.settings.get("welch_window", "hann"))
+
+        # Изменение параметров анализа обновляет открытые окна АЧХ
+        self.smoothing_select.currentIndexChanged.connect(self.refresh_fr_windows)
+        self.welch_segment_select.currentIndexChanged.connect(self.refresh_fr_windows)
+        self.welch_overlap_spinbox.editingFinished.connect(self.refresh_fr_windows)
+        self.welch_window_select.currentIndexChanged.connect(self.refresh_fr_windows)
+        self.normalize_overall_fr_checkbox.toggled.connect(self.refresh_fr_windows)
+
+        # Генерация интерфейса
+        self.channel_buttons = []
+        self.channel_labels = []
+        self.channel_fr_buttons = []
+        self.measured_rms_levels = {}  # Словарь для хранения измеренных уровней
+        self.level_conditions = {}  # Канал -> (режим, взвешивание), которыми получен уровень
+        self.channel_fr_data = {}  # Словарь для хранения данных АЧХ каналов
+        self.channel_spectra = {}  # Кэш спектров каналов: канал -> (параметры, частоты, спектр)
+        self.channel_harmonics = {}  # Спектры гармоник каналов, измеренных свипом
+        self.recording_ids = {}  # Идентификатор последней записи каждого канала
+        self.session_writer = None  # Сеанс на диске, в который сохраняются измерения
+        self.channel_positions = {}  # Канал -> analysis.SpatialAverage в режиме нескольких положений
+        self.next_recording_id = 0
+        # Анализ АЧХ каналов рассчитывается в пуле потоков по мере измерения
+        self.analysis_executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count())
+        self.analysis_cache = analysis.AnalysisCache(executor=self.analysis_executor)  # Кэш результатов анализа АЧХ
+        self.channel_fr_windows = {}  # Словарь для хранения окон АЧХ каналов
+
+        # Фоновое измерение
+        self.measurement_thread = None
+        self.measurement_worker = None
+        self.show_fr_after_measurement = False
+        self.retest_running = False  # Идёт короткая повторная проверка каналов вне допуска
+
+        self.layout = QtWidgets.QVBoxLayout()
+        language_layout = QtWidgets.QHBoxLayout()
+        language_layout.addWidget(QtWidgets.QLabel(self.tr("language")))
+        language_layout.addWidget(self.language_select)
+        self.layout.addLayout(language_layout)
+
+        self.input_device_label = QtWidgets.QLabel(self.tr("input_device"))
+        self.output_device_label = QtWidgets.QLabel(self.tr("output_device"))
+
+        self.layout.addWidget(self.input_device_label)
+        self.layout.addWidget(self.input_select)
+        self.layout.addWidget(self.output_device_label)
+        self.layout.addWidget(self.output_select)
+
+        # Добавление выбора погрешности
+        error_layout = QtWidgets.QHBoxLayout()
+        error_layout.addWidget(self.error_margin_label)
+        error_layout.addWidget(self.error_margin_spinbox)
+        self.layout.addLayout(error_layout)
+
+        # Добавление настроек меток частот
+        freq_layout = QtWidgets.QHBoxLayout()
+        freq_layout.addWidget(self.frequency_ticks_label)
+        freq_layout.addWidget(self.frequency_ticks_input)
+        freq_layout.addWidget(self.frequency_ticks_apply_button)
+        self.layout.addLayout(freq_layout)
+
+        # Добавление выбора длительности теста
+        duration_layout = QtWidgets.QHBoxLayout()
+        duration_layout.addWidget(self.test_duration_label)
+        duration_layout.addWidget(self.test_duration_spinbox)
+        self.layout.addLayout(duration_layout)
+
+        # Добавление выбора режима измерения
+        mode_layout = QtWidgets.QHBoxLayout()
+        mode_layout.addWidget(self.measurement_mode_label)
+        mode_layout.addWidget(self.measurement_mode_select)
+        mode_layout.addWidget(self.retention_label)
+        mode_layout.addWidget(self.retention_select)
+        mode_layout.addWidget(self.weighting_label)
+        mode_layout.addWidget(self.weighting_select)
+        self.layout.addLayout(mode_layout)
+        self.layout.addWidget(self.adaptive_capture_checkbox)
+        self.layout.addWidget(self.multi_position_checkbox)
+
+        # Добавление выбора сглаживания
+        smoothing_layout = QtWidgets.QHBoxLayout()
+        smoothing_layout.addWidget(self.smoothing_label)
+        smoothing_layout.addWidget(self.smoothing_select)
+        self.layout.addLayout(smoothing_layout)
+
+        # Добавление параметров оценки АЧХ
+        welch_layout = QtWidgets.QHBoxLayout()
+        welch_layout.addWidget(self.welch_segment_label)
+        welch_layout.addWidget(self.welch_segment_select)
+        welch_layout.addWidget(self.welch_overlap_label)
+        welch_layout.addWidget(self.welch_overlap_spinbox)
+        welch_layout.addWidget(self.welch_window_label)
+        welch_layout.addWidget(self.welch_window_select)
+        self.layout.addLayout(welch_layout)
+
+        # Добавление чекбокса для автоматического отображения АЧХ
+        self.layout.addWidget(self.auto_show_fr_checkbox)
+        self.layout.addWidget(self.normalize_overall_fr_checkbox)
+        self.layout.addWidget(self.save_sessions_checkbox)
+
+        # Layout для каналов
+        self.channels_layout = QtWidgets.QGridLayout()
+        self.layout.addLayout(self.channels_layout)
+
+        # Кнопки для тестирования
+        buttons_layout = QtWidgets.QHBoxLayout()
+        self.test_all_button = QtWidgets.QPushButton(self.tr("test_all_channels"))
+        self.test_all_button.clicked.connect(self.test_all_channels)
+        buttons_layout.addWidget(self.test_all_button)
+
+        # Кнопка короткой повторной проверки каналов вне допуска
+        self.retest_button = QtWidgets.QPushButton(self.tr("retest"))
+        self.retest_button.clicked.connect(self.retest_out_of_tolerance)
+        buttons_layout.addWidget(self.retest_button)
+
+        # Кнопка отмены фонового измерения
+        self.cancel_button = QtWidgets.QPushButton(self.tr("cancel"))
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_measurement)
+        buttons_layout.addWidget(self.cancel_button)
+
+        # Кнопка для отображения общей АЧХ
+        self.show_overall_fr_button = QtWidgets.QPushButton(self.tr("show_overall_fr"))
+        self.show_overall_fr_button.clicked.connect(self.show_overall_fr)
+        buttons_layout.addWidget(self.show_overall_fr_button)
+
+        # Кнопка уровней в октавных полосах
+        self.band_levels_button = QtWidgets.QPushButton(self.tr("band_levels"))
+        self.band_levels_button.clicked.connect(self.show_band_levels)
+        buttons_layout.addWidget(self.band_levels_button)
+
+        # Кнопка коррекции АЧХ
+        self.room_correction_button = QtWidgets.QPushButton(self.tr("room_correction"))
+        self.room_correction_button.clicked.connect(self.show_room_correction)
+        buttons_layout.addWidget(self.room_correction_button)
+
+        # Кнопка анализатора спектра в реальном времени
+        self.live_rta_button = QtWidgets.QPushButton(self.tr("live_rta"))
+        self.live_rta_button.clicked.connect(self.open_rta)
+        buttons_layout.addWidget(self.live_rta_button)
+
+        # Кнопка загрузки сохранённого сеанса
+        self.load_session_button = QtWidgets.QPushButton(self.tr("load_session"))
+        self.load_session_button.clicked.connect(self.load_session)
+        buttons_layout.addWidget(self.load_session_button)
+
+        # Кнопка окна диагностики
+        self.diagnostics_button = QtWidgets.QPushButton(self.tr("diagnostics"))
+        self.diagnostics_button.clicked.connect(self.open_diagnostics)
+        buttons_layout.addWidget(self.diagnostics_button)
+
+        self.layout.addLayout(buttons_layout)
+
+        # Индикатор хода измерения
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.setVisible(False)
+        self.layout.addWidget(self.progress_bar)
+
+        # Placeholder для схемы динамиков
+        self.schematic_label = QtWidgets.QLabel()
+        self.schematic_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.layout.addWidget(self.schematic_label)
+
+        # Установить основной макет
+        self.setLayout(self.layout)
+
+        # Автоматическое обновление кнопок каналов
+        self.update_channel_buttons()
+
+        # Инициализация данных для общей АЧХ
+        self.overall_fr_data = None
+        self.overall_fr_window = None  # Окно для общей АЧХ
+        self.rta_window = None  # Окно анализатора в реальном времени
+        self.diagnostics_window = None  # Окно диагностики
+        self.band_window = None  # Окно уровней в полосах
+        self.correction_window = None  # Окно коррекции АЧХ
+        if self.settings.get("diagnostics_log", False):
+            diagnostics.DIAGNOSTICS.log_path = diagnostics.LOG_FILE
+
+    def tr(self, key):
+        """Перевод строки в соответствии с текущим языком"""
+        return self.translations[self.current_language].get(key, key)
+
+    def change_language(self):
+        """Изменение языка интерфейса"""
+        self.current_language = self.language_select.currentText()
+        self.settings["language"] = self.current_language
+        self.save_settings()
+        self.update_ui_language()
+
+    def update_ui_language(self):
+        """Обновление текста интерфейса при смене языка"""
+        self.setWindowTitle(self.tr("app_title"))
+        self.error_margin_label.setText(self.tr("error_margin"))
+        self.test_all_button.setText(self.tr("test_all_channels"))
+        self.retest_button.setText(self.tr("retest"))
+        self.cancel_button.setText(self.tr("cancel"))
+        self.input_device_label.setText(self.tr("input_device"))
+        self.output_device_label.setText(self.tr("output_device"))
+        self.layout.itemAt(0).layout().itemAt(0).widget().setText(self.tr("language"))
+        self.frequency_ticks_label.setText(self.tr("frequency_ticks"))
+        self.frequency_ticks_apply_button.setText(self.tr("apply"))
+        self.show_overall_fr_button.setText(self.tr("show_overall_fr"))
+        self.live_rta_button.setText(self.tr("live_rta"))
+        self.auto_show_fr_checkbox.setText(self.tr("auto_show_fr"))
+        self.normalize_overall_fr_checkbox.setText(self.tr("normalize_overall_fr"))
+        self.test_duration_label.setText(self.tr("test_duration"))
+        self.adaptive_capture_checkbox.setText(self.tr("adaptive_capture"))
+        self.save_sessions_checkbox.setText(self.tr("save_sessions"))
+        self.multi_position_checkbox.setText(self.tr("multi_position"))
+        self.load_session_button.setText(self.tr("load_session"))
+        self.diagnostics_button.setText(self.tr("diagnostics"))
+        self.band_levels_button.setText(self.tr("band_levels"))
+        self.room_correction_button.setText(self.tr("room_correction"))
+        self.measurement_mode_label.setText(self.tr("measurement_mode"))
+        for index in range(self.measurement_mode_select.count()):
+            mode = self.measurement_mode_select.itemData(index)
+            self.measurement_mode_select.setItemText(index, self.tr("mode_" + mode))
+        self.retention_label.setText(self.tr("retention"))
+        self.weighting_label.setText(self.tr("level_weighting"))
+        for index in range(self.weighting_select.count()):
+            self.weighting_select.setItemText(index, self.tr("weighting_" + self.weighting_select.itemData(index)))
+        for index in range(self.retention_select.count()):
+            retention = self.retention_select.itemData(index)
+            self.retention_select.setItemText(index, self.tr("retention_" + retention))
+        self.smoothing_label.setText(self.tr("smoothing"))
+        self.welch_segment_label.setText(self.tr("welch_segment"))
+        self.welch_overlap_label.setText(self.tr("welch_overlap"))
+        self.welch_window_label.setText(self.tr("welch_window"))
+        for index in range(self.smoothing_select.count()):
+            mode = self.smoothing_select.itemData(index)
+            self.smoothing_select.setItemText(index, self.get_smoothing_display_name(mode))
+
+        # Обновление кнопок и меток каналов без очистки данных
+        self.update_channel_buttons(clear_data=False)
+
+        # Обновление подписей открытых окон АЧХ
+        self.refresh_fr_windows()
+
+    def get_device_display_name(self, dev):
+        """Возвращает отображаемое имя устройства с типом драйвера"""
+        hostapi_info = self.hostapis[dev[1]]
+        hostapi_name = hostapi_info['name']
+        return f"{dev[0]} ({hostapi_name}) [Index {dev[2]}]"
+
+    def get_smoothing_display_name(self, mode):
+        """Возвращает отображаемое имя режима сглаживания"""
+        fraction = dsp.SMOOTHING_MODES[mode]
+        if fraction is None:
+            return self.tr("variable_window")
+        return self.tr("octave_fraction").format(n=fraction)
+
+    def load_settings(self):
+        """Загрузка сохранённых настроек"""
+        return config.load_settings()
+
+    def save_settings(self):
+        """Сохранение текущих настроек"""
+        # Устройства сохраняются по имени: номера устройств меняются при подключении новых
+        self.settings.pop("input_device", None)
+        self.settings.pop("output_device", None)
+        if self.input_devices:
+            self.settings["input_device_name"] = self.input_devices[self.input_select.currentIndex()][0]
+        if self.output_devices:
+            self.settings["output_device_name"] = self.output_devices[self.output_select.currentIndex()][0]
+        self.settings["language"] = self.current_language
+        self.settings["error_margin"] = self.error_margin_spinbox.value()
+        self.settings["frequency_ticks_input"] = self.frequency_ticks_input.text()
+        self.settings["auto_show_fr"] = self.auto_show_fr_checkbox.isChecked()
+        self.settings["test_duration"] = self.test_duration_spinbox.value()
+        self.settings["adaptive_capture"] = self.adaptive_capture_checkbox.isChecked()
+        self.settings["save_sessions"] = self.save_sessions_checkbox.isChecked()
+        self.settings["multi_position"] = self.multi_position_checkbox.isChecked()
+        self.settings["measurement_mode"] = self.measurement_mode_select.currentData()
+        self.settings["retention"] = self.retention_select.currentData()
+        self.settings["level_weighting"] = self.weighting_select.currentData()
+        self.settings["normalize_overall_fr"] = self.normalize_overall_fr_checkbox.isChecked()
+        self.settings["smoothing_mode"] = self.smoothing_select.currentData()
+        self.settings["welch_segment_length"] = self.welch_segment_select.currentData()
+        self.settings["welch_overlap"] = self.welch_overlap_spinbox.value()
+        self.settings["welch_window"] = self.welch_window_select.currentText()
+        config.save_settings(self.settings)
+
+    def load_saved_device(self):
+        """Установка сохранённых устройств при наличии"""
+        position = measurement.find_device(self.input_devices, self.settings.get("input_device_name"),
+                                           self.settings.get("input_device"))
+        if position is not None:
+            self.input_select.setCurrentIndex(position)
+        position = measurement.find_device(self.output_devices, self.settings.get("output_device_name"),
+                                           self.settings.get("output_device"))
+        if position is not None:
+            self.output_select.setCurrentIndex(position)
+
+    def update_channel_buttons(self, clear_data=True):
+        """Обновляет количество кнопок каналов в зависимости от выбранного устройства вывода"""
+        # Очистка предыдущих элементов
+        while self.channels_layout.count():
+            item = self.channels_layout.takeAt(0)
+            widget = item.widget()
+            if widget is not None:
+                widget.deleteLater()
+
+        self.channel_buttons.clear()
+        self.channel_labels.clear()
+        self.channel_fr_buttons.clear()
+
+        if clear_data:
+            self.measured_rms_levels.clear()  # Очистка измеренных значений
+            self.level_conditions.clear()     # Очистка режимов измерения уровней
+            self.channel_fr_data.clear()      # Очистка данных АЧХ
+            self.channel_spectra.clear()      # Очистка кэша спектров
+            self.channel_harmonics.clear()    # Очистка спектров гармоник
+            self.analysis_cache.clear()       # Очистка кэша анализа
+            self.session_writer = None        # Новые измерения - новый сеанс
+            self.channel_positions.clear()    # Очистка усреднения по положениям
+        # Не очищаем self.channel_fr_windows, чтобы окна оставались открытыми
+
+        # Получение информации об устройстве
+        output_device_index = self.output_select.currentIndex()
+        output_device = self.output_devices[output_device_index]
+        device_info = measurement.sd.query_devices(output_device[2])
+        num_channels = device_info['max_output_channels']
+
+        # Сопоставление каналов с позициями динамиков
+        self.channel_mapping = self.get_channel_mapping(num_channels)
+
+        for i in range(num_channels):
+            button_text = self.tr("Play Channel {i} ({name})").format(
+                i=i + 1, name=self.channel_mapping.get(i, self.tr("unknown")))
+            button = QtWidgets.QPushButton(button_text)
+            # Используем functools.partial для корректного захвата переменной i
+            button.clicked.connect(functools.partial(self.test_channel, i))
+            button.setEnabled(self.measurement_thread is None)
+            if i in self.measured_rms_levels:
+                rms_level = self.measured_rms_levels[i]
+                suggestion = self.tr("channel_ok")
+                label_text = self.tr("Channel {i}: {rms:.2f} dB ({suggestion})").format(
+                    i=i + 1, rms=rms_level, suggestion=suggestion)
+            else:
+                label_text = self.tr("Channel {i} ({name}): {status}").format(
+                    i=i + 1, name=self.channel_mapping.get(i, self.tr("unknown")), status=self.tr("not_tested"))
+            label = QtWidgets.QLabel(label_text)
+
+            # Добавляем кнопку для отображения АЧХ канала
+            fr_button = QtWidgets.QPushButton(self.tr("show_fr"))
+            # Используем functools.partial
+            fr_button.clicked.connect(functools.partial(self.show_channel_fr, i))
+            self.channel_fr_buttons.append(fr_button)
+
+            self.channel_buttons.append(button)
+            self.channel_labels.append(label)
+            self.channels_layout.addWidget(button, i, 0)
+            self.channels_layout.addWidget(label, i, 1)
+            self.channels_layout.addWidget(fr_button, i, 2)
+
+        # Обновление схемы динамиков
+        self.draw_speaker_schematic(num_channels, self.channel_mapping)
+
+    def get_channel_mapping(self, num_channels):
+        """Возвращает сопоставление индексов каналов с позициями динамиков"""
+        standard_mappings = {
+            2: {
+                0: self.tr('left_front'),
+                1: self.tr('right_front'),
+            },
+            6: {
+                0: self.tr('left_front'),
+                1: self.tr('right_front'),
+                2: self.tr('center'),
+                3: self.tr('subwoofer'),
+                4: self.tr('left_rear'),
+                5: self.tr('right_rear'),
+            },
+            8: {
+                0: self.tr('left_front'),
+                1: self.tr('right_front'),
+                2: self.tr('center'),
+                3: self.tr('subwoofer'),
+                4: self.tr('left_side'),
+                5: self.tr('right_side'),
+                6: self.tr('left_rear'),
+                7: self.tr('right_rear'),
+            },
+        }
+        return standard_mappings.get(num_channels, {i: self.tr('Channel {i}').format(i=i + 1) for i in range(num_channels)})
+
+    def draw_speaker_schematic(self, num_channels, channel_mapping, current_channel=None):
+        """Рисует схему расположения динамиков"""
+        pixmap_width = 500  # Уменьшен размер изображения
+        pixmap_height = 375
+        pixmap = QtGui.QPixmap(pixmap_width, pixmap_height)
+        pixmap.fill(QtCore.Qt.white)
+        painter = QtGui.QPainter(pixmap)
+        font = painter.font()
+        font.setPointSize(8)  # Уменьшен размер шрифта
+        painter.setFont(font)
+
+        # Позиции динамиков (координаты нормализованы от 0 до 1)
+        positions = {
+            self.tr('left_front'): (0.3, 0.3),
+            self.tr('right_front'): (0.7, 0.3),
+            self.tr('center'): (0.5, 0.2),
+            self.tr('subwoofer'): (0.5, 0.6),
+            self.tr('left_rear'): (0.2, 0.7),
+            self.tr('right_rear'): (0.8, 0.7),
+            self.tr('left_side'): (0.2, 0.5),
+            self.tr('right_side'): (0.8, 0.5),
+        }
+
+        for ch_index, speaker in channel_mapping.items():
+            pos = positions.get(speaker)
+            if pos:
+                x = pos[0] * pixmap_width
+                y = pos[1] * pixmap_height
+            else:
+                # Для неизвестных позиций
+                x = 0.5 * pixmap_width
+                y = 0.85 * pixmap_height
+
+            # Определение цвета динамика
+            if ch_index == current_channel:
+                painter.setBrush(QtCore.Qt.blue)
+            else:
+                painter.setBrush(QtCore.Qt.gray)
+
+            painter.setPen(QtCore.Qt.black)
+            painter.drawEllipse(QtCore.QPointF(x, y), 10, 10)  # Уменьшен размер динамика
+            painter.drawText(int(x + 12), int(y + 5), f"{speaker} ({ch_index + 1})")
+
+        painter.end()
+        self.schematic_label.setPixmap(pixmap)
+
+    def test_channel(self, channel, from_autotest=False):
+        """Тестирование отдельного канала"""
+        show_fr = self.auto_show_fr_checkbox.isChecked() and not from_autotest
+        self.start_measurement([channel], show_fr=show_fr)
+
+    def start_measurement(self, channels, show_fr=False, retest=False):
+        """Запуск измерения списка каналов в фоновом потоке
+
+        При retest=True каналы измеряются короткими замерами (шум - с досрочной
+        остановкой) в выбранном режиме, который retest_out_of_tolerance сверяет
+        с режимом прежних уровней.
+        """
+        if self.measurement_thread is not None:
+            return
+        # Анализатор и прослушивание коррекции занимают те же устройства
+        if self.rta_window is not None:
+            self.rta_window.close()
+        if self.correction_window is not None:
+            self.correction_window.stop_preview()
+
+        input_device_id = self.input_devices[self.input_select.currentIndex()][2]
+        output_device_id = self.output_devices[self.output_select.currentIndex()][2]
+        self.show_fr_after_measurement = show_fr
+        self.retest_running = retest
+        mode = self.measurement_mode_select.currentData()
+        if retest:
+            duration, adaptive = calibration.RETEST_SECONDS, True
+        else:
+            duration = self.test_duration_spinbox.value()
+            adaptive = self.adaptive_capture_checkbox.isChecked()
+        # Сабвуфер сравнивается с остальными каналами только в своей полосе
+        subwoofer_channel = self.find_subwoofer_channel()
+        band_limits = {subwoofer_channel: measurement.SUBWOOFER_BAND} if subwoofer_channel is not None else None
+
+        if not self.save_sessions_checkbox.isChecked():
+            self.session_writer = None
+        elif self.session_writer is None:
+            try:
+                self.session_writer = session_store.SessionWriter(session_store.session_info(
+                    self.input_devices[self.input_select.currentIndex()],
+                    self.output_devices[self.output_select.currentIndex()],
+                    len(self.channel_buttons)))
+            except OSError as e:
+                diagnostics.DIAGNOSTICS.log("error", channel=-1, key="session_save_error", error=str(e))
+                self.on_measurement_error(-1, measurement.MeasurementError("session_save_error", error=e))
+
+        # При нескольких положениях в сеанс пишется среднее (add_position), а не каждое положение
+        averaging = self.multi_position_checkbox.isChecked() and not retest
+        worker_session = None if averaging else self.session_writer
+
+        self.measurement_thread = QtCore.QThread()
+        self.measurement_worker = MeasurementWorker(
+            input_device_id, output_device_id, channels, duration, self.get_fr_params(),
+            mode=mode,
+            adaptive=adaptive,
+            error_margin=self.error_margin_spinbox.value(),
+            session_writer=worker_session,
+            retention=self.retention_select.currentData(),
+            weighting=self.weighting_select.currentData(),
+            band_limits=band_limits)
+        self.measurement_worker.moveToThread(self.measurement_thread)
+        self.measurement_thread.started.connect(self.measurement_worker.run)
+        self.measurement_worker.progress.connect(self.on_measurement_progress)
+        self.measurement_worker.channel_measured.connect(self.on_channel_measured)
+        self.measurement_worker.error.connect(self.on_measurement_error)
+        self.measurement_worker.finished.connect(self.on_measurement_finished)
+
+        self.set_measurement_running(True, len(channels))
+        self.measurement_thread.start()
+
+    def cancel_measurement(self):
+        """Отмена текущего фонового измерения"""
+        if self.measurement_worker is not None:
+            self.measurement_worker.cancel()
+
+    def set_measurement_running(self, running, total=0):
+        """Блокирует элементы управления на время измерения"""
+        for button in self.channel_buttons:
+            button.setEnabled(not running)
+        self.test_all_button.setEnabled(not running)
+        self.retest_button.setEnabled(not running)
+        self.input_select.setEnabled(not running)
+        self.output_select.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        self.progress_bar.setVisible(running)
+        if running:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(0)
+
+    def on_measurement_progress(self, channel, index, total):
+        """Выделение текущего канала на схеме и обновление индикатора"""
+        self.progress_bar.setValue(index)
+        if channel < 0:
+            self.progress_bar.setFormat(self.tr("measuring_all_channels").format(total=total))
+        else:
+            self.progress_bar.setFormat(self.tr("measuring_channel").format(i=channel + 1, index=index + 1, total=total))
+        self.draw_speaker_schematic(len(self.channel_buttons), self.channel_mapping, current_channel=channel)
+
+    def on_channel_measured(self, channel, result):
+        """Сохранение результата измерения канала"""
+        # Повторная проверка идёт после подстройки ресивера: прежние положения микрофона уже неактуальны
+        if self.multi_position_checkbox.isChecked() and not self.retest_running:
+            self.add_position(channel, result)
+        else:
+            self.channel_positions.pop(channel, None)
+            self.store_channel_result(channel, result)
+
+        # Анализ АЧХ считается в пуле, пока измеряются следующие каналы
+        self.prefetch_channel_analysis(channel)
+
+        # Пересчет рекомендаций для всех протестированных каналов
+        self.update_recommendations()
+        if self.band_window is not None:
+            self.band_window.update_bands()
+        if self.correction_window is not None:
+            self.correction_window.update_channels()
+        self.progress_bar.setValue(self.progress_bar.value() + 1)
+
+        # Отображение АЧХ текущего канала, если включено или окно уже открыто
+        fr_window = self.channel_fr_windows.get(channel)
+        if self.show_fr_after_measurement or (fr_window is not None and fr_window.isVisible()):
+            self.show_channel_fr(channel)
+
+    def add_position(self, channel, result):
+        """Добавление измерения канала в очередном положении микрофона к среднему
+
+        Сохраняются только средние уровень и АЧХ на сетке усреднения; запись отбрасывается.
+        В сеанс на диске пишется среднее с числом положений, а не отдельные положения.
+        """
+        average = self.channel_positions.get(channel)
+        if average is None:
+            average = self.channel_positions[channel] = analysis.SpatialAverage()
+        average.add(result.freqs, result.spectrum, result.rms_level)
+        averaged = measurement.ChannelResult(channel, result.fs, None, average.level_mean)
+        averaged.fr_params = result.fr_params
+        averaged.freqs = average.grid
+        averaged.spectrum = average.spectrum()
+        averaged.mode = result.mode
+        averaged.weighting = result.weighting
+        averaged.band = result.band
+        averaged.level_stats = {"positions": average.count, "position_std_db": round(average.level_std(), 3)}
+        self.store_channel_result(channel, averaged)
+        if self.session_writer is not None:
+            try:
+                self.session_writer.add_result(averaged)
+            except OSError as e:
+                self.session_writer = None
+                diagnostics.DIAGNOSTICS.log("error", channel=-1, key="session_save_error", error=str(e))
+                self.on_measurement_error(-1, measurement.MeasurementError("session_save_error", error=e))
+
+    def reset_positions(self):
+        """Начало новой серии положений микрофона"""
+        self.channel_positions.clear()
+        self.update_recommendations()
+
+    def store_channel_result(self, channel, result):
+        """Сохранение уровня, записи и спектров канала"""
+        self.measured_rms_levels[channel] = result.rms_level  # Сохранение измеренного уровня
+        self.level_conditions[channel] = (result.mode, result.weighting)
+
+        # Сохранение данных АЧХ и спектра, рассчитанного в фоновом потоке
+        self.channel_fr_data[channel] = (result.recording, result.fs)
+        self.channel_spectra[channel] = (result.fr_params, result.freqs, result.spectrum)
+        # Новая запись делает недействительными прежние результаты анализа канала
+        self.recording_ids[channel] = self.next_recording_id
+        self.next_recording_id += 1
+        self.analysis_cache.invalidate(channel)
+        if result.harmonics is not None:
+            self.channel_harmonics[channel] = result.harmonics
+        else:
+            self.channel_harmonics.pop(channel, None)
+
+    def on_measurement_error(self, channel, error):
+        """Отображение ошибки измерения (в журнал диагностики она уже записана при возникновении)"""
+        if isinstance(error, measurement.MeasurementError):
+            message = self.tr(error.key).format(**error.params)
+        else:
+            message = self.tr("measurement_error").format(channel=channel + 1, error=error)
+        if channel < 0:
+            # Ошибка устройства: измерение невозможно
+            QtWidgets.QMessageBox.warning(self, self.tr("app_title"), message)
+        elif channel < len(self.channel_labels):
+            self.channel_labels[channel].setText(self.tr("Channel {i}: {status}").format(
+                i=channel + 1, status=message))
+            self.channel_labels[channel].setStyleSheet("color: black;")
+
+    def on_measurement_finished(self, cancelled):
+        """Завершение фонового измерения"""
+        self.measurement_thread.quit()
+        self.measurement_thread.wait()
+        self.measurement_thread = None
+        self.measurement_worker = None
+        self.retest_running = False
+        self.set_measurement_running(False)
+
+        self.save_settings()  # Сохранение настроек
+
+        # Сброс выделения динамика после тестирования
+        self.draw_speaker_schematic(len(self.channel_buttons), self.channel_mapping)
+
+        # Общая АЧХ готовится сразу после последнего канала
+        self.prefetch_overall_analysis()
+
+        # Обновление открытого окна общей АЧХ
+        if self.overall_fr_window is not None and self.overall_fr_window.isVisible():
+            self.show_overall_fr()
+
+    def apply_frequency_ticks(self):
+        """Применение пользовательских меток частот"""
+        try:
+            ticks = [float(f.strip()) for f in self.frequency_ticks_input.text().split(',')]
+            if not ticks:
+                raise ValueError
+            self.frequency_ticks = ticks
+            # Открытые окна перерисовываются из кэша анализа: меняется только ось X
+            self.refresh_fr_windows()
+            QtWidgets.QMessageBox.information(self, self.tr("app_title"), self.tr("Frequency ticks updated."))
+            self.save_settings()  # Сохранение настроек
+        except ValueError:
+            QtWidgets.QMessageBox.warning(self, self.tr("app_title"), self.tr("Invalid frequency ticks input."))
+
+    def compute_fr(self, data, fs, params):
+        """Вычисление АЧХ усреднённой периодограммой Уэлча с параметрами params"""
+        return dsp.fr_spectrum(data, fs, *params)
+
+    def get_fr_params(self):
+        """Текущие параметры оценки АЧХ"""
+        return (self.welch_segment_select.currentData(),
+                self.welch_overlap_spinbox.value(),
+                self.welch_window_select.currentText())
+
+    def get_channel_spectrum_args(self, channel):
+        """Запись канала и параметры оценки АЧХ на момент вызова (для расчёта в пуле)"""
+        data, fs = self.channel_fr_data[channel]
+        return channel, data, fs, self.get_fr_params()
+
+    def compute_channel_spectrum(self, channel, data, fs, params):
+        """АЧХ записи канала; пересчитывается только при изменении записи или параметров
+
+        Может выполняться в пуле анализа: результат попадает в кэш, только если
+        канал за это время не был измерен заново.
+        """
+        cached = self.channel_spectra.get(channel)
+        # Для одновременного измерения исходной записи нет, спектр доступен только из кэша
+        if cached is not None and (cached[0] == params or data is None):
+            return cached[1], cached[2]
+        freqs, spectrum = self.compute_fr(data, fs, params)
+        if self.channel_fr_data.get(channel, (None,))[0] is data:
+            self.channel_spectra[channel] = (params, freqs, spectrum)
+        return freqs, spectrum
+
+    def get_channel_spectrum(self, channel):
+        """Возвращает АЧХ канала, пересчитывая её только при изменении записи или параметров"""
+        return self.compute_channel_spectrum(*self.get_channel_spectrum_args(channel))
+
+    def get_analysis_params(self):
+        """Параметры, от которых зависит результат анализа АЧХ"""
+        return self.get_fr_params() + (self.smoothing_select.currentData(),)
+
+    def get_channel_analysis_key(self, channel):
+        """Ключ кэша анализа АЧХ канала"""
+        return (channel, self.recording_ids.get(channel), self.get_analysis_params())
+
+    def get_channel_analysis_args(self, channel):
+        """Аргументы analyze_channel; сам спектр не считается, чтобы не занимать поток интерфейса"""
+        average = self.channel_positions.get(channel)
+        spread = average.spread() if average is not None and average.count > 1 else None
+        return (self.get_channel_spectrum_args(channel), self.smoothing_select.currentData(),
+                self.channel_harmonics.get(channel), spread)
+
+    def analyze_channel(self, spectrum_args, smoothing_mode, harmonics, spread):
+        """Спектр (при смене параметров Уэлча) и анализ АЧХ канала; выполняется в пуле"""
+        freqs, spectrum = self.compute_channel_spectrum(*spectrum_args)
+        return analysis.analyze_fr(freqs, spectrum, smoothing_mode, harmonics, spread)
+
+    def get_channel_analysis(self, channel):
+        """Анализ АЧХ канала из кэша; пересчитывается только для новой записи или параметров"""
+        key = self.get_channel_analysis_key(channel)
+        result = self.analysis_cache.get(key)
+        if result is None:
+            result = self.analysis_cache.get_or_compute(key, self.analyze_channel,
+                                                        *self.get_channel_analysis_args(channel))
+        return result
+
+    def prefetch_channel_analysis(self, channel):
+        """Запуск расчёта спектра и анализа АЧХ канала в пуле, чтобы окно открылось без расчёта"""
+        key = self.get_channel_analysis_key(channel)
+        if self.analysis_cache.get(key) is None:
+            self.analysis_cache.submit(key, self.analyze_channel, *self.get_channel_analysis_args(channel))
+
+    def get_overall_analysis_key(self):
+        """Ключ кэша анализа общей АЧХ"""
+        recordings = tuple((channel, self.recording_ids.get(channel)) for channel in sorted(self.channel_fr_data))
+        return (analysis.OVERALL, recordings, self.get_analysis_params(),
+                self.normalize_overall_fr_checkbox.isChecked())
+
+    def get_overall_analysis_args(self):
+        """Аргументы analyze_overall_channels: записи каналов и параметры, спектры считаются в пуле"""
+        spectrum_args = [self.get_channel_spectrum_args(channel) for channel in sorted(self.channel_fr_data)]
+        return (spectrum_args, self.normalize_overall_fr_checkbox.isChecked(),
+                self.smoothing_select.currentData())
+
+    def analyze_overall_channels(self, spectrum_args, normalize, smoothing_mode):
+        """Спектры каналов и анализ общей АЧХ; выполняется в пуле"""
+        spectra = [self.compute_channel_spectrum(*args) for args in spectrum_args]
+        # При выравнивании каждый канал входит в среднее с весом, обратным его мощности
+        weights = None
+        if normalize:
+            weights = [1.0 / (np.mean(spectrum ** 2) + 1e-20) for _, spectrum in spectra]
+        return analysis.analyze_overall(spectra, weights, smoothing_mode)
+
+    def get_overall_analysis(self):
+        """Анализ общей АЧХ из кэша"""
+        key = self.get_overall_analysis_key()
+        result = self.analysis_cache.get(key)
+        if result is None:
+            result = self.analysis_cache.get_or_compute(key, self.analyze_overall_channels,
+                                                        *self.get_overall_analysis_args())
+        return result
+
+    def prefetch_overall_analysis(self):
+        """Запуск расчёта спектров каналов и анализа общей АЧХ в пуле"""
+        key = self.get_overall_analysis_key()
+        if self.channel_fr_data and self.analysis_cache.get(key) is None:
+            self.analysis_cache.submit(key, self.analyze_overall_channels, *self.get_overall_analysis_args())
+
+    def get_fr_plot_labels(self, title):
+        """Подписи графика АЧХ на текущем языке"""
+        return {
+            "title": title,
+            "raw": self.tr('Raw FR'),
+            "smoothed": self.tr('Smoothed FR'),
+            "filtered": self.tr('Filtered FR'),
+            "harmonic": self.tr("harmonic_fr"),
+            "spread": self.tr("position_spread"),
+            "xlabel": self.tr("Frequency (Hz)"),
+            "ylabel": self.tr("Amplitude (dB)"),
+        }
+
+    def map_frequencies(self, freqs, freq_ticks):
+        """Маппинг частот на позиции оси X с равными интервалами между метками частот."""
+        return dsp.map_frequencies(freqs, freq_ticks)
+
+    def show_channel_fr(self, channel, temporary=False):
+        """Отображение АЧХ канала в отдельном окне с равными интервалами между метками частот."""
+        if channel not in self.channel_fr_data:
+            QtWidgets.QMessageBox.information(self, self.tr("app_title"),
+                                              self.tr("channel_not_tested").format(i=channel + 1))
+            return
+
+        fr = self.get_channel_analysis(channel)
+
+        # Включаем 0 и 20000 Гц в список меток частот
+        freq_ticks = [0] + sorted(set(self.frequency_ticks)) + [20000]
+
+        # Маппинг частот на позиции оси X (единственный шаг, зависящий от меток частот)
+        x_positions = self.map_frequencies(fr.freqs, freq_ticks)
+
+        # Окно канала создаётся один раз и затем только обновляется
+        fr_window = self.channel_fr_windows.get(channel)
+        if fr_window is None:
+            fr_window = FrPlotWindow()
+            # Сохранение ссылки на окно, чтобы оно не закрывалось
+            self.channel_fr_windows[channel] = fr_window
+        with diagnostics.DIAGNOSTICS.stage("plot"):
+            fr_window.update_plot(fr, x_positions, freq_ticks,
+                                  self.get_fr_plot_labels(self.tr("channel_fr").format(i=channel + 1)))
+        fr_window.show()
+
+        if temporary:
+            # Закрытие окна через 2 секунды
+            QtCore.QTimer.singleShot(2000, lambda: self.close_temporary_fr_window(channel))
+
+    def show_overall_fr(self):
+        """Отображение общей АЧХ в отдельном окне с равными интервалами между метками частот."""
+        if not self.channel_fr_data:
+            QtWidgets.QMessageBox.information(self, self.tr("app_title"),
+                                              self.tr("No data to display overall frequency response."))
+            return
+
+        fr = self.get_overall_analysis()
+
+        # Включаем 0 и 20000 Гц в список меток частот
+        freq_ticks = [0] + sorted(set(self.frequency_ticks)) + [20000]
+
+        # Маппинг частот на позиции оси X (единственный шаг, зависящий от меток частот)
+        x_positions = self.map_frequencies(fr.freqs, freq_ticks)
+
+        # Окно общей АЧХ создаётся один раз и затем только обновляется
+        if self.overall_fr_window is None:
+            self.overall_fr_window = FrPlotWindow()
+        with diagnostics.DIAGNOSTICS.stage("plot"):
+            self.overall_fr_window.update_plot(fr, x_positions, freq_ticks,
+                                               self.get_fr_plot_labels(self.tr("overall_fr")))
+        self.overall_fr_window.show()
+
+    def refresh_fr_windows(self):
+        """Обновление открытых окон АЧХ
+
+        Анализ всех каналов сначала запускается в пуле, затем окна забирают готовые результаты.
+        """
+        for channel in self.channel_fr_data:
+            self.prefetch_channel_analysis(channel)
+        self.prefetch_overall_analysis()
+        for channel, window in list(self.channel_fr_windows.items()):
+            if window.isVisible() and channel in self.channel_fr_data:
+                self.show_channel_fr(channel)
+        if self.overall_fr_window is not None and self.overall_fr_window.isVisible() and self.channel_fr_data:
+            self.show_overall_fr()
+        if self.band_window is not None:
+            self.band_window.update_bands()
+        if self.correction_window is not None:
+            self.correction_window.update_channels()
+
+    def close_temporary_fr_window(self, channel):
+        """Закрывает временное окно АЧХ канала"""
+        if channel in self.channel_fr_windows:
+            self.channel_fr_windows[channel].close()
+            del self.channel_fr_windows[channel]
+
+    def find_subwoofer_channel(self):
+        """Номер канала сабвуфера по раскладке или None"""
+        for ch_index, name in self.channel_mapping.items():
+            if self.tr('subwoofer').lower() in name.lower():
+                return ch_index
+        return None
+
+    def update_recommendations(self):
+        """Обновляет рекомендации и поправки для всех протестированных каналов"""
+        plan = calibration.plan_trims(self.measured_rms_levels, self.error_margin_spinbox.value(),
+                                      self.find_subwoofer_channel())
+        if plan is None:
+            return  # Нет данных для обновления
+
+        # Обновление рекомендаций для каждого канала
+        for ch in self.measured_rms_levels:
+            rms_level = self.measured_rms_levels[ch]
+            trim = plan.trims[ch]
+
+            if plan.within_tolerance(ch):
+                suggestion = self.tr("channel_ok")
+                color = "green"
+            elif trim > 0:
+                suggestion = self.tr("increase_volume").format(trim=trim)
+                color = "red"
+            else:
+                suggestion = self.tr("decrease_volume").format(trim=-trim)
+                color = "red"
+
+            label_text = self.tr("Channel {i}: {rms:.2f} dB ({suggestion})").format(
+                i=ch + 1, rms=rms_level, suggestion=suggestion)
+            average = self.channel_positions.get(ch)
+            if average is not None:
+                label_text += self.tr("positions_suffix").format(n=average.count, std=average.level_std())
+            self.channel_labels[ch].setText(label_text)
+            self.channel_labels[ch].setStyleSheet(f"color: {color};")
+
+    def retest_out_of_tolerance(self):
+        """Короткая повторная проверка только тех каналов, уровень которых вне допуска"""
+        plan = calibration.plan_trims(self.measured_rms_levels, self.error_margin_spinbox.value(),
+                                      self.find_subwoofer_channel())
+        channels = plan.out_of_tolerance if plan is not None else []
+        if not channels:
+            QtWidgets.QMessageBox.information(self, self.tr("app_title"), self.tr("all_channels_ok"))
+            return
+        # Новые уровни сравниваются с прежними, поэтому режим и взвешивание должны совпадать с прошлым
+        # измерением всех каналов, как и в пакетном режиме
+        conditions = set(self.level_conditions.get(channel) for channel in self.measured_rms_levels)
+        current = (self.measurement_mode_select.currentData(), self.weighting_select.currentData())
+        if conditions != {current}:
+            previous = ", ".join(f"{self.tr('mode_' + str(mode))} / {weighting}"
+                                 for mode, weighting in sorted(conditions - {None}, key=str))
+            QtWidgets.QMessageBox.warning(self, self.tr("app_title"),
+                                          self.tr("retest_mismatch").format(previous=previous or "-"))
+            return
+        self.start_measurement(channels, retest=True)
+
+    def open_rta(self):
+        """Открытие анализатора спектра в реальном времени на выбранных устройствах"""
+        if self.rta_window is not None:
+            self.rta_window.raise_()
+            return
+        if self.measurement_thread is not None:
+            return
+        if self.correction_window is not None:
+            self.correction_window.stop_preview()
+        input_device_id = self.input_devices[self.input_select.currentIndex()][2]
+        output_device_id = self.output_devices[self.output_select.currentIndex()][2]
+        try:
+            fs, num_channels = measurement.get_device_params(input_device_id, output_device_id)
+            capture = rta.LiveCapture(input_device_id, output_device_id, num_channels, fs)
+            capture.start()
+        except measurement.MeasurementError as e:
+            diagnostics.DIAGNOSTICS.log("error", channel=-1, key=e.key, error=str(e.params.get("error", "")))
+            QtWidgets.QMessageBox.warning(self, self.tr("app_title"), self.tr(e.key).format(**e.params))
+            return
+        except Exception as e:
+            diagnostics.DIAGNOSTICS.log("error", channel=-1, key="device_error", error=str(e))
+            QtWidgets.QMessageBox.warning(self, self.tr("app_title"), self.tr("device_error").format(error=e))
+            return
+        self.rta_window = RtaWindow(self, capture)
+        self.rta_window.show()
+
+    def load_session(self):
+        """Загрузка сохранённого сеанса вместо текущих результатов
+
+        Записи и спектры отображаются в память и читаются с диска только при построении АЧХ.
+        """
+        if self.measurement_thread is not None:
+            return
+        path = QtWidgets.QFileDialog.getExistingDirectory(self, self.tr("load_session"),
+                                                          session_store.SESSIONS_DIR)
+        if not path:
+            return
+        try:
+            _, results = session_store.load_session(path)
+        except (OSError, ValueError, KeyError) as e:
+            diagnostics.DIAGNOSTICS.log("error", channel=-1, key="session_load_error", error=str(e))
+            QtWidgets.QMessageBox.warning(self, self.tr("app_title"),
+                                          self.tr("session_load_error").format(error=e))
+            return
+
+        self.update_channel_buttons()
+        for channel, result in sorted(results.items()):
+            if channel < len(self.channel_buttons):
+                self.store_channel_result(channel, result)
+        self.update_recommendations()
+        self.refresh_fr_windows()
+
+    def show_band_levels(self):
+        """Открытие окна уровней каналов в октавных полосах"""
+        if not self.channel_fr_data:
+            QtWidgets.QMessageBox.information(self, self.tr("app_title"), self.tr("no_data"))
+            return
+        if self.band_window is not None:
+            self.band_window.update_bands()
+            self.band_window.raise_()
+            return
+        self.band_window = BandWindow(self)
+        self.band_window.show()
+
+    def show_room_correction(self):
+        """Открытие окна коррекции АЧХ по измеренным каналам"""
+        if not self.channel_fr_data:
+            QtWidgets.QMessageBox.information(self, self.tr("app_title"), self.tr("no_data"))
+            return
+        if self.correction_window is not None:
+            self.correction_window.raise_()
+            return
+        self.correction_window = CorrectionWindow(self)
+        self.correction_window.show()
+
+    def open_diagnostics(self):
+        """Открытие окна диагностики"""
+        if self.diagnostics_window is not None:
+            self.diagnostics_window.raise_()
+            return
+        self.diagnostics_window = DiagnosticsWindow(self)
+        self.diagnostics_window.show()
+
+    def test_all_channels(self):
+        """Тестирование всех каналов по очереди"""
+        self.start_measurement(list(range(len(self.channel_buttons))))
+
+    def closeEvent(self, event):
+        """Обработчик закрытия окна"""
+        if self.measurement_thread is not None:
+            self.measurement_worker.cancel()
+            self.measurement_thread.quit()
+            self.measurement_thread.wait()
+        if self.rta_window is not None:
+            self.rta_window.close()
+        if self.diagnostics_window is not None:
+            self.diagnostics_window.close()
+        if self.band_window is not None:
+            self.band_window.close()
+        if self.correction_window is not None:
+            self.correction_window.close()
+        self.analysis_executor.shutdown(wait=False)
+        self.save_settings()
+        event.accept()
+
+def run():
+    """Запуск графического интерфейса"""
+    app = QtWidgets.QApplication(sys.argv)
+    tester = WhiteNoiseTester()
+    tester.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,277 @@
+"""Пакетное измерение каналов без графического интерфейса с выводом результатов в JSON"""
+import json
+import os
+import sys
+import numpy as np
+
+import analysis
+import calibration
+import config
+import correction
+import diagnostics
+import dsp
+import measurement
+import session_store
+
+# Канал сабвуфера в стандартных раскладках 5.1 и 7.1 не участвует в среднем уровне
+SUBWOOFER_CHANNELS = {6: 3, 8: 3}
+
+
+def resolve_device(device_id, devices, saved_name, saved_index):
+    """Индекс устройства: явно заданный, сохранённый в настройках или первый из списка WASAPI
+
+    Сохранённое устройство ищется по имени, как в интерфейсе; для настроек
+    старых версий - по номеру в отсортированном по имени списке.
+    """
+    if device_id is not None:
+        return device_id
+    position = measurement.find_device(devices, saved_name, saved_index)
+    if position is not None:
+        return devices[position][2]
+    if saved_name is not None:
+        raise measurement.MeasurementError("device_error", error=f"saved device not found: {saved_name}")
+    if devices:
+        return devices[0][2]
+    raise measurement.MeasurementError("device_error", error="no WASAPI devices found")
+
+
+def parse_channels(spec, num_channels):
+    """Список каналов из строки "all" или номеров через запятую (с единицы, как в интерфейсе)"""
+    if spec == "all":
+        return list(range(num_channels))
+    channels = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        try:
+            number = int(item)
+        except ValueError:
+            raise measurement.MeasurementError("channel_error", channel=item.strip(), num_channels=num_channels)
+        if not 1 <= number <= num_channels:
+            raise measurement.MeasurementError("channel_error", channel=number, num_channels=num_channels)
+        channels.append(number - 1)
+    return channels
+
+
+def load_report(path):
+    """Прошлый JSON-отчёт для повторной проверки"""
+    try:
+        with open(path, "r") as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        raise measurement.MeasurementError("retest_error", error=e)
+    if not isinstance(report, dict):
+        raise measurement.MeasurementError("retest_error", error=f"not a report: {path}")
+    return report
+
+
+def retest_params(previous, mode, weighting):
+    """Режим и частотная коррекция повторной проверки - те же, что в прошлом отчёте
+
+    Иначе уровни перемеренных каналов нельзя сравнивать с уровнями, взятыми из
+    отчёта. Явно заданные и отличающиеся от отчёта режим или коррекция - ошибка.
+    """
+    previous_mode = previous.get("mode", "noise")
+    previous_weighting = next((report["weighting"] for report in previous.get("channels", [])
+                               if "weighting" in report), weighting)
+    if mode not in (None, previous_mode) or weighting not in (None, previous_weighting):
+        raise measurement.MeasurementError("retest_error", mode=previous_mode, weighting=previous_weighting)
+    return previous_mode, previous_weighting
+
+
+def error_report(channel, error):
+    """Описание ошибки для JSON"""
+    report = {"channel": channel + 1 if channel >= 0 else None}
+    if isinstance(error, measurement.MeasurementError):
+        report["error"] = error.key
+        report["params"] = {key: str(value) for key, value in error.params.items()}
+    else:
+        report["error"] = str(error)
+    return report
+
+
+def channel_report(result, smoothing_mode):
+    """Уровень и сглаженная АЧХ канала на логарифмической сетке"""
+    report = {"channel": result.channel + 1, "rms_db": round(float(result.rms_level), 3)}
+    if result.latency is not None:
+        report["latency"] = result.latency
+    if result.weighting is not None:
+        report["weighting"] = result.weighting
+        report["band"] = list(result.band)
+    if result.level_stats is not None:
+        report.update(result.level_stats)
+    if result.spectrum is not None:
+        smoothed = np.abs(dsp.smooth_spectrum(result.spectrum, result.freqs, smoothing_mode))
+        freqs, magnitude = dsp.resample_spectrum(result.freqs, smoothed)
+        report["fr"] = {"freqs": np.round(freqs, 2).tolist(),
+                        "magnitude_db": np.round(20 * np.log10(magnitude + 1e-20), 2).tolist()}
+    return report
+
+
+def add_recommendations(reports, num_channels, error_margin):
+    """Отклонение уровня каждого канала от опорного, поправка и рекомендация по громкости
+
+    Возвращает calibration.TrimPlan или None, если рекомендации рассчитать не по чему.
+    """
+    plan = calibration.plan_trims({report["channel"] - 1: report["rms_db"] for report in reports},
+                                  error_margin, SUBWOOFER_CHANNELS.get(num_channels))
+    if plan is None:
+        return None
+    for report in reports:
+        channel = report["channel"] - 1
+        difference = plan.differences[channel]
+        report["difference_db"] = round(difference, 3)
+        report["trim_db"] = round(plan.trims[channel], 1)
+        if plan.within_tolerance(channel):
+            report["suggestion"] = "ok"
+        elif difference < 0:
+            report["suggestion"] = "increase"
+        else:
+            report["suggestion"] = "decrease"
+    return plan
+
+
+def export_corrections(spectra, fs, subwoofer, settings, directory):
+    """Фильтры коррекции АЧХ всех каналов со спектром; возвращает список записанных файлов"""
+    os.makedirs(directory, exist_ok=True)
+    method = settings.get("correction_method", "peq")
+    files = []
+    for channel, (freqs, spectrum) in sorted(spectra.items()):
+        f_range = correction.SUBWOOFER_RANGE if channel == subwoofer else correction.CORRECTION_RANGE
+        result = correction.design_correction(
+            channel, freqs, spectrum, fs, method, f_range, settings.get("correction_slope", 0.0),
+            settings.get("correction_filters", correction.PEQ_MAX_FILTERS),
+            settings.get("correction_taps", correction.DEFAULT_FIR_TAPS))
+        path = os.path.join(directory, f"channel_{channel + 1}_{method}.txt")
+        correction.write_correction(path, result)
+        files.append(path)
+    return files
+
+
+def run(args):
+    """Измерение каналов по аргументам командной строки; возвращает код завершения"""
+    settings = config.load_settings()
+    mode = args.mode or settings.get("measurement_mode", "noise")
+    duration = args.duration or settings.get("test_duration", 2.0)
+    error_margin = settings.get("error_margin", 1.0)
+    adaptive = args.adaptive or settings.get("adaptive_capture", False)
+    smoothing_mode = settings.get("smoothing_mode", "variable")
+    retention = args.retention or settings.get("retention", "raw")
+    weighting = args.weighting or settings.get("level_weighting", "Z")
+    fr_params = (settings.get("welch_segment_length", 8192), settings.get("welch_overlap", 50),
+                 settings.get("welch_window", "hann"))
+
+    # Повторная проверка: короткие замеры только каналов, которые в прошлом отчёте были вне допуска,
+    # в режиме и с частотной коррекцией прошлого отчёта
+    previous = None
+    if args.retest:
+        duration, adaptive = calibration.RETEST_SECONDS, True
+
+    output = {"mode": mode, "duration": duration, "channels": [], "errors": []}
+    try:
+        if args.retest:
+            previous = load_report(args.retest)
+            mode, weighting = retest_params(previous, args.mode, args.weighting)
+            output["mode"] = mode
+        input_devices, output_devices = measurement.wasapi_devices()
+        input_device_id = resolve_device(args.input, input_devices, settings.get("input_device_name"),
+                                         settings.get("input_device"))
+        output_device_id = resolve_device(args.output, output_devices, settings.get("output_device_name"),
+                                          settings.get("output_device"))
+        fs, num_channels = measurement.get_device_params(input_device_id, output_device_id)
+        if previous is None:
+            channels = parse_channels(args.channels, num_channels)
+    except measurement.MeasurementError as e:
+        output["errors"].append(error_report(-1, e))
+        if args.diagnostics:
+            diagnostics.DIAGNOSTICS.write_json(args.diagnostics)
+        write_output(output, args.json)
+        return 1
+    output.update({"input_device": input_device_id, "output_device": output_device_id, "fs": fs,
+                   "num_channels": num_channels})
+
+    # Ошибка записи сеанса (диск заполнен, нет прав) не прерывает измерение, как и в интерфейсе
+    session_writer = None
+    if args.save:
+        try:
+            session_writer = session_store.SessionWriter(session_store.session_info(
+                measurement.device_entry(input_devices, input_device_id),
+                measurement.device_entry(output_devices, output_device_id), num_channels))
+        except OSError as e:
+            output["errors"].append(error_report(-1, measurement.MeasurementError("session_save_error", error=e)))
+    if session_writer is not None:
+        output["session"] = session_writer.path
+
+    spectra = {}
+
+    def on_result(result):
+        nonlocal session_writer
+        if session_writer is not None:
+            try:
+                session_writer.add_result(result)
+            except OSError as e:
+                session_writer = None
+                output["errors"].append(error_report(
+                    result.channel, measurement.MeasurementError("session_save_error", error=e)))
+        output["channels"].append(channel_report(result, smoothing_mode))
+        if result.spectrum is not None:
+            spectra[result.channel] = (result.freqs, result.spectrum)
+
+    def on_progress(channel, index, total):
+        if channel < 0:
+            print(f"Measuring {total} channels simultaneously", file=sys.stderr)
+        else:
+            print(f"Measuring channel {channel + 1} ({index + 1}/{total})", file=sys.stderr)
+
+    # Сабвуфер сравнивается с остальными каналами только в своей полосе
+    subwoofer = SUBWOOFER_CHANNELS.get(num_channels)
+    band_limits = {subwoofer: measurement.SUBWOOFER_BAND} if subwoofer is not None else None
+    if previous is not None:
+        channels = [channel - 1 for channel in previous.get("out_of_tolerance", [])]
+    if channels:
+        measurement.measure_channels(
+            input_device_id, output_device_id, channels, duration, fr_params,
+            mode, adaptive, error_margin,
+            on_progress=on_progress,
+            on_result=on_result,
+            on_error=lambda channel, error: output["errors"].append(error_report(channel, error)),
+            retention=retention,
+            weighting=weighting,
+            band_limits=band_limits)
+    if args.bands and spectra:
+        # Уровни всех каналов в полосах считаются одним проходом после измерения
+        centers, levels = analysis.band_analysis(spectra, args.bands)
+        output["band_centers"] = np.round(centers, 1).tolist()
+        for report in output["channels"]:
+            if report["channel"] - 1 in levels:
+                report["bands_db"] = np.round(levels[report["channel"] - 1], 2).tolist()
+    if args.correction and spectra:
+        output["correction_files"] = export_corrections(spectra, fs, subwoofer, settings, args.correction)
+    if previous is not None:
+        # Уровни остальных каналов берутся из прошлого отчёта
+        measured = {report["channel"] for report in output["channels"]}
+        output["channels"].extend(report for report in previous.get("channels", [])
+                                  if report["channel"] not in measured)
+        output["channels"].sort(key=lambda report: report["channel"])
+        output["retested"] = [channel + 1 for channel in channels]
+
+    plan = add_recommendations(output["channels"], num_channels, error_margin)
+    if plan is not None:
+        output["average_rms_db"] = round(plan.average, 3)
+        output["target_db"] = round(plan.target, 3)
+        output["out_of_tolerance"] = [channel + 1 for channel in plan.out_of_tolerance]
+    output["stream_status"] = diagnostics.DIAGNOSTICS.snapshot()["stream_status"]
+    if args.diagnostics:
+        diagnostics.DIAGNOSTICS.write_json(args.diagnostics)
+    write_output(output, args.json)
+    return 1 if output["errors"] else 0
+
+
+def write_output(output, path):
+    """Запись результатов в файл или в стандартный вывод"""
+    text = json.dumps(output, indent=2)
+    if path is None or path == "-":
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text)
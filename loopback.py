@@ -0,0 +1,149 @@
+"""Имитация звукового устройства с петлёй выход -> вход для замеров без оборудования
+
+LoopbackDevice повторяет используемую приложением часть API sounddevice
+(query_devices, query_hostapis, Stream, OutputStream) и подставляется вместо модуля
+sounddevice, например measurement.sd = LoopbackDevice(). Вход потока - сумма
+выходных каналов с заданными коэффициентами, пропущенная через КИХ-фильтр
+«комнаты», с задержкой и детерминированным шумом. Обратные вызовы выполняются
+в отдельном потоке без пауз реального времени.
+"""
+import threading
+import numpy as np
+import scipy.signal
+
+INPUT_DEVICE = 0
+OUTPUT_DEVICE = 1
+
+
+class CallbackStop(Exception):
+    """Остановка потока из обратного вызова (как sounddevice.CallbackStop)"""
+
+
+class CallbackAbort(Exception):
+    """Прерывание потока из обратного вызова (как sounddevice.CallbackAbort)"""
+
+
+def synthetic_room(fs, rt60=0.3, length_seconds=0.1, seed=0):
+    """КИХ-характеристика условной комнаты: прямой звук и экспоненциально затухающий шум
+
+    Энергия характеристики нормирована к 1, чтобы уровень шума на входе определялся gains.
+    """
+    rng = np.random.default_rng(seed)
+    length = max(1, int(length_seconds * fs))
+    t = np.arange(length) / fs
+    response = 0.1 * rng.standard_normal(length) * 10 ** (-3 * t / rt60)
+    response[0] = 1.0
+    return response / np.sqrt(np.sum(response ** 2))
+
+
+class LoopbackDevice:
+    """Пара устройств (вход 0, выход 1) с петлёй между ними
+
+    gains - коэффициенты передачи выходных каналов (по умолчанию 1), room -
+    КИХ-фильтр тракта, latency - задержка в отсчётах (не меньше размера блока
+    потока, как у настоящего устройства), noise - RMS шума на входе.
+    """
+
+    def __init__(self, num_channels=8, fs=48000, latency=2048, gains=None, room=None, noise=0.0, seed=0):
+        self.num_channels = num_channels
+        self.fs = fs
+        self.latency = latency
+        self.gains = np.ones(num_channels) if gains is None else np.asarray(gains, dtype=np.float64)
+        self.room = np.ones(1) if room is None else np.asarray(room, dtype=np.float64)
+        self.noise = noise
+        self.seed = seed
+        self.CallbackStop = CallbackStop
+        self.CallbackAbort = CallbackAbort
+
+    def query_devices(self, device=None, kind=None):
+        devices = [
+            {'name': 'Loopback Input', 'hostapi': 0, 'max_input_channels': 1,
+             'max_output_channels': 0, 'default_samplerate': float(self.fs)},
+            {'name': 'Loopback Output', 'hostapi': 0, 'max_input_channels': 0,
+             'max_output_channels': self.num_channels, 'default_samplerate': float(self.fs)},
+        ]
+        return devices if device is None else devices[device]
+
+    def query_hostapis(self, index=None):
+        hostapis = [{'name': 'Windows WASAPI (loopback)'}]
+        return hostapis if index is None else hostapis[index]
+
+    def Stream(self, **kwargs):
+        return LoopbackStream(self, **kwargs)
+
+    def OutputStream(self, channels=None, callback=None, **kwargs):
+        """Поток только на выход: обратный вызов без indata, как у sounddevice.OutputStream"""
+        def duplex_callback(indata, outdata, frames, time, status):
+            callback(outdata, frames, time, status)
+        return LoopbackStream(self, channels=(1, channels), callback=duplex_callback, **kwargs)
+
+
+class LoopbackStream:
+    """Дуплексный поток LoopbackDevice с интерфейсом sounddevice.Stream"""
+
+    def __init__(self, loopback, samplerate=None, device=None, channels=None, dtype='float32',
+                 blocksize=None, callback=None, finished_callback=None, **kwargs):
+        self.loopback = loopback
+        self.samplerate = samplerate
+        self.channels = channels if isinstance(channels, tuple) else (channels, channels)
+        self.blocksize = blocksize or 512
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.aborted = threading.Event()
+        self.thread = None
+        self.active = False
+
+    def run(self):
+        num_inputs, num_outputs = self.channels
+        loopback = self.loopback
+        gains = np.zeros(num_outputs)
+        gains[:min(num_outputs, len(loopback.gains))] = loopback.gains[:num_outputs]
+        # Вход блока берётся из линии задержки, поэтому задержка не меньше блока
+        delay_line = np.zeros(max(loopback.latency, self.blocksize))
+        zi = np.zeros(len(loopback.room) - 1)
+        rng = np.random.default_rng(loopback.seed)
+        try:
+            while not self.aborted.is_set():
+                block = delay_line[:self.blocksize]
+                if loopback.noise:
+                    block = block + rng.normal(0, loopback.noise, self.blocksize)
+                indata = np.repeat(block[:, None], num_inputs, axis=1).astype(np.float32)
+                outdata = np.zeros((self.blocksize, num_outputs), dtype=np.float32)
+                try:
+                    self.callback(indata, outdata, self.blocksize, None, None)
+                except (CallbackStop, CallbackAbort):
+                    break
+                mix = outdata.astype(np.float64) @ gains
+                if len(zi):
+                    response, zi = scipy.signal.lfilter(loopback.room, [1.0], mix, zi=zi)
+                else:
+                    response = mix * loopback.room[0]
+                delay_line = np.concatenate((delay_line[self.blocksize:], response))
+        finally:
+            self.active = False
+            if self.finished_callback is not None:
+                self.finished_callback()
+
+    def start(self):
+        self.active = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Поток крутит обратные вызовы без конца, поэтому и остановка, и прерывание сначала выставляют флаг
+        self.aborted.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def abort(self):
+        self.stop()
+
+    def close(self):
+        self.abort()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,781 @@
+"""Измерение каналов: воспроизведение возбуждения, запись и расчёт уровня без привязки к интерфейсу"""
+import collections
+import functools
+import threading
+import numpy as np
+try:
+    import sounddevice as sd
+except (ImportError, OSError):
+    # Без PortAudio модуль работает только с подставленной имитацией устройства (loopback.LoopbackDevice)
+    sd = None
+
+import diagnostics
+import dsp
+
+TRIM_SECONDS = 0.25  # Обрезка начала и конца записи, если задержка тракта не определена
+MAX_LATENCY_SECONDS = 0.5  # Запас записи для поиска неизвестной задержки
+POLL_INTERVAL = 0.05  # Период проверки окончания и отмены во время воспроизведения
+
+STREAM_BLOCKSIZE = 2048  # Размер блока обратного вызова потока (отсчёты)
+DECAY_GAP_SECONDS = 0.5  # Тишина между заданиями сеанса: затухание звука в комнате после канала
+
+# Потоковый режим с досрочной остановкой
+ADAPTIVE_TOLERANCE = 0.1  # Допустимый доверительный интервал уровня как доля error_margin
+ADAPTIVE_MIN_SECONDS = 0.5  # Минимальная длительность анализируемой записи
+CONFIDENCE_Z = 1.96  # 95% доверительный интервал
+
+# Режимы измерения: белый шум по очереди, одновременный мультитон, свип по очереди
+MEASUREMENT_MODES = ["noise", "multitone", "sweep"]
+EXCITATION_RMS = 0.1  # RMS возбуждения в каждом канале (как у белого шума)
+EXCITATION_SEED = 0  # Повторные измерения используют один и тот же шум из кэша
+EXCITATION_CACHE_SIZE = 8
+
+# Что хранится после измерения канала:
+# raw - исходная запись (АЧХ можно пересчитать с другими параметрами),
+# decimated - только спектр с разрешением БПФ и импульсная характеристика,
+# summary - спектр на логарифмической сетке из SUMMARY_POINTS точек и статистика уровня
+RETENTION_MODES = ["raw", "decimated", "summary"]
+SUMMARY_POINTS = 384
+LEVEL_BLOCK_SECONDS = 0.1  # Длина блока для разброса уровня во времени
+
+# Полосы расчёта уровня: срез ниже 20 Гц убирает гул микрофона, сабвуфер
+# сравнивается только в своей рабочей полосе. Ограничение полосы входит в
+# определение уровня и при Z: белый шум во всей полосе до fs/2 читается ниже
+# своего RMS на долю мощности вне 20 Гц - 20 кГц (около 0,8 дБ при 48 кГц)
+LEVEL_BAND = (20.0, 20000.0)
+SUBWOOFER_BAND = (20.0, 120.0)
+
+# Свип
+SWEEP_F_MIN = 20.0
+SWEEP_F_MAX = 20000.0
+SWEEP_TAIL_SECONDS = 0.5  # Тишина после свипа для записи задержки и затухания
+
+# Задержка тракта в отсчётах по ключу (устройство ввода, устройство вывода, fs);
+# измеряется один раз и используется всеми последующими сеансами
+LATENCY_CACHE = {}
+
+
+class MeasurementError(Exception):
+    """Ошибка измерения; key - ключ перевода сообщения, params - параметры для форматирования"""
+
+    def __init__(self, key, **params):
+        super().__init__(key)
+        self.key = key
+        self.params = params
+
+
+class MeasurementCancelled(Exception):
+    """Измерение отменено пользователем"""
+
+
+class LevelEstimator:
+    """Текущая оценка уровня по мощностям блоков с доверительным интервалом (алгоритм Уэлфорда)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, block):
+        """Учитывает очередной блок записи"""
+        power = float(np.mean(np.square(block, dtype=np.float64)))
+        self.count += 1
+        delta = power - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (power - self.mean)
+
+    def level_db(self):
+        """Оценка уровня в дБ"""
+        return 10 * np.log10(self.mean + 1e-20)
+
+    def confidence_db(self):
+        """Полуширина доверительного интервала уровня в дБ"""
+        if self.count < 2 or self.mean <= 0:
+            return float("inf")
+        stderr = np.sqrt(self.m2 / (self.count - 1) / self.count)
+        return 10 * np.log10(1 + CONFIDENCE_Z * stderr / self.mean)
+
+
+class ChannelResult:
+    """Результат измерения одного канала"""
+
+    def __init__(self, channel, fs, recording, rms_level):
+        self.channel = channel
+        self.fs = fs
+        self.recording = recording
+        self.rms_level = rms_level
+        self.duration = len(recording) / fs if recording is not None else 0.0
+        self.fr_params = None
+        self.freqs = None
+        self.spectrum = None
+        self.impulse_response = None
+        self.harmonics = None
+        self.latency = None
+        self.level_stats = None
+        self.mode = None  # Режим измерения (noise, multitone, sweep), которым получен уровень
+        self.weighting = None  # Взвешивание уровня (A, C, Z) и полоса, если уровень фильтровался
+        self.band = None
+
+
+def wasapi_devices():
+    """Устройства ввода и вывода WASAPI в виде списков (имя, индекс HostAPI, индекс устройства)
+
+    Списки отсортированы по имени: в этом порядке устройства показываются в интерфейсе.
+    """
+    if sd is None:
+        raise MeasurementError("device_error", error="sounddevice/PortAudio is not available")
+    with diagnostics.DIAGNOSTICS.stage("device_query"):
+        all_devices = sd.query_devices()
+        hostapis = sd.query_hostapis()
+    wasapi_index = next((i for i, hostapi in enumerate(hostapis) if 'wasapi' in hostapi['name'].lower()), None)
+    input_devices = [(dev['name'], dev['hostapi'], i) for i, dev in enumerate(all_devices)
+                     if dev['max_input_channels'] > 0 and dev['hostapi'] == wasapi_index]
+    output_devices = [(dev['name'], dev['hostapi'], i) for i, dev in enumerate(all_devices)
+                      if dev['max_output_channels'] > 0 and dev['hostapi'] == wasapi_index]
+    input_devices.sort(key=lambda device: device[0])
+    output_devices.sort(key=lambda device: device[0])
+    return input_devices, output_devices
+
+
+def find_device(devices, name, index=None):
+    """Позиция устройства в списке wasapi_devices по имени
+
+    index - позиция из настроек старых версий, где сохранялся только номер в
+    списке; используется, если имя не задано. Возвращает None, если устройство не найдено.
+    """
+    if name is not None:
+        return next((position for position, device in enumerate(devices) if device[0] == name), None)
+    if index is not None and 0 <= index < len(devices):
+        return index
+    return None
+
+
+def device_entry(devices, device_id):
+    """Запись (имя, индекс HostAPI, индекс устройства) из списка wasapi_devices по индексу устройства
+
+    Для устройства вне списка (например, заданного явно не из WASAPI) имя берётся из sounddevice.
+    """
+    entry = next((device for device in devices if device[2] == device_id), None)
+    if entry is not None:
+        return entry
+    try:
+        info = sd.query_devices(device_id)
+    except Exception:
+        return None, None, device_id
+    return info['name'], info['hostapi'], device_id
+
+
+def get_device_params(input_device_id, output_device_id):
+    """Возвращает общую частоту дискретизации и число выходных каналов пары устройств"""
+    try:
+        with diagnostics.DIAGNOSTICS.stage("device_query"):
+            output_device_info = sd.query_devices(output_device_id)
+            input_device_info = sd.query_devices(input_device_id)
+        num_channels = output_device_info['max_output_channels']
+        fs = int(output_device_info['default_samplerate'])
+        input_fs = int(input_device_info['default_samplerate'])
+    except Exception as e:
+        raise MeasurementError("device_error", error=e)
+    if fs != input_fs:
+        raise MeasurementError("frequency_mismatch", input_fs=input_fs, fs=fs)
+    return fs, num_channels
+
+
+@functools.lru_cache(maxsize=EXCITATION_CACHE_SIZE)
+def get_excitation(kind, fs, duration, seed=EXCITATION_SEED):
+    """Сигнал возбуждения из LRU-кэша по ключу (тип сигнала, fs, длительность, seed)
+
+    Шум генерируется сразу в float32 без промежуточного float64. Массивы
+    доступны только для чтения, так как разделяются между измерениями.
+    """
+    with diagnostics.DIAGNOSTICS.stage("excitation"):
+        if kind == "noise":
+            rng = np.random.default_rng(seed)
+            signal = rng.standard_normal(int(duration * fs), dtype=np.float32)
+            signal *= EXCITATION_RMS
+        elif kind == "pink":
+            signal = dsp.pink_noise(int(duration * fs), np.random.default_rng(seed), EXCITATION_RMS)
+        elif kind == "sweep":
+            signal, _, _ = dsp.sweep_design(fs, duration, SWEEP_F_MIN, sweep_f_max(fs))
+        else:
+            raise ValueError(f"Unknown excitation type: {kind}")
+    signal.flags.writeable = False
+    return signal
+
+
+def generate_white_noise(duration, fs, seed=EXCITATION_SEED):
+    """Генерация белого шума"""
+    return get_excitation("noise", fs, duration, seed)
+
+
+def sweep_f_max(fs):
+    """Верхняя частота свипа для заданной частоты дискретизации"""
+    return min(SWEEP_F_MAX, 0.45 * fs)
+
+
+def rms_db(recording):
+    """Уровень сигнала (RMS) в дБ"""
+    return 20 * np.log10(np.sqrt(np.mean(recording ** 2)) + 1e-10)
+
+
+def level_statistics(recording, fs):
+    """Статистика уровня записи: пик, пик-фактор и разброс уровня по блокам (дБ)"""
+    rms = rms_db(recording)
+    peak = 20 * np.log10(float(np.max(np.abs(recording))) + 1e-10)
+    block = max(1, int(LEVEL_BLOCK_SECONDS * fs))
+    num_blocks = len(recording) // block
+    spread = 0.0
+    if num_blocks > 1:
+        powers = np.mean(np.square(recording[:num_blocks * block].reshape(num_blocks, block), dtype=np.float64),
+                         axis=1)
+        spread = float(np.std(10 * np.log10(powers + 1e-20)))
+    return {"peak_db": round(float(peak), 3), "crest_db": round(float(peak - rms), 3),
+            "spread_db": round(spread, 3)}
+
+
+def apply_retention(result, retention):
+    """Сокращение результата канала до выбранного объёма хранения
+
+    Запись освобождается во всех режимах, кроме raw; в режиме summary спектр
+    и гармоники усредняются по мощности в полосах логарифмической сетки.
+    """
+    if retention not in RETENTION_MODES:
+        raise ValueError(f"Unknown retention mode: {retention}")
+    if result.recording is not None and result.level_stats is None:
+        result.level_stats = level_statistics(result.recording, result.fs)
+    if retention == "raw":
+        return result
+
+    result.recording = None
+    if result.spectrum is not None:
+        result.freqs = np.asarray(result.freqs, dtype=np.float32)
+        result.spectrum = np.asarray(result.spectrum, dtype=np.float32)
+    if result.harmonics is not None:
+        result.harmonics = {order: np.asarray(harmonic, dtype=np.float32)
+                            for order, harmonic in result.harmonics.items()}
+    if result.impulse_response is not None:
+        result.impulse_response = np.asarray(result.impulse_response, dtype=np.float32)
+    if retention == "summary" and result.spectrum is not None:
+        freqs = result.freqs
+        grid, power, _, _ = dsp.log_envelope(freqs, np.square(result.spectrum, dtype=np.float64), SUMMARY_POINTS)
+        result.freqs = grid.astype(np.float32)
+        result.spectrum = np.sqrt(power).astype(np.float32)
+        if result.harmonics is not None:
+            # Выше f_max / k гармоника не измерена (нули), они остаются нулями и после усреднения
+            result.harmonics = {
+                order: np.sqrt(dsp.log_envelope(freqs, np.square(harmonic, dtype=np.float64),
+                                                SUMMARY_POINTS)[1]).astype(np.float32)
+                for order, harmonic in result.harmonics.items()}
+        result.impulse_response = None
+    return result
+
+
+def check_channel(channel, num_channels):
+    """Проверка наличия канала на устройстве вывода"""
+    if channel >= num_channels:
+        raise MeasurementError("channel_not_exist", channel=channel)
+
+
+class CaptureJob:
+    """Воспроизведение с одновременной записью для одного измерения внутри сеанса
+
+    outputs - словарь {канал: сигнал}; в буфер устройства пишутся только эти каналы,
+    полная матрица отсчётов на все каналы не создаётся. При loop=True сигналы
+    повторяются периодически. Запись начинается вместе с воспроизведением и
+    продолжается ещё tail(latency) отсчётов после него, пока сеанс выдерживает
+    паузу или уже воспроизводит следующее задание. Подклассы переопределяют tail, on_block
+    для досрочной остановки и result для расчёта результата по записи.
+    """
+
+    def __init__(self, fs, outputs, total_samples, loop=False):
+        self.fs = fs
+        self.outputs = outputs
+        self.total_samples = total_samples
+        self.loop = loop
+        self.latency = None  # Задержка тракта в отсчётах, если известна
+        self.tail_samples = 0
+        self.recording = None
+        self.start = None  # Позиция начала воспроизведения в потоке сеанса
+        self.played = 0
+        self.recorded = 0
+        self.stop_requested = False
+        self.done = threading.Event()
+
+    def prepare(self, latency):
+        """Выделение буфера записи с учётом задержки тракта (None - неизвестна)"""
+        self.latency = latency
+        self.tail_samples = self.tail(latency)
+        self.recording = np.zeros(self.total_samples + self.tail_samples, dtype=np.float32)
+
+    def tail(self, latency):
+        """Длина записи после окончания воспроизведения"""
+        return 0
+
+    def playing(self):
+        """Идёт ли ещё воспроизведение"""
+        return not self.stop_requested and self.played < self.total_samples
+
+    def play(self, outdata, offset):
+        """Вывод в блок начиная с offset; возвращает число выведенных отсчётов"""
+        if self.stop_requested:
+            return 0
+        position = self.played
+        stop = min(position + len(outdata) - offset, self.total_samples)
+        count = stop - position
+        for channel, signal in self.outputs.items():
+            if self.loop:
+                outdata[offset:offset + count, channel] = np.take(signal, np.arange(position, stop), mode='wrap')
+            else:
+                chunk = signal[position:stop]
+                outdata[offset:offset + len(chunk), channel] = chunk
+        self.played = stop
+        return count
+
+    def record(self, block, block_start):
+        """Запись части входного блока, относящейся к заданию; True - запись закончена"""
+        record_end = len(self.recording) if self.playing() else self.played + self.tail_samples
+        begin = max(block_start, self.start + self.recorded)
+        end = min(block_start + len(block), self.start + record_end)
+        if end > begin:
+            self.recording[begin - self.start:end - self.start] = block[begin - block_start:end - block_start]
+            previous = self.recorded
+            self.recorded = end - self.start
+            self.on_record(previous, self.recorded)
+            if self.playing() and self.on_block(previous, self.recorded):
+                self.stop_requested = True
+        return not self.playing() and self.recorded >= self.played + self.tail_samples
+
+    def on_record(self, start, stop):
+        """Вызывается после записи каждой части, в том числе после окончания воспроизведения"""
+
+    def on_block(self, start, stop):
+        """Вызывается после записи очередной части; True - досрочная остановка"""
+        return False
+
+    def captured(self):
+        """Запись до места остановки"""
+        return self.recording[:self.recorded]
+
+    def result(self):
+        """Результат измерения по записи"""
+        raise NotImplementedError
+
+
+class MeasurementSession:
+    """Один дуплексный поток на всё измерение
+
+    Задания из очереди воспроизводятся в обратном вызове по очереди, поэтому
+    измерение всех каналов открывает устройство один раз. Между заданиями
+    выдерживается пауза DECAY_GAP_SECONDS: без неё затухание звука предыдущего
+    канала в комнате попадает в запись следующего и завышает уровень тихого
+    канала после громкого. Без заданий поток выводит тишину.
+    Задержка тракта берётся из LATENCY_CACHE, а если её там нет - из первого
+    задания, которое её определило.
+    """
+
+    def __init__(self, input_device_id, output_device_id, num_channels, fs):
+        self.fs = fs
+        self.num_channels = num_channels
+        self.device_key = (input_device_id, output_device_id, fs)
+        self.latency = LATENCY_CACHE.get(self.device_key)
+        self.pending = collections.deque()
+        self.current = None
+        self.recording_jobs = []
+        self.position = 0
+        self.decay_gap = int(DECAY_GAP_SECONDS * fs)
+        self.gap_end = 0  # Позиция потока, раньше которой следующее задание не начинается
+        self.stopped = threading.Event()
+        self.stream = sd.Stream(samplerate=fs, device=(input_device_id, output_device_id),
+                                channels=(1, num_channels), dtype='float32', blocksize=STREAM_BLOCKSIZE,
+                                callback=self.callback, finished_callback=self.stopped.set)
+
+    def __enter__(self):
+        self.stream.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream.abort()
+        self.stream.close()
+
+    def callback(self, indata, outdata, frames, time, status):
+        if status:
+            diagnostics.DIAGNOSTICS.count_status(status)
+        outdata.fill(0)
+        offset = 0
+        while offset < frames:
+            if self.current is None:
+                if not self.pending:
+                    break
+                if self.position + offset < self.gap_end:
+                    # Пауза после предыдущего задания: в блок выводится тишина
+                    offset = min(frames, self.gap_end - self.position)
+                    continue
+                self.current = self.pending.popleft()
+                self.current.start = self.position + offset
+                self.recording_jobs.append(self.current)
+            offset += self.current.play(outdata, offset)
+            if not self.current.playing():
+                self.current = None
+                self.gap_end = self.position + offset + self.decay_gap
+
+        block = indata[:, 0]
+        for job in list(self.recording_jobs):
+            if job.record(block, self.position):
+                self.recording_jobs.remove(job)
+                job.done.set()
+        self.position += frames
+
+    def submit(self, job):
+        """Постановка задания в очередь воспроизведения"""
+        job.prepare(self.latency)
+        self.pending.append(job)
+        return job
+
+    def wait(self, job, cancel_event=None):
+        """Ожидание окончания задания и расчёт его результата"""
+        with diagnostics.DIAGNOSTICS.stage("play_record"):
+            while not job.done.wait(POLL_INTERVAL):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise MeasurementCancelled()
+                if self.stopped.is_set():
+                    raise MeasurementError("device_error", error="stream stopped")
+        # Задержка могла определиться уже после постановки задания в очередь
+        if job.latency is None:
+            job.latency = self.latency
+        result = job.result()
+        # Буфер задания больше не нужен; если результат хранит запись, он держит её сам
+        job.recording = None
+        if self.latency is None and job.latency is not None:
+            self.latency = job.latency
+            LATENCY_CACHE[self.device_key] = job.latency
+        return result
+
+
+def run_capture(input_device_id, output_device_id, num_channels, fs, job, cancel_event=None):
+    """Выполнение одного задания в отдельном сеансе"""
+    with MeasurementSession(input_device_id, output_device_id, num_channels, fs) as session:
+        return session.wait(session.submit(job), cancel_event)
+
+
+class NoiseCapture(CaptureJob):
+    """Белый шум в канал; уровень по записи, выровненной по задержке тракта
+
+    Если задержка ещё неизвестна, она определяется взаимной корреляцией
+    воспроизведённого шума с записью, для чего запись продлевается на
+    MAX_LATENCY_SECONDS. level_sos - фильтр уровня (dsp.level_filter_sos):
+    при известной задержке уровень фильтруется по мере записи в обратном
+    вызове, иначе - одним проходом по выровненной записи.
+    """
+
+    def __init__(self, channel, fs, duration, level_sos=None):
+        self.channel = channel
+        self.noise = generate_white_noise(duration, fs)
+        if len(self.noise) == 0:
+            raise MeasurementError("recording_too_short")
+        self.level_sos = level_sos
+        self.level = None
+        super().__init__(fs, {channel: self.noise}, len(self.noise))
+
+    def tail(self, latency):
+        return latency if latency is not None else int(MAX_LATENCY_SECONDS * self.fs)
+
+    def prepare(self, latency):
+        super().prepare(latency)
+        # Окно уровня известно до начала записи, только если известна задержка
+        self.level = dsp.LevelAccumulator(self.level_sos) if latency is not None else None
+
+    def on_record(self, start, stop):
+        """Фильтрация записанной части в уровень; возвращает учтённые отсчёты после фильтра"""
+        if self.level is None:
+            return None
+        # В уровень входит отклик на воспроизведённый шум: отсчёты [latency, latency + played)
+        first = min(max(self.latency - start, 0), stop - start)
+        last = min(max(self.latency + self.played - start, 0), stop - start)
+        return self.level.feed(self.recording[start:stop], first, last)
+
+    def aligned(self):
+        """Отклик на воспроизведённый шум без отсчётов до и после него"""
+        captured = self.captured()
+        if self.latency is None:
+            with diagnostics.DIAGNOSTICS.stage("align"):
+                self.latency = dsp.estimate_delay(self.noise[:self.played], captured, self.tail_samples)
+        if self.latency is None:
+            # Отклик не найден (например, канал молчит): фиксированная обрезка
+            trim = int(TRIM_SECONDS * self.fs)
+            return captured[trim:self.played - trim]
+        return captured[self.latency:self.latency + self.played]
+
+    def result(self):
+        recording = self.aligned()
+        if recording.size == 0:
+            raise MeasurementError("no_data")
+        if self.level is not None:
+            level = self.level.level_db()
+        elif self.level_sos is not None:
+            level = dsp.filtered_level_db(recording, self.level_sos)
+        else:
+            level = rms_db(recording)
+        result = ChannelResult(self.channel, self.fs, recording, level)
+        if self.latency is not None:
+            result.latency = self.latency / self.fs
+        return result
+
+
+class AdaptiveNoiseCapture(NoiseCapture):
+    """Белый шум в канал с остановкой, как только уровень установился
+
+    Уровень оценивается по записи прямо в обратном вызове потока; воспроизведение
+    прекращается, когда доверительный интервал становится меньше
+    ADAPTIVE_TOLERANCE * error_margin, но не позже заданной длительности.
+    Оценка идёт по тем же отсчётам после фильтра уровня, что и итоговый уровень:
+    в узкой полосе (сабвуфер) разброс мощности блоков заметно больше, чем у
+    исходной записи.
+    """
+
+    def __init__(self, channel, fs, duration, error_margin, level_sos=None):
+        super().__init__(channel, fs, duration, level_sos)
+        self.min_samples = int(ADAPTIVE_MIN_SECONDS * fs)
+        self.tolerance = ADAPTIVE_TOLERANCE * error_margin
+        self.estimator = LevelEstimator()
+        self.estimate_level = None
+
+    def prepare(self, latency):
+        super().prepare(latency)
+        # Пока задержка неизвестна, уровень считается после записи: для оценки свой фильтр
+        self.estimate_level = dsp.LevelAccumulator(self.level_sos) if self.level is None else None
+
+    def skip(self):
+        # До прихода отклика в записи тишина; пока задержка неизвестна, пропускаем начало с запасом
+        return self.latency if self.latency is not None else int(TRIM_SECONDS * self.fs)
+
+    def on_record(self, start, stop):
+        part = super().on_record(start, stop)
+        if part is None:
+            part = self.estimate_level.feed(self.recording[start:stop], min(max(self.skip() - start, 0),
+                                                                            stop - start))
+        if len(part) and self.playing():
+            self.estimator.update(part)
+        return part
+
+    def on_block(self, start, stop):
+        return stop >= self.skip() + self.min_samples and self.estimator.confidence_db() <= self.tolerance
+
+
+class MultitoneCapture(CaptureJob):
+    """Одновременное измерение нескольких каналов одной записью
+
+    Каждый канал воспроизводит мультитон на собственном наборе бинов БПФ, поэтому
+    сигналы каналов не коррелированы и разделяются по частоте в одной записи.
+    Результат - список по каналам без исходной записи: у каждого канала есть только уровень и АЧХ.
+    level_filters - {канал: фильтр уровня}; фильтр применяется к мощностям тонов канала.
+    """
+
+    def __init__(self, channels, fs, duration, level_filters=None):
+        self.channels = channels
+        self.level_filters = level_filters or {}
+        samples = int(duration * fs)
+        self.period = dsp.multitone_period(samples)
+        # Первые периоды отбрасываются: в них задержка и переходный процесс
+        self.skip_periods = max(1, int(np.ceil(TRIM_SECONDS * fs / self.period)))
+        if samples // self.period <= self.skip_periods:
+            raise MeasurementError("recording_too_short")
+
+        self.channel_bins = dsp.multitone_bins(len(channels), self.period, fs)
+        rng = np.random.default_rng()
+        # Каждый канал получает один период мультитона, который повторяется в обратном вызове
+        outputs = {channel: dsp.generate_multitone(bins, self.period, EXCITATION_RMS, rng)
+                   for channel, bins in zip(channels, self.channel_bins)}
+        super().__init__(fs, outputs, samples, loop=True)
+
+    def result(self):
+        results = []
+        with diagnostics.DIAGNOSTICS.stage("fft"):
+            separated = dsp.separate_multitone(self.captured(), self.period, self.channel_bins, self.fs,
+                                               self.skip_periods)
+        # Шаг сетки тонов канала, на который separate_multitone делит мощность тона
+        spacing = len(self.channels) * self.fs / self.period
+        for channel, (level, freqs, spectrum) in zip(self.channels, separated):
+            sos = self.level_filters.get(channel)
+            if sos is not None:
+                gain = dsp.level_filter_gain(sos, freqs, self.fs)
+                level = 10 * np.log10(np.sum(spectrum ** 2 * spacing * gain) + 1e-20)
+            result = ChannelResult(channel, self.fs, None, level)
+            result.freqs = freqs
+            result.spectrum = spectrum
+            results.append(result)
+        return results
+
+
+class SweepCapture(CaptureJob):
+    """Экспоненциальный свип в канал с обратной свёрткой
+
+    АЧХ и уровень приводятся к отклику на белый шум с RMS EXCITATION_RMS,
+    чтобы их можно было сравнивать с измерениями шумом: уровень - интеграл
+    квадрата АЧХ, умноженного на квадрат АЧХ фильтра уровня level_sos, до fs/2.
+    """
+
+    def __init__(self, channel, fs, duration, level_sos=None):
+        self.channel = channel
+        self.level_sos = level_sos
+        self.f_max = sweep_f_max(fs)
+        sweep = get_excitation("sweep", fs, duration)
+        _, self.inverse, self.rate = dsp.sweep_design(fs, duration, SWEEP_F_MIN, self.f_max)
+        # После свипа записываем тишину, чтобы захватить задержку и затухание
+        super().__init__(fs, {channel: sweep}, len(sweep) + int(SWEEP_TAIL_SECONDS * fs))
+
+    def result(self):
+        fs = self.fs
+        with diagnostics.DIAGNOSTICS.stage("deconvolve"):
+            latency, impulse_response, harmonics = dsp.deconvolve_sweep(self.captured(), self.inverse, fs,
+                                                                        self.rate)
+        nfft = len(impulse_response)
+        freqs, magnitude = dsp.transfer_function(impulse_response, fs, nfft)
+        band = (freqs >= SWEEP_F_MIN) & (freqs <= self.f_max)
+        if not np.any(band):
+            raise MeasurementError("no_data")
+
+        # Белый шум с RMS sigma имеет одностороннюю СПМ 2 * sigma^2 / fs
+        noise_amplitude = np.sqrt(2 * EXCITATION_RMS ** 2 / fs)
+        # Уровень, как и при шуме, - мощность после фильтра уровня во всей полосе до fs/2;
+        # за пределами свипа АЧХ не измерена и продолжается крайними значениями полосы
+        in_band = np.flatnonzero(band)
+        held = magnitude[np.clip(np.arange(len(freqs)), in_band[0], in_band[-1])]
+        gain = dsp.level_filter_gain(self.level_sos, freqs, fs)
+        level = 10 * np.log10(EXCITATION_RMS ** 2 * np.mean(held ** 2 * gain) + 1e-20)
+
+        result = ChannelResult(self.channel, fs, None, level)
+        result.freqs = freqs
+        result.spectrum = magnitude * noise_amplitude
+        result.impulse_response = impulse_response
+        result.harmonics = {order: spectrum * noise_amplitude
+                            for order, spectrum in dsp.harmonic_spectra(harmonics, fs, nfft).items()}
+        result.latency = latency / fs
+        return result
+
+
+def channel_capture(mode, channel, fs, duration, adaptive=False, error_margin=1.0, level_sos=None):
+    """Задание измерения одного канала для последовательных режимов"""
+    if mode == "sweep":
+        return SweepCapture(channel, fs, duration, level_sos)
+    if adaptive:
+        return AdaptiveNoiseCapture(channel, fs, duration, error_margin, level_sos)
+    return NoiseCapture(channel, fs, duration, level_sos)
+
+
+def measure_channel(input_device_id, output_device_id, channel, num_channels, fs, duration,
+                    cancel_event=None):
+    """Воспроизводит белый шум в канал, записывает отклик и рассчитывает его уровень"""
+    check_channel(channel, num_channels)
+    return run_capture(input_device_id, output_device_id, num_channels, fs,
+                       NoiseCapture(channel, fs, duration), cancel_event)
+
+
+def measure_channels(input_device_id, output_device_id, channels, duration, fr_params, mode="noise",
+                     adaptive=False, error_margin=1.0, cancel_event=None,
+                     on_progress=None, on_result=None, on_error=None, retention="raw",
+                     weighting="Z", band_limits=None):
+    """Измерение списка каналов в выбранном режиме с расчётом АЧХ
+
+    Все каналы измеряются в одном сеансе: задания ставятся в очередь сразу и
+    воспроизводятся по очереди с паузой на затухание, а результат канала рассчитывается, пока звучит
+    следующий. Обратные вызовы: on_progress(channel, index, total) перед каждым
+    каналом (channel=-1 при одновременном измерении всех каналов),
+    on_result(result) после каждого канала, on_error(channel, exception) -
+    channel=-1 для ошибки устройства. Ошибка канала не прерывает измерение остальных.
+    Перед передачей в on_result результат сокращается по режиму хранения retention.
+    Уровень - мощность во всей полосе до fs/2 после взвешивания weighting и
+    ограничения полосой канала из band_limits ({канал: (f_low, f_high)}, по
+    умолчанию LEVEL_BAND), одинаково во всех режимах. Ход измерения, ошибки и сбои потока по каналам пишутся в журнал диагностики.
+    """
+    log = diagnostics.DIAGNOSTICS
+
+    def report_error(channel, error):
+        if isinstance(error, MeasurementError):
+            details = {"key": error.key, "params": {key: str(value) for key, value in error.params.items()}}
+        else:
+            details = {"error": str(error)}
+        log.log("error", channel=channel, type=type(error).__name__, **details)
+        if on_error is not None:
+            on_error(channel, error)
+
+    try:
+        fs, num_channels = get_device_params(input_device_id, output_device_id)
+    except MeasurementError as e:
+        report_error(-1, e)
+        return
+
+    band_limits = {channel: tuple(band) for channel, band in (band_limits or {}).items()}
+
+    def level_sos(channel):
+        return dsp.level_filter_sos(fs, weighting, band_limits.get(channel, LEVEL_BAND))
+
+    def band_correction(channel):
+        # Уровень канала с узкой полосой приводится к полосе LEVEL_BAND: для ровного тракта
+        # возбуждение белым шумом даёт одинаковый уровень независимо от полосы канала
+        band = band_limits.get(channel, LEVEL_BAND)
+        return 10 * np.log10(dsp.level_filter_noise_gain(fs, weighting, LEVEL_BAND) /
+                             dsp.level_filter_noise_gain(fs, weighting, band))
+
+    jobs = []
+    if mode == "multitone":
+        try:
+            for channel in channels:
+                check_channel(channel, num_channels)
+            jobs.append((-1, MultitoneCapture(channels, fs, duration,
+                                              {channel: level_sos(channel) for channel in channels})))
+        except MeasurementError as e:
+            report_error(-1, e)
+            return
+    else:
+        for channel in channels:
+            try:
+                check_channel(channel, num_channels)
+                jobs.append((channel, channel_capture(mode, channel, fs, duration, adaptive, error_margin,
+                                                      level_sos(channel))))
+            except MeasurementError as e:
+                report_error(channel, e)
+
+    try:
+        session = MeasurementSession(input_device_id, output_device_id, num_channels, fs)
+    except Exception as e:
+        report_error(-1, MeasurementError("device_error", error=e))
+        return
+
+    log.log("measurement_started", mode=mode, channels=list(channels), fs=fs,
+            input_device=input_device_id, output_device=output_device_id)
+    with session:
+        for _, job in jobs:
+            session.submit(job)
+        xruns = log.xruns()
+        for index, (channel, job) in enumerate(jobs):
+            if on_progress is not None:
+                on_progress(channel, index, len(jobs) if channel >= 0 else len(channels))
+            try:
+                result = session.wait(job, cancel_event)
+            except MeasurementCancelled:
+                log.log("measurement_cancelled", channel=channel)
+                return
+            except Exception as e:
+                report_error(channel, e)
+                if session.stopped.is_set():
+                    return
+                continue
+            # Сбои буферов за время задания: измерение с ними может быть искажено
+            job_xruns = log.xruns() - xruns
+            xruns += job_xruns
+            for result in (result if isinstance(result, list) else [result]):
+                result.mode = mode
+                result.weighting = weighting
+                result.band = band_limits.get(result.channel, LEVEL_BAND)
+                if result.band != LEVEL_BAND:
+                    result.rms_level += band_correction(result.channel)
+                if result.recording is not None:
+                    result.fr_params = fr_params
+                    with log.stage("fft"):
+                        result.freqs, result.spectrum = dsp.fr_spectrum(result.recording, fs, *fr_params)
+                apply_retention(result, retention)
+                log.log("channel_measured", channel=result.channel, rms_db=round(float(result.rms_level), 3),
+                        latency=result.latency, xruns=job_xruns)
+                if on_result is not None:
+                    on_result(result)
+    log.log("measurement_finished", channels=len(jobs))
@@ -0,0 +1,132 @@
+"""Анализатор спектра в реальном времени (RTA) по непрерывному входному потоку"""
+import numpy as np
+
+import diagnostics
+import dsp
+import measurement
+
+RING_SECONDS = 4.0  # Длина кольцевого буфера
+RTA_FFT_SIZE = 8192
+RTA_OVERLAP = 0.5
+RTA_AVERAGING = 0.8  # Коэффициент экспоненциального усреднения кадров
+RTA_MAX_FRAMES = 8  # Максимум кадров БПФ за одно обновление
+PINK_NOISE_SECONDS = 10.0  # Длина зацикленного розового шума
+
+
+class RingBuffer:
+    """Кольцевой буфер для одного писателя и одного читателя без блокировок
+
+    Писатель (обратный вызов аудиопотока) сначала копирует блок, затем
+    увеличивает счётчик записанных отсчётов. Читатель берёт отсчёты по
+    абсолютным позициям не дальше этого счётчика.
+    """
+
+    def __init__(self, size):
+        self.size = int(size)
+        self.buffer = np.zeros(self.size, dtype=np.float32)
+        self.written = 0
+
+    def write(self, block):
+        """Добавление блока (вызывается из аудиопотока)"""
+        count = len(block)
+        if count > self.size:
+            block = block[-self.size:]
+            self.written += count - self.size
+            count = self.size
+        start = self.written % self.size
+        first = min(count, self.size - start)
+        self.buffer[start:start + first] = block[:first]
+        self.buffer[:count - first] = block[first:]
+        self.written += count
+
+    def read(self, end, length):
+        """Копия отсчётов [end - length, end) по абсолютным позициям"""
+        indices = np.arange(end - length, end) % self.size
+        return self.buffer[indices]
+
+
+class RtaAnalyzer:
+    """Перекрывающиеся оконные БПФ с экспоненциальным усреднением"""
+
+    def __init__(self, fs, fft_size=RTA_FFT_SIZE, overlap=RTA_OVERLAP, averaging=RTA_AVERAGING):
+        self.fs = fs
+        self.fft_size = fft_size
+        self.hop = max(1, int(fft_size * (1 - overlap)))
+        self.averaging = averaging
+        self.window = np.hanning(fft_size).astype(np.float32)
+        self.scale = 2.0 / (fs * np.sum(self.window.astype(np.float64) ** 2))
+        self.freqs = np.fft.rfftfreq(fft_size, 1 / fs)
+        self.psd = None
+        self.position = 0  # Конец последнего обработанного кадра
+
+    def update(self, ring):
+        """Обработка новых кадров из кольцевого буфера; возвращает True, если спектр обновился"""
+        written = ring.written
+        if written < self.fft_size:
+            return False
+        # Если отстали, пропускаем старые кадры: важна только актуальная картина
+        oldest = written - (RTA_MAX_FRAMES - 1) * self.hop
+        self.position = max(self.position + self.hop, self.fft_size, oldest)
+        updated = False
+        while self.position <= written:
+            frame = ring.read(self.position, self.fft_size)
+            power = np.abs(np.fft.rfft(frame * self.window)) ** 2 * self.scale
+            if self.psd is None:
+                self.psd = power
+            else:
+                self.psd = self.averaging * self.psd + (1 - self.averaging) * power
+            self.position += self.hop
+            updated = True
+        self.position -= self.hop
+        return updated
+
+    def band_levels_db(self, fraction=3):
+        """Центры и уровни (дБ) полос 1/fraction октавы
+
+        Матрица полос та же, что у полосного анализа измерений, и кэшируется по
+        (RTA_FFT_SIZE, fs, fraction), поэтому уровни в обоих окнах совпадают.
+        """
+        centers, matrix = dsp.rfft_band_matrix(self.fft_size, float(self.fs), fraction)
+        return centers, 10 * np.log10(matrix @ self.psd.astype(np.float64) + 1e-20)
+
+    def spectrum_db(self):
+        """Усреднённая СПМ (дБ/Гц)"""
+        return 10 * np.log10(self.psd + 1e-20)
+
+
+class LiveCapture:
+    """Непрерывный дуплексный поток: вход пишется в кольцевой буфер, в выбранный канал
+    может воспроизводиться зацикленный розовый шум"""
+
+    def __init__(self, input_device_id, output_device_id, num_channels, fs):
+        self.fs = fs
+        self.num_channels = num_channels
+        self.ring = RingBuffer(RING_SECONDS * fs)
+        self.pink = measurement.get_excitation("pink", fs, PINK_NOISE_SECONDS)
+        self.output_channel = None
+        self.position = 0
+        # Модуль sounddevice берётся из measurement: там же он подменяется имитацией устройства
+        self.stream = measurement.sd.Stream(samplerate=fs, device=(input_device_id, output_device_id),
+                                            channels=(1, num_channels), dtype='float32',
+                                            blocksize=measurement.STREAM_BLOCKSIZE, callback=self.callback)
+
+    def callback(self, indata, outdata, frames, time, status):
+        if status:
+            diagnostics.DIAGNOSTICS.count_status(status)
+        outdata.fill(0)
+        channel = self.output_channel
+        if channel is not None:
+            outdata[:, channel] = np.take(self.pink, np.arange(self.position, self.position + frames), mode='wrap')
+            self.position = (self.position + frames) % len(self.pink)
+        self.ring.write(indata[:, 0])
+
+    def set_output_channel(self, channel):
+        """Канал для розового шума или None для тишины"""
+        self.output_channel = channel
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.abort()
+        self.stream.close()
@@ -0,0 +1,138 @@
+"""Хранение сеансов измерений на диске: каталог с массивами .npy и манифестом JSON
+
+Каждый массив результата канала (запись, спектр, импульсная характеристика,
+гармоники) сохраняется в отдельный .npy-файл сразу после измерения канала,
+а манифест с устройствами, частотой дискретизации и уровнями переписывается
+целиком. При загрузке массивы открываются через np.load(mmap_mode='r') и
+читаются с диска только при обращении.
+"""
+import datetime
+import json
+import os
+import numpy as np
+
+import measurement
+
+SESSIONS_DIR = "sessions"
+MANIFEST_FILE = "manifest.json"
+ARRAY_FIELDS = ["recording", "freqs", "spectrum", "impulse_response"]
+
+
+def session_info(input_device, output_device, num_channels):
+    """Сведения об устройствах для манифеста
+
+    input_device и output_device - записи (имя, индекс HostAPI, индекс
+    устройства) из measurement.wasapi_devices. В манифест пишутся и имена, и
+    индексы: индексы меняются при подключении устройств, имена - нет.
+    """
+    return {"input_device": input_device[0], "input_device_id": input_device[2],
+            "output_device": output_device[0], "output_device_id": output_device[2],
+            "num_channels": num_channels}
+
+
+class SessionWriter:
+    """Сеанс, в который результаты каналов дописываются по мере измерения
+
+    info - сведения об измерении для манифеста (устройства, режим и т. п.).
+    Повторное измерение канала заменяет его запись в манифесте и файлы.
+    """
+
+    def __init__(self, info, root=SESSIONS_DIR):
+        created = datetime.datetime.now()
+        base = os.path.join(root, created.strftime("%Y%m%d-%H%M%S"))
+        self.path = base
+        suffix = 1
+        while os.path.exists(self.path):
+            suffix += 1
+            self.path = f"{base}-{suffix}"
+        os.makedirs(self.path)
+        self.manifest = dict(info, created=created.isoformat(timespec="seconds"), channels={})
+        self.version = 0
+        self.write_manifest()
+
+    def add_result(self, result):
+        """Сохранение массивов и уровня канала"""
+        # Номер версии в именах файлов: прежние файлы канала могут быть ещё открыты через mmap
+        self.version += 1
+        prefix = f"ch{result.channel + 1:02d}_{self.version}"
+        entry = {
+            "rms_db": float(result.rms_level),
+            "fs": result.fs,
+            "duration": result.duration,
+            "latency": result.latency,
+            "fr_params": list(result.fr_params) if result.fr_params is not None else None,
+            "level_stats": result.level_stats,
+            "mode": result.mode,
+            "weighting": result.weighting,
+            "band": list(result.band) if result.band is not None else None,
+            "measured": datetime.datetime.now().isoformat(timespec="seconds"),
+            "arrays": {},
+            "harmonics": {},
+        }
+        for field in ARRAY_FIELDS:
+            value = getattr(result, field)
+            if value is not None:
+                entry["arrays"][field] = self.save_array(f"{prefix}_{field}.npy", value)
+        for order, spectrum in (result.harmonics or {}).items():
+            entry["harmonics"][str(order)] = self.save_array(f"{prefix}_h{order}.npy", spectrum)
+
+        previous = self.manifest["channels"].get(str(result.channel))
+        self.manifest["channels"][str(result.channel)] = entry
+        self.write_manifest()
+        if previous is not None:
+            self.remove_files(previous)
+
+    def save_array(self, name, value):
+        """Запись массива в каталог сеанса; возвращает имя файла"""
+        np.save(os.path.join(self.path, name), np.asarray(value))
+        return name
+
+    def remove_files(self, entry):
+        """Удаление файлов заменённой записи канала"""
+        for name in list(entry["arrays"].values()) + list(entry["harmonics"].values()):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def write_manifest(self):
+        """Атомарная перезапись манифеста"""
+        temp_path = os.path.join(self.path, MANIFEST_FILE + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, os.path.join(self.path, MANIFEST_FILE))
+
+
+def load_manifest(path):
+    """Манифест сеанса"""
+    with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+
+def load_session(path):
+    """Манифест и результаты каналов сеанса с массивами, отображёнными в память
+
+    Возвращает (манифест, {канал: measurement.ChannelResult}).
+    """
+    manifest = load_manifest(path)
+    results = {}
+    for key, entry in manifest["channels"].items():
+        arrays = {field: np.load(os.path.join(path, name), mmap_mode='r')
+                  for field, name in entry["arrays"].items()}
+        result = measurement.ChannelResult(int(key), entry["fs"], arrays.get("recording"), entry["rms_db"])
+        result.duration = entry["duration"]
+        result.latency = entry["latency"]
+        result.level_stats = entry.get("level_stats")
+        result.mode = entry.get("mode")
+        result.weighting = entry.get("weighting")
+        result.band = tuple(entry["band"]) if entry.get("band") is not None else None
+        result.fr_params = tuple(entry["fr_params"]) if entry["fr_params"] is not None else None
+        result.freqs = arrays.get("freqs")
+        result.spectrum = arrays.get("spectrum")
+        result.impulse_response = arrays.get("impulse_response")
+        if entry["harmonics"]:
+            result.harmonics = {int(order): np.load(os.path.join(path, name), mmap_mode='r')
+                                for order, name in entry["harmonics"].items()}
+        results[result.channel] = result
+    return manifest, results
+